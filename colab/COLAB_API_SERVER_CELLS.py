@@ -29,7 +29,8 @@ def health():
         "status": "healthy",
         "model": "Qwen 2.5 14B V13",
         "rag": "V3",
-        "gpu": "L4"
+        "gpu": "L4",
+        "config": rag.config_health()  # rag_docs + kural sürümü, son yükleme süresi
     })
 
 # Generate endpoint (matches existing api_client.py structure)
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import os
+
 from fastapi import FastAPI
 from pydantic import BaseModel, Field
 
 from lgs_engine.model.client import ModelClient
+from lgs_engine.model.response_cache import ResponseCache
 from lgs_engine.core.pipeline import GenerationPipeline
 from lgs_engine.core.qtype_selector import QuestionTypeSelector
 
@@ -13,7 +16,7 @@ app = FastAPI(title="LGS Soru Engine")
 
 class GenerateRequest(BaseModel):
     prompt: str = Field(..., description="Konu/kurallar dahil uretim istemi")
-    n: int = Field(5, ge=1, le=20, description="Aday sayisi (rejection sampling)")
+    n: int = Field(5, ge=1, le=20, description="En fazla aday sayisi (hedef puana ulasan ilk adayda durulur)")
     mode: str = Field(
         "mixed",
         description="question_type secim modu: mixed | family | explicit_type",
@@ -26,7 +29,10 @@ class GenerateRequest(BaseModel):
         None,
         description="mode=explicit_type iken kullanilir (paragraf_ana_dusunce, cumlede_anlam_kosul, ...)"
     )
-    seed: int | None = Field(None, description="Secim deterministik olsun istersen")
+    seed: int | None = Field(None, description="Secim ve aday uretimi deterministik olsun istersen")
+    deadline_s: float | None = Field(
+        None, gt=0, description="Istek suresi siniri (sn); dolunca o ana kadarki en iyi aday doner"
+    )
 
 
 class GenerateResponse(BaseModel):
@@ -34,10 +40,31 @@ class GenerateResponse(BaseModel):
     question: dict
 
 
-# NOTE: ModelClient stub; wire to your inference server
-model = ModelClient(base_url=None)
+# Inference server URL'leri (judge ayri model onerilir); baglantilar havuzda tutulur
+# Onarim ve judge cevaplari data/response_cache altinda saklanir (LGS_RESPONSE_CACHE=0 ile kapali)
+model = ModelClient(
+    base_url=os.getenv("LGS_MODEL_URL"),
+    judge_url=os.getenv("LGS_JUDGE_URL"),
+    cache=None if os.getenv("LGS_RESPONSE_CACHE") == "0" else ResponseCache.default(),
+)
 selector = QuestionTypeSelector()
-pipeline = GenerationPipeline(model, selector=selector)
+# Adaylar sinirli havuzda paralel uretilir (uzak modelde istek suresi ~n/4 cagri)
+pipeline = GenerationPipeline(model, selector=selector, max_workers=4)
+
+
+@app.get("/health")
+def health():
+    # Sozlesme (question_type_rules.yaml) surumu ve son yukleme suresi
+    # + question_type basina gecme orani ve kabul edilen soru basina aday sayisi
+    # + dogrulama asamalarinin eleme sayisi ve suresi
+    # + onarim / judge cevap cache'inin endpoint basina isabet orani
+    return {
+        "status": "healthy",
+        "contract": selector.store.health(),
+        "sampling": pipeline.telemetry.sampling_stats(),
+        "validation": pipeline.validation.stats(),
+        "response_cache": model.cache_stats(),
+    }
 
 
 @app.post("/generate", response_model=GenerateResponse)
@@ -53,5 +80,11 @@ def generate(req: GenerateRequest):
     # (Fine-tune'da bu satiri gorup tip davranisini oturtuyoruz.)
     wrapped_prompt = f"Soru tipi: {qtype}\n{req.prompt.strip()}"
 
-    q = pipeline.generate_best(wrapped_prompt, n=req.n, expected_question_type=qtype)
+    q = pipeline.generate_best(
+        wrapped_prompt,
+        n=req.n,
+        expected_question_type=qtype,
+        seed=req.seed,
+        deadline_s=req.deadline_s,
+    )
     return {"selected_question_type": qtype, "question": q}
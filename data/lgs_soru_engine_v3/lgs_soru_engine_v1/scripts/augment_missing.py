@@ -16,8 +16,10 @@ Kullanim (ornek):
     --n_candidates 5
 
 Not:
-  ModelClient su an stub. Bu scriptin calismasi icin `src/lgs_engine/model/client.py`
-  dosyasini kendi Colab inference server'ina baglamalisin.
+  --base_url (ve istege bagli --judge_url) kendi inference server'ini gostermeli
+  (POST /generate, /judge -> {"result": ...}; bkz. `src/lgs_engine/model/client.py`).
+  Onarim ve judge cevaplari --cache_dir altinda saklanir; ayni girdiyle tekrar
+  calistirmada model cagrilmaz (--no_cache ile kapatilir).
 """
 
 from __future__ import annotations
@@ -30,6 +32,7 @@ from typing import Any, Dict, List
 
 from lgs_engine.core.pipeline import GenerationPipeline
 from lgs_engine.model.client import ModelClient
+from lgs_engine.model.response_cache import ResponseCache
 
 
 def read_jsonl(path: Path) -> List[Dict[str, Any]]:
@@ -76,7 +79,11 @@ def main() -> None:
     ap.add_argument("--group_key", choices=["canonical_subtopic", "question_type"], default="canonical_subtopic")
     ap.add_argument("--min_count", type=int, default=20)
     ap.add_argument("--n_candidates", type=int, default=5)
+    ap.add_argument("--workers", type=int, default=1, help="Paralel aday sayisi (uzak modelde hizlandirir)")
     ap.add_argument("--base_url", type=str, default=None, help="Model server base URL (optional)")
+    ap.add_argument("--judge_url", type=str, default=None, help="Judge model server URL (optional)")
+    ap.add_argument("--cache_dir", type=str, default=None, help="Onarim/judge cevap cache'i (varsayilan data/response_cache)")
+    ap.add_argument("--no_cache", action="store_true", help="Cevap cache'ini kullanma")
     args = ap.parse_args()
 
     inp = Path(args.inp)
@@ -98,8 +105,11 @@ def main() -> None:
     for k, v in sorted(need.items(), key=lambda x: -x[1]):
         print(f"  {k}: +{v}")
 
-    model = ModelClient(base_url=args.base_url)
-    pipeline = GenerationPipeline(model=model)
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(Path(args.cache_dir)) if args.cache_dir else ResponseCache.default()
+    model = ModelClient(base_url=args.base_url, judge_url=args.judge_url, cache=cache)
+    pipeline = GenerationPipeline(model=model, max_workers=args.workers)
 
     augmented: List[Dict[str, Any]] = []
     for group, add_n in need.items():
@@ -126,6 +136,9 @@ def main() -> None:
     merged = data + augmented
     write_jsonl(out, merged)
     print(f"Wrote {len(merged)} rows -> {out}")
+    if cache is not None:
+        for endpoint, st in cache.stats()["endpoints"].items():
+            print(f"Cache {endpoint}: hit_rate={st['hit_rate']} ({st['hits']}/{st['hits'] + st['misses']})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import yaml
+
+
+def default_contract_path() -> Path:
+    # .../src/lgs_engine/core/config_store.py -> parents[3] proje koku
+    return Path(__file__).resolve().parents[3] / "configs" / "question_type_rules.yaml"
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+@dataclass(frozen=True)
+class ContractSnapshot:
+    """question_type_rules.yaml'in bir yuklemedeki degismez hali.
+
+    Selector ve validator ayni snapshot'i paylasir; bir istek basladiginda
+    aldigi snapshot ile biter (arada dosya degisse bile).
+    """
+
+    version: int
+    defaults: Mapping[str, Any]
+    rules: Mapping[str, Mapping[str, Any]]
+    all_types: Tuple[str, ...]
+    by_family: Mapping[str, Tuple[str, ...]]
+    mtime_ns: int
+    size: int
+    loaded_at: float
+    reload_ms: float
+
+    @classmethod
+    def parse(cls, path: Path, version: int) -> "ContractSnapshot":
+        start = time.perf_counter()
+        stat = path.stat()
+        obj = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+        defaults = obj.get("defaults", {}) or {}
+        rules = obj.get("rules", {}) or {}
+
+        by_family: Dict[str, list] = {}
+        for qtype, r in rules.items():
+            fam = str(r.get("topic_family", "")).strip()
+            if fam:
+                by_family.setdefault(fam, []).append(qtype)
+
+        # stabil order
+        return cls(
+            version=version,
+            defaults=_freeze(defaults),
+            rules=_freeze(rules),
+            all_types=tuple(sorted(rules)),
+            by_family=MappingProxyType({fam: tuple(sorted(types)) for fam, types in by_family.items()}),
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            loaded_at=time.time(),
+            reload_ms=(time.perf_counter() - start) * 1000,
+        )
+
+
+class ContractStore:
+    """Sozlesme dosyasini bir kez parse eder, degisince worker'i yeniden baslatmadan yukler.
+
+    - snapshot(): en fazla poll_interval saniyede bir mtime/boyut kontrol eder;
+      degismisse yeni snapshot kurulup referans tek atamayla degistirilir.
+    - Bozuk dosya yuklenemezse eski snapshot kullanilmaya devam eder, hata
+      health() ciktisinda gorunur.
+    - for_path() ayni dosya icin surec genelinde tek store dondurur
+      (QuestionTypeSelector ve TypeRuleValidator YAML'i iki kez okumaz).
+    """
+
+    _instances: Dict[Path, "ContractStore"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path, *, poll_interval: float = 1.0):
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._last_check = time.monotonic()
+        self._failed_stat: Optional[Tuple[int, int]] = None
+        self.reload_count = 0
+        self.failed_reloads = 0
+        self.last_error: Optional[str] = None
+        self._snapshot = ContractSnapshot.parse(self.path, version=1)
+
+    @classmethod
+    def for_path(cls, path: Optional[Path] = None) -> "ContractStore":
+        path = Path(path or default_contract_path()).resolve()
+        store = cls._instances.get(path)
+        if store is None:
+            with cls._instances_lock:
+                store = cls._instances.get(path)
+                if store is None:
+                    store = cls(path)
+                    cls._instances[path] = store
+        return store
+
+    def snapshot(self) -> ContractSnapshot:
+        if time.monotonic() - self._last_check >= self.poll_interval:
+            self.reload()
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def reload(self, *, force: bool = False) -> bool:
+        """Dosya degistiyse (veya force) yeniden yukler; yeni snapshot kurulduysa True."""
+        with self._lock:
+            self._last_check = time.monotonic()
+            current = self._snapshot
+            try:
+                stat = self.path.stat()
+            except OSError as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                return False
+            key = (stat.st_mtime_ns, stat.st_size)
+            if not force and (key == (current.mtime_ns, current.size) or key == self._failed_stat):
+                return False
+
+            try:
+                snapshot = ContractSnapshot.parse(self.path, version=current.version + 1)
+            except Exception as e:
+                self.failed_reloads += 1
+                self._failed_stat = key
+                self.last_error = f"{type(e).__name__}: {e}"
+                return False
+
+            self._snapshot = snapshot
+            self._failed_stat = None
+            self.last_error = None
+            self.reload_count += 1
+            return True
+
+    def health(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "path": str(self.path),
+            "version": snapshot.version,
+            "loaded_at": datetime.fromtimestamp(snapshot.loaded_at, timezone.utc).isoformat(),
+            "last_reload_ms": round(snapshot.reload_ms, 3),
+            "reload_count": self.reload_count,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+            "question_types": len(snapshot.all_types),
+        }
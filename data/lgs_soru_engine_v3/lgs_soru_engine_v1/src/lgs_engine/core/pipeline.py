@@ -1,17 +1,44 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, Optional
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from ..model.client import ModelClient
+from ..validators.base import Stage, StagedValidator
 from ..validators.hard import HardValidator
 from ..validators.type_rules import TypeRuleValidator
 from ..validators.semantic_judge import SemanticJudge
 from .qtype_selector import QuestionTypeSelector
+from .sampling import SamplingPolicy
 from .telemetry import Telemetry
 
 
 class GenerationPipeline:
+    """Aday uretir, dogrular, puanlar; en iyi adayi dondurur (rejection sampling).
+
+    max_workers > 1 ise generate_best adaylari sinirli bir thread havuzunda
+    paralel calistirir (model cagrilari I/O bekledigi icin istek suresi ~n
+    cagridan ~n/max_workers cagriya iner). Havuz pipeline basina tektir;
+    ayni anda gelen istekler de toplamda max_workers cagriyi gecmez.
+
+    sampling: hedef puana ulasinca duran, butceyi gerektikce genisleten aday
+    politikasi (bkz. SamplingPolicy; varsayilan hedef MAX_SCORE).
+
+    Dogrulama asamali calisir (self.validation): hard -> type -> semantic,
+    maliyet sirasiyla; bir asama adayi elerse sonrakiler (LLM judge dahil)
+    calismaz. Asama basina eleme sayisi ve sure: self.validation.stats().
+
+    Onarim (JSON / highlight) ve judge cagrilari ayni girdiye ayni cevabi
+    bekledigi icin model.cache (ResponseCache) varsa oradan okunur; aday
+    uretimi cache'i her zaman atlar.
+    """
+
+    # Judge'dan once calisan ucuz asamalar
+    CHEAP_STAGES = ("hard", "type")
+
     def __init__(
         self,
         model: ModelClient,
@@ -21,6 +48,8 @@ class GenerationPipeline:
         judge_min_confidence: float = 0.55,
         judge_min_alignment: float = 6.0,
         telemetry: Optional[Telemetry] = None,
+        max_workers: int = 1,
+        sampling: Optional[SamplingPolicy] = None,
     ):
         self.model = model
         self.selector = selector
@@ -32,7 +61,32 @@ class GenerationPipeline:
             min_alignment=judge_min_alignment,
         )
         self.enable_semantic_judge = enable_semantic_judge
+        self.validation = StagedValidator([
+            Stage("hard", HardValidator.COST, lambda q, ctx: self.hard.validate(q, fail_fast=True), HardValidator.FIELDS),
+            Stage("type", TypeRuleValidator.COST, lambda q, ctx: self.typev.validate(q), TypeRuleValidator.FIELDS),
+            Stage("semantic", SemanticJudge.COST, lambda q, ctx: self.semantic.evaluate(q, **ctx), SemanticJudge.FIELDS),
+        ])
         self.telemetry = telemetry or Telemetry.default()
+        self.max_workers = max(1, max_workers)
+        self.sampling = sampling or SamplingPolicy()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="lgs-candidate"
+                    )
+        return self._executor
+
+    def close(self) -> None:
+        """Aday havuzunu kapatir (bekleyen adaylar iptal edilir)."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
 
     def _try_parse(self, s: str) -> Optional[Dict[str, Any]]:
         s = s.strip()
@@ -43,7 +97,12 @@ class GenerationPipeline:
         except Exception:
             return None
 
-    def _repair_to_json(self, raw: str, prompt: str) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _seed_kwargs(seed: Optional[int]) -> Dict[str, Any]:
+        # seed sadece verildiginde iletilir (seed desteklemeyen istemciler bozulmasin)
+        return {} if seed is None else {"seed": seed}
+
+    def _repair_to_json(self, raw: str, prompt: str, seed: Optional[int] = None) -> Optional[Dict[str, Any]]:
         repair_prompt = (
             "Aşağıdaki metni SADECE geçerli JSON olacak şekilde düzelt. "
             "JSON dışında hiçbir açıklama yazma.\n\n"
@@ -55,6 +114,8 @@ class GenerationPipeline:
                 temperature=0.2,
                 top_p=0.9,
                 max_new_tokens=500,
+                cache=True,
+                **self._seed_kwargs(seed),
             )
         except Exception:
             self.telemetry.log(stage="json_repair_exception", prompt=prompt, raw=raw)
@@ -65,7 +126,7 @@ class GenerationPipeline:
             self.telemetry.log(stage="json_repair_failed", prompt=prompt, raw=repaired)
         return obj
 
-    def _repair_highlight(self, q: Dict[str, Any], prompt: str) -> Optional[Dict[str, Any]]:
+    def _repair_highlight(self, q: Dict[str, Any], prompt: str, seed: Optional[int] = None) -> Optional[Dict[str, Any]]:
         j = json.dumps(q, ensure_ascii=False)
         repair_prompt = (
             "Aşağıdaki JSON bir LGS sorusudur. SADECE JSON döndür. "
@@ -84,6 +145,8 @@ class GenerationPipeline:
                 temperature=0.2,
                 top_p=0.9,
                 max_new_tokens=700,
+                cache=True,
+                **self._seed_kwargs(seed),
             )
         except Exception:
             self.telemetry.log(stage="highlight_repair_exception", prompt=prompt, parsed=q)
@@ -101,89 +164,230 @@ class GenerationPipeline:
         *,
         expected_question_type: Optional[str] = None,
         expected_topic_family: Optional[str] = None,
+        seed: Optional[int] = None,
+        deadline_s: Optional[float] = None,
+        policy: Optional[SamplingPolicy] = None,
     ) -> Dict[str, Any]:
+        """En fazla n aday arasindan en yuksek puanli gecerli adayi dondurur.
+
+        - Adaylar dalgalar halinde uretilir (policy, varsayilan self.sampling):
+          ilk dalga question_type'in telemetrideki gecme oranina gore boyutlanir,
+          target_score'a ulasan aday cikinca kalan adaylar uretilmez.
+        - seed verilirse i. aday seed + i ile uretilir; sonuclar aday sirasina
+          gore toplanir, esit puanda (ve hedefe ulasanlar arasinda) kucuk indeks
+          kazanir. Boylece paralel ve sirali calisma ayni adayi secer.
+        - deadline_s: istegin toplam suresi (sn). Sure dolunca bitmemis adaylar
+          beklenmez; o ana kadarki en iyi aday doner, hic yoksa TimeoutError.
+        """
+        policy = policy or self.sampling
+        n = max(1, n)
+        deadline = time.monotonic() + deadline_s if deadline_s is not None else None
+        seeds = [None if seed is None else seed + i for i in range(n)]
+
+        def run(i: int) -> Optional[Tuple[float, Dict[str, Any]]]:
+            return self._evaluate_candidate(
+                prompt,
+                seed=seeds[i],
+                deadline=deadline,
+                expected_question_type=expected_question_type,
+                expected_topic_family=expected_topic_family,
+            )
+
+        results: List[Optional[Tuple[float, Dict[str, Any]]]] = [None] * n
+        completed = 0
+        hit: Optional[int] = None
+        expired = False
+        pass_rate = self.telemetry.pass_rate(
+            expected_question_type, prior=policy.prior_pass_rate, prior_weight=policy.prior_weight
+        )
+        start = 0
+        for size in policy.waves(pass_rate, n):
+            wave = range(start, start + size)
+            start += size
+            done, hit, expired = self._run_wave(prompt, wave, run, results, deadline, policy.target_score)
+            completed += done
+            if hit is not None or expired:
+                break
+
+        timed_out = expired or (hit is None and completed < n)
+        if timed_out:
+            self.telemetry.log(
+                stage="deadline_exceeded",
+                prompt=prompt,
+                extra={"deadline_s": deadline_s, "completed": completed, "n": n},
+            )
+
         best: Optional[Dict[str, Any]] = None
-        best_score = -1.0
-
-        for _ in range(max(1, n)):
-            # 1) üret
-            try:
-                raw = self.model.generate(prompt)
-            except Exception:
-                self.telemetry.log(stage="generate_exception", prompt=prompt)
-                continue
-
-            # 2) parse / repair
-            obj = self._try_parse(raw)
-            if not obj:
-                self.telemetry.log(stage="json_parse_failed", prompt=prompt, raw=raw)
-                obj = self._repair_to_json(raw, prompt)
-                if not obj:
-                    continue
-
-            # 3) type kilidi
-            if expected_question_type:
-                obj["question_type"] = expected_question_type
-
-            # 4) hard + type
-            h = self.hard.validate(obj)
-            if not h.ok:
-                self.telemetry.log(stage="hard_fail", prompt=prompt, parsed=obj, errors=h.errors)
-                continue
-
-            t = self.typev.validate(obj)
-            if not t.ok:
-                # highlight özel repair
-                if any(e in {"highlight_required", "highlight_not_in_text"} for e in t.errors):
-                    repaired = self._repair_highlight(obj, prompt)
-                    if repaired:
-                        if expected_question_type:
-                            repaired["question_type"] = expected_question_type
-                        h2 = self.hard.validate(repaired)
-                        t2 = self.typev.validate(repaired)
-                        if h2.ok and t2.ok:
-                            obj = repaired
-                            h = h2
-                            t = t2
-                        else:
-                            self.telemetry.log(
-                                stage="type_fail_after_highlight_repair",
-                                prompt=prompt,
-                                parsed=repaired,
-                                errors=(h2.errors + t2.errors),
-                            )
-                            continue
-                    else:
-                        self.telemetry.log(stage="type_fail_highlight_repair_unavailable", prompt=prompt, parsed=obj, errors=t.errors)
-                        continue
-                else:
-                    self.telemetry.log(stage="type_fail", prompt=prompt, parsed=obj, errors=t.errors)
-                    continue
-
-            # 5) semantic judge (ayrı judge ile)
-            sem_score = 1.0
-            if self.enable_semantic_judge:
-                sem = self.semantic.evaluate(
-                    obj,
-                    expected_question_type=expected_question_type,
-                    expected_topic_family=expected_topic_family,
-                )
-                if not sem.ok:
-                    self.telemetry.log(
-                        stage="semantic_fail",
-                        prompt=prompt,
-                        parsed=obj,
-                        errors=sem.errors,
-                        extra={"judge_payload": sem.judge_payload},
-                    )
-                    continue
-                sem_score = sem.score
+        if hit is not None:
+            best = results[hit][1]
+        else:
+            best_score = -1.0
+            for result in results:
+                if result is not None and result[0] > best_score:
+                    best_score, best = result
 
-            score = float(h.score) + float(t.score) + float(sem_score)
-            if score > best_score:
-                best_score = score
-                best = obj
+        self.telemetry.record_request(
+            expected_question_type,
+            candidates=completed,
+            passed=sum(result is not None for result in results),
+            accepted=bool(best),
+        )
 
         if not best:
+            if timed_out:
+                raise TimeoutError(f"No valid candidate produced within {deadline_s}s")
             raise ValueError("No valid candidate produced")
         return best
+
+    def _run_wave(
+        self,
+        prompt: str,
+        wave: range,
+        run: Callable[[int], Optional[Tuple[float, Dict[str, Any]]]],
+        results: List[Optional[Tuple[float, Dict[str, Any]]]],
+        deadline: Optional[float],
+        target_score: float,
+    ) -> Tuple[int, Optional[int], bool]:
+        """Bir dalgadaki adaylari calistirir -> (tamamlanan, hedefe ulasan en kucuk indeks, sure doldu mu)."""
+
+        def reached(i: int) -> bool:
+            return results[i] is not None and results[i][0] >= target_score
+
+        completed = 0
+        if self.max_workers == 1 or len(wave) == 1:
+            for i in wave:
+                if self._expired(deadline):
+                    return completed, None, True
+                results[i] = self._run_candidate(prompt, lambda: run(i))
+                completed += 1
+                if reached(i):
+                    return completed, i, False
+            return completed, None, False
+
+        futures: Dict[Future, int] = {self._pool().submit(run, i): i for i in wave}
+        pending = set(futures)
+        hit: Optional[int] = None
+        expired = False
+        # hedefe ulasan bir aday varsa sadece ondan kucuk indeksli adaylar beklenir
+        while pending and (hit is None or any(futures[f] < hit for f in pending)):
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                expired = True
+                break
+            for fut in done:
+                i = futures[fut]
+                results[i] = self._run_candidate(prompt, fut.result)
+                completed += 1
+                if reached(i) and (hit is None or i < hit):
+                    hit = i
+        for fut in pending:
+            fut.cancel()
+        return completed, hit, expired and hit is None
+
+    def _run_candidate(
+        self, prompt: str, fn: Callable[[], Optional[Tuple[float, Dict[str, Any]]]]
+    ) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Aday hatasi generate_best'i bozmaz: loglanir, aday elenmis sayilir (sirali ve paralel ayni)."""
+        try:
+            return fn()
+        except Exception as e:
+            self.telemetry.log(stage="candidate_exception", prompt=prompt, errors=[repr(e)])
+            return None
+
+    def _skip_semantic(self) -> None:
+        # Ucuz asamalarda elenen aday judge'a hic gitmedi (onarimla kurtarilanlar sayilmaz)
+        if self.enable_semantic_judge:
+            self.validation.record_skip("semantic")
+
+    @staticmethod
+    def _expired(deadline: Optional[float]) -> bool:
+        return deadline is not None and time.monotonic() >= deadline
+
+    def _evaluate_candidate(
+        self,
+        prompt: str,
+        *,
+        seed: Optional[int] = None,
+        deadline: Optional[float] = None,
+        expected_question_type: Optional[str] = None,
+        expected_topic_family: Optional[str] = None,
+    ) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Tek aday: uret -> parse/repair -> hard + type -> judge. Elenirse None."""
+        # 1) uret (ornekleme: her aday farkli olmali, cache atlanir)
+        try:
+            raw = self.model.generate(prompt, cache=False, **self._seed_kwargs(seed))
+        except Exception:
+            self.telemetry.log(stage="generate_exception", prompt=prompt)
+            return None
+
+        # 2) parse / repair
+        obj = self._try_parse(raw)
+        if not obj:
+            self.telemetry.log(stage="json_parse_failed", prompt=prompt, raw=raw)
+            if self._expired(deadline):
+                return None
+            obj = self._repair_to_json(raw, prompt, seed)
+            if not obj:
+                return None
+
+        # 3) type kilidi
+        if expected_question_type:
+            obj["question_type"] = expected_question_type
+
+        # 4) hard + type (ucuz asamalar, maliyet sirasiyla; ilk elemede durur)
+        context = {
+            "expected_question_type": expected_question_type,
+            "expected_topic_family": expected_topic_family,
+        }
+        cache: Dict[str, Any] = {}
+        cheap = self.validation.validate(obj, context=context, cache=cache, stages=self.CHEAP_STAGES)
+        if not cheap.ok:
+            # highlight özel repair
+            if cheap.failed_stage == "type" and any(e in {"highlight_required", "highlight_not_in_text"} for e in cheap.errors):
+                repaired = None if self._expired(deadline) else self._repair_highlight(obj, prompt, seed)
+                if repaired:
+                    if expected_question_type:
+                        repaired["question_type"] = expected_question_type
+                    # degismeyen alanlarin asama sonuclari cache'ten gelir
+                    cheap2 = self.validation.validate(repaired, context=context, cache=cache, stages=self.CHEAP_STAGES)
+                    if cheap2.ok:
+                        obj = repaired
+                        cheap = cheap2
+                    else:
+                        self.telemetry.log(
+                            stage="type_fail_after_highlight_repair",
+                            prompt=prompt,
+                            parsed=repaired,
+                            errors=cheap2.errors,
+                        )
+                        self._skip_semantic()
+                        return None
+                else:
+                    self.telemetry.log(stage="type_fail_highlight_repair_unavailable", prompt=prompt, parsed=obj, errors=cheap.errors)
+                    self._skip_semantic()
+                    return None
+            else:
+                self.telemetry.log(stage=f"{cheap.failed_stage}_fail", prompt=prompt, parsed=obj, errors=cheap.errors)
+                self._skip_semantic()
+                return None
+
+        # 5) semantic judge (ayrı judge ile; sadece ucuz asamalari gecen aday icin)
+        sem_score = 1.0
+        if self.enable_semantic_judge:
+            if self._expired(deadline):
+                return None
+            sem = self.validation.validate(obj, context=context, cache=cache, stages=("semantic",))
+            if not sem.ok:
+                self.telemetry.log(
+                    stage="semantic_fail",
+                    prompt=prompt,
+                    parsed=obj,
+                    errors=sem.errors,
+                    extra={"judge_payload": sem.results["semantic"].judge_payload},
+                )
+                return None
+            sem_score = sem.score
+
+        score = float(cheap.score) + float(sem_score)
+        return score, obj
@@ -1,17 +1,10 @@
 from __future__ import annotations
 
 import random
-from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import List, Optional
 
-import yaml
-
-
-@dataclass(frozen=True)
-class _RulesIndex:
-    all_types: List[str]
-    by_family: Dict[str, List[str]]
+from .config_store import ContractSnapshot, ContractStore
 
 
 class QuestionTypeSelector:
@@ -23,31 +16,14 @@ class QuestionTypeSelector:
     - Istenirse dogrudan tip kilitlemek (explicit_type)
     """
 
-    def __init__(self, contract_path: Optional[Path] = None):
-        if contract_path is None:
-            contract_path = Path(__file__).resolve().parents[3] / "configs" / "question_type_rules.yaml"
-        self.contract_path = contract_path
-        self._index = self._build_index()
-
-    def _build_index(self) -> _RulesIndex:
-        obj = yaml.safe_load(self.contract_path.read_text(encoding="utf-8")) or {}
-        rules = obj.get("rules", {}) or {}
-
-        by_family: Dict[str, List[str]] = {}
-        all_types: List[str] = []
-
-        for qtype, r in rules.items():
-            all_types.append(qtype)
-            fam = str(r.get("topic_family", "")).strip()
-            if fam:
-                by_family.setdefault(fam, []).append(qtype)
-
-        # stabil order
-        all_types.sort()
-        for fam in list(by_family.keys()):
-            by_family[fam].sort()
+    def __init__(self, contract_path: Optional[Path] = None, *, store: Optional[ContractStore] = None):
+        # Sozlesme paylasilan store'dan okunur; dosya degisince yeniden baslatmadan guncellenir
+        self.store = store or ContractStore.for_path(contract_path)
+        self.contract_path = self.store.path
 
-        return _RulesIndex(all_types=all_types, by_family=by_family)
+    @property
+    def _index(self) -> ContractSnapshot:
+        return self.store.snapshot()
 
     def available_families(self) -> List[str]:
         return sorted(self._index.by_family.keys())
@@ -74,11 +50,12 @@ class QuestionTypeSelector:
         """
 
         mode = (mode or "mixed").strip().lower()
+        index = self._index
 
         if mode == "explicit_type":
             if not explicit_question_type:
                 raise ValueError("mode=explicit_type icin question_type gerekli")
-            if explicit_question_type not in self._index.all_types:
+            if explicit_question_type not in index.rules:
                 raise ValueError(f"Bilinmeyen question_type: {explicit_question_type}")
             return explicit_question_type
 
@@ -87,10 +64,10 @@ class QuestionTypeSelector:
         if mode == "family":
             if not topic_family:
                 raise ValueError("mode=family icin topic_family gerekli")
-            candidates = self._index.by_family.get(topic_family, [])
+            candidates = index.by_family.get(topic_family, ())
             if not candidates:
                 raise ValueError(f"topic_family icin hic question_type yok: {topic_family}")
             return rng.choice(candidates)
 
         # mixed
-        return rng.choice(self._index.all_types)
+        return rng.choice(index.all_types)
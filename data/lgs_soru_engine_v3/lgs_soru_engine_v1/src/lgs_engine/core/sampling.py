@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import List
+
+# HardValidator + TypeRuleValidator + SemanticJudge puanlarinin toplami (her biri en fazla 1.0)
+MAX_SCORE = 3.0
+
+
+@dataclass(frozen=True)
+class SamplingPolicy:
+    """generate_best icin uyarlamali aday butcesi.
+
+    - target_score: bu puana ulasan ilk aday kabul edilir, kalan adaylar
+      uretilmez (varsayilan MAX_SCORE: daha iyisi olamayacagi icin secim
+      tum n adayi denemekle aynidir).
+    - Ilk dalga: question_type'in telemetriden ogrenilen gecme oranina gore
+      en az bir adayin `confidence` olasilikla gececegi kadar aday.
+    - Dalgada hedefe ulasan yoksa butce `growth` katiyla genisler (toplam
+      en fazla n).
+    """
+
+    target_score: float = MAX_SCORE
+    confidence: float = 0.9
+    growth: float = 2.0
+    min_wave: int = 1
+    # Telemetride hic kaydi olmayan tip icin varsayilan gecme orani ve agirligi
+    prior_pass_rate: float = 0.3
+    prior_weight: float = 4.0
+
+    def first_wave(self, pass_rate: float, n: int) -> int:
+        """Gecme orani p iken 1 - (1 - p)^k >= confidence saglayan en kucuk k (n ile sinirli)."""
+        if pass_rate >= 1.0:
+            k = 1
+        elif pass_rate <= 0.0:
+            k = n
+        else:
+            k = math.ceil(math.log(1.0 - self.confidence) / math.log(1.0 - pass_rate))
+        return max(1, min(n, max(self.min_wave, k)))
+
+    def waves(self, pass_rate: float, n: int) -> List[int]:
+        """n adayin dalga boyutlari (toplami n)."""
+        sizes: List[int] = []
+        size = self.first_wave(pass_rate, n)
+        remaining = n
+        while remaining > 0:
+            take = min(remaining, size)
+            sizes.append(take)
+            remaining -= take
+            size = max(size + 1, math.ceil(size * self.growth))
+        return sizes
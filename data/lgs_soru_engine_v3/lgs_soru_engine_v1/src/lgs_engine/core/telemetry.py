@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+import os
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, Optional
@@ -15,9 +17,26 @@ class Telemetry:
     Amaç:
     - Üretimde elenen adayları nedenleriyle kaydetmek
     - Sonraki fine-tune için "negative training" havuzu oluşturmak
+
+    log() thread-safe'dir: paralel adaylarin kayitlari satir satir yazilir.
+
+    Ayrica question_type basina aday / gecen aday sayilarini tutar
+    (stats_path verilirse JSON olarak saklanir); SamplingPolicy ilk dalga
+    boyutunu buradan ogrenilen gecme oranina gore secer.
     """
 
     out_path: Path
+    stats_path: Optional[Path] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+    _stats_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+    _stats: Dict[str, Dict[str, int]] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if self.stats_path is not None and self.stats_path.exists():
+            try:
+                self._stats = json.loads(self.stats_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._stats = {}
 
     @classmethod
     def default(cls) -> "Telemetry":
@@ -25,7 +44,7 @@ class Telemetry:
         root = Path(__file__).resolve().parents[3]
         data_dir = root / "data"
         data_dir.mkdir(parents=True, exist_ok=True)
-        return cls(out_path=data_dir / "hard_negatives.jsonl")
+        return cls(out_path=data_dir / "hard_negatives.jsonl", stats_path=data_dir / "pass_rates.json")
 
     def log(
         self,
@@ -51,5 +70,43 @@ class Telemetry:
         if extra is not None:
             rec["extra"] = extra
 
-        with self.out_path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with self._lock, self.out_path.open("a", encoding="utf-8") as f:
+            f.write(line)
+
+    def record_request(
+        self,
+        question_type: Optional[str],
+        *,
+        candidates: int,
+        passed: int,
+        accepted: bool,
+    ) -> None:
+        """Bir generate_best isteginin sonucu: degerlendirilen / gecen aday sayisi."""
+        key = question_type or "*"
+        with self._stats_lock:
+            st = self._stats.setdefault(key, {"requests": 0, "accepted": 0, "candidates": 0, "passed": 0})
+            st["requests"] += 1
+            st["accepted"] += int(accepted)
+            st["candidates"] += candidates
+            st["passed"] += passed
+            if self.stats_path is not None:
+                tmp = self.stats_path.with_suffix(self.stats_path.suffix + ".tmp")
+                tmp.write_text(json.dumps(self._stats, ensure_ascii=False, indent=2), encoding="utf-8")
+                os.replace(tmp, self.stats_path)
+
+    def pass_rate(self, question_type: Optional[str], *, prior: float, prior_weight: float) -> float:
+        """Adayin tum dogrulamalari gecme orani (prior ile yumusatilmis)."""
+        st = self._stats.get(question_type or "*", {})
+        passed = st.get("passed", 0)
+        candidates = st.get("candidates", 0)
+        return (passed + prior * prior_weight) / (candidates + prior_weight)
+
+    def sampling_stats(self) -> Dict[str, Dict[str, float]]:
+        """question_type basina gecme orani ve kabul edilen soru basina aday (model cagrisi) sayisi."""
+        with self._stats_lock:
+            stats = {k: dict(v) for k, v in self._stats.items()}
+        for st in stats.values():
+            st["pass_rate"] = round(st["passed"] / st["candidates"], 4) if st["candidates"] else 0.0
+            st["candidates_per_accepted"] = round(st["candidates"] / st["accepted"], 3) if st["accepted"] else 0.0
+        return stats
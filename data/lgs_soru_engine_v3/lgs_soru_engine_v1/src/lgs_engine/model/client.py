@@ -1,7 +1,24 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Optional
+import asyncio
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from .http_pool import ConnectionPool, HTTPStatusError
+from .response_cache import ResponseCache
+
+# Tekrar denenebilir HTTP durumlari (asiri yuk / gecici sunucu hatasi)
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class ModelClientError(RuntimeError):
+    """Model endpoint'i tekrar denemelerden sonra da cevap vermedi."""
 
 
 @dataclass
@@ -11,10 +28,93 @@ class ModelClient:
 
     - base_url: üretici model endpoint (generator)
     - judge_url: denetleyici model endpoint (judge) -> ayrı tutulması önerilir
+
+    Her endpoint'in kendi keep-alive baglanti havuzu vardir (ConnectionPool):
+    max_connections hem havuz boyutu hem endpoint basina es zamanli istek
+    siniridir. Gecici hatalar (baglanti/timeout, 408/429/5xx) jitter'li
+    ustel bekleme ile en fazla `retries` kez tekrar denenir.
+
+    cache (ResponseCache) verilirse cache=True cagrilarin cevabi (endpoint,
+    prompt, sampling parametreleri) anahtariyla diskte saklanir: judge
+    varsayilan olarak cache'ten okunur, generate sadece cache=True ile
+    (onarim cagrilari); ornekleyen aday uretimi cache'i atlar.
+
+    Istek: POST {url}{path} {"prompt": {"user": ...}, sampling parametreleri}
+    Cevap: {"result": "<ham model ciktisi>"} (Colab /generate ile ayni)
     """
 
     base_url: Optional[str] = None
     judge_url: Optional[str] = None
+    generate_path: str = "/generate"
+    judge_path: str = "/judge"
+    timeout: float = 120.0
+    max_connections: int = 4
+    judge_max_connections: int = 2
+    retries: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 8.0
+    verify_ssl: bool = True
+    cache: Optional[ResponseCache] = None
+    _pools: Dict[str, ConnectionPool] = field(default_factory=dict, init=False, repr=False)
+    _pools_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _executor: Optional[ThreadPoolExecutor] = field(default=None, init=False, repr=False)
+
+    def _pool(self, url: str, max_connections: int) -> ConnectionPool:
+        pool = self._pools.get(url)
+        if pool is None:
+            with self._pools_lock:
+                pool = self._pools.get(url)
+                if pool is None:
+                    pool = ConnectionPool(
+                        url, max_connections=max_connections, timeout=self.timeout, verify_ssl=self.verify_ssl
+                    )
+                    self._pools[url] = pool
+        return pool
+
+    def _post(self, pool: ConnectionPool, path: str, payload: Dict[str, Any]) -> str:
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                # full jitter: ayni anda hata alan adaylar sunucuya ayni anda donmesin
+                time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1))))
+            try:
+                data = pool.post_json(path, payload)
+            except HTTPStatusError as e:
+                if e.status not in RETRY_STATUSES:
+                    raise ModelClientError(f"{pool.url}{path}: {e}") from e
+                last_error = e
+                continue
+            except (OSError, http.client.HTTPException) as e:  # baglanti hatasi, timeout
+                last_error = e
+                continue
+            except ValueError as e:  # JSON olmayan cevap
+                raise ModelClientError(f"{pool.url}{path}: gecersiz JSON cevap") from e
+            return str(data.get("result", data.get("response", "")) or "")
+        raise ModelClientError(f"{pool.url}{path}: {self.retries + 1} denemede basarisiz: {last_error}") from last_error
+
+    def _cached_post(self, pool: ConnectionPool, path: str, payload: Dict[str, Any], cache: bool) -> str:
+        if not cache or self.cache is None:
+            return self._post(pool, path, payload)
+        # anahtar URL'yi degil yolu icerir: Colab/ngrok adresi degisse de cache gecerli kalir
+        prompt = payload["prompt"]["user"]
+        params = {k: v for k, v in payload.items() if k != "prompt"}
+        key, hit = self.cache.lookup(path, prompt, params)
+        if hit is not None:
+            return hit
+        result = self._post(pool, path, payload)
+        # yarim / bozuk JSON saklanmaz; ayni girdi tekrar denenince yeniden uretilir
+        if self._is_json_object(result):
+            self.cache.put(path, key, result)
+        return result
+
+    @staticmethod
+    def _is_json_object(s: str) -> bool:
+        if "{" not in s or "}" not in s:
+            return False
+        try:
+            return isinstance(json.loads(s[s.find("{") : s.rfind("}") + 1]), dict)
+        except ValueError:
+            return False
 
     def generate(
         self,
@@ -24,12 +124,15 @@ class ModelClient:
         top_p: float = 0.9,
         max_new_tokens: int = 800,
         repetition_penalty: float = 1.12,
+        seed: Optional[int] = None,
+        cache: bool = False,
     ) -> str:
         """
         Üretici modele istek atar.
-        Bu repo iskeletinde gerçek HTTP çağrısı yok: kendi Colab/FastAPI inference'ına bağlamalısın.
 
         Beklenen: prompt -> raw string JSON
+        seed: verilirse sampling deterministik olmali (GenerationPipeline aday basina farkli seed verir)
+        cache: True ise self.cache'ten okunur / yazilir (ayni girdiye ayni cevap beklenen cagrilar)
         """
         if not self.base_url:
             raise RuntimeError(
@@ -37,9 +140,16 @@ class ModelClient:
                 "Colab inference server URL'ini base_url olarak ver."
             )
 
-        # TODO: Buraya gerçek HTTP POST ekle.
-        # Şimdilik iskelet:
-        raise NotImplementedError("generate(): HTTP entegrasyonu eklenmedi")
+        payload: Dict[str, Any] = {
+            "prompt": {"user": prompt},
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_new_tokens": max_new_tokens,
+            "repetition_penalty": repetition_penalty,
+        }
+        if seed is not None:
+            payload["seed"] = seed
+        return self._cached_post(self._pool(self.base_url, self.max_connections), self.generate_path, payload, cache)
 
     def generate_judge(
         self,
@@ -48,10 +158,12 @@ class ModelClient:
         temperature: float = 0.2,
         top_p: float = 0.9,
         max_new_tokens: int = 300,
+        cache: bool = True,
     ) -> str:
         """
         Judge modele istek atar.
         judge_url verilmezse base_url kullanır (fallback) ama önerilmez.
+        Judge istemi aday tarafindan belirlendigi icin varsayilan olarak cache'lenir.
         """
         url = self.judge_url or self.base_url
         if not url:
@@ -60,5 +172,48 @@ class ModelClient:
                 "Ayrı judge modeli önerilir (judge_url)."
             )
 
-        # TODO: Buraya gerçek HTTP POST ekle.
-        raise NotImplementedError("generate_judge(): HTTP entegrasyonu eklenmedi")
+        payload = {
+            "prompt": {"user": prompt},
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_new_tokens": max_new_tokens,
+        }
+        # judge_url ayri ise kendi havuzu (ve siniri) vardir; uretici cagrilari judge'i bekletmez
+        max_connections = self.judge_max_connections if self.judge_url else self.max_connections
+        return self._cached_post(self._pool(url, max_connections), self.judge_path, payload, cache)
+
+    # ---- asyncio arayuzu ----
+
+    def _async_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._pools_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_connections + self.judge_max_connections,
+                        thread_name_prefix="lgs-model-client",
+                    )
+        return self._executor
+
+    async def agenerate(self, prompt: str, **kwargs: Any) -> str:
+        """generate() ile ayni; havuz ve siniri paylasir, event loop'u bloklamaz."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._async_executor(), lambda: self.generate(prompt, **kwargs))
+
+    async def agenerate_judge(self, prompt: str, **kwargs: Any) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._async_executor(), lambda: self.generate_judge(prompt, **kwargs))
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        return {url: vars(pool.stats).copy() for url, pool in self._pools.items()}
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        return self.cache.stats() if self.cache is not None else None
+
+    def close(self) -> None:
+        with self._pools_lock:
+            pools, self._pools = list(self._pools.values()), {}
+            executor, self._executor = self._executor, None
+        for pool in pools:
+            pool.close()
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import http.client
+import json
+import ssl
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Yeniden kullanilan (keep-alive) baglanti sunucu tarafinda kapanmissa alinan hatalar
+_STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError, http.client.CannotSendRequest)
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, status: int, body: str):
+        super().__init__(f"HTTP {status}: {body[:200]}")
+        self.status = status
+        self.body = body
+
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    connections_opened: int = 0
+    reused: int = 0
+    stale_retries: int = 0
+
+
+class ConnectionPool:
+    """Tek bir endpoint (scheme://host:port) icin keep-alive HTTP baglanti havuzu.
+
+    - Ayni anda en fazla max_connections istek (endpoint basina es zamanlilik siniri);
+      fazlasi bir baglanti bosalana kadar bekler.
+    - Biten istegin baglantisi kapatilmaz, sonraki istek ayni TCP/TLS baglantisini
+      kullanir (baglanti kurulumu her adayda odenmez).
+    - Sunucunun kapattigi bosta baglanti bir kez yenisiyle tekrar denenir.
+    """
+
+    def __init__(self, url: str, *, max_connections: int = 4, timeout: float = 120.0, verify_ssl: bool = True):
+        parts = urlsplit(url)
+        if parts.scheme not in {"http", "https"} or not parts.hostname:
+            raise ValueError(f"Gecersiz URL: {url!r}")
+        self.url = url
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max(1, max_connections)
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        if self.scheme == "https":
+            self._ssl_context = ssl.create_default_context() if verify_ssl else ssl._create_unverified_context()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self.stats = PoolStats()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        with self._lock:
+            self.stats.connections_opened += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self._ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _checkout(self) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                self.stats.reused += 1
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _checkin(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.append(conn)
+
+    def post_json(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST JSON -> JSON cevap. 2xx disi durumlar HTTPStatusError."""
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Accept": "application/json", "Connection": "keep-alive"}
+        with self._slots:
+            with self._lock:
+                self.stats.requests += 1
+            conn, reused = self._checkout()
+            while True:
+                try:
+                    conn.request("POST", self.base_path + path, body=body, headers=headers)
+                    resp = conn.getresponse()
+                    data = resp.read()
+                    break
+                except _STALE_ERRORS:
+                    conn.close()
+                    if not reused:
+                        raise
+                    # bosta beklerken sunucunun kapattigi baglanti: yenisiyle bir kez daha
+                    with self._lock:
+                        self.stats.stale_retries += 1
+                    conn, reused = self._connect(), False
+                except BaseException:
+                    conn.close()
+                    raise
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._checkin(conn)
+
+        text = data.decode("utf-8", errors="replace")
+        if not 200 <= resp.status < 300:
+            raise HTTPStatusError(resp.status, text)
+        return json.loads(text) if text.strip() else {}
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+class ResponseCache:
+    """Deterministik model cagrilari icin diskte, icerik adresli cevap cache'i.
+
+    - Anahtar: sha256(endpoint yolu, prompt, sampling parametreleri); dosya
+      root/<ilk 2 hex>/<hash>.json. Ayni girdi ayni dosyaya duser, surecler
+      (augment_missing tekrar calistirmalari) arasinda paylasilir.
+    - ttl_s: kayit bu sureden eskiyse miss sayilir ve silinir.
+    - max_bytes: toplam boyut asilinca en uzun suredir kullanilmayan kayitlar
+      silinir (isabet dosyanin mtime'ini gunceller).
+    - stats(): endpoint basina hit / miss / hit_rate.
+
+    Anahtarda sunucu adresi yoktur; farkli modeller icin ayri root kullanin.
+
+    Sadece sonucu girdisiyle belirlenen cagrilar (onarim, judge) icin; ornekleme
+    ile aday ureten cagrilar cache'i atlamalidir (ModelClient.generate(cache=False)).
+    """
+
+    def __init__(self, root: Path, *, max_bytes: int = 64 * 1024 * 1024, ttl_s: float = 7 * 24 * 3600):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # path -> boyut, en eski kullanilan basta (LRU)
+        self._index: "OrderedDict[Path, int]" = OrderedDict()
+        self._bytes = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._evictions = 0
+        self._expired = 0
+        self._scan()
+
+    @classmethod
+    def default(cls) -> "ResponseCache":
+        # Telemetry.default ile ayni data/ klasoru
+        root = Path(__file__).resolve().parents[3]
+        return cls(root / "data" / "response_cache")
+
+    def _scan(self) -> None:
+        entries = []
+        for path in self.root.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, path, st.st_size))
+        for _, path, size in sorted(entries):
+            self._index[path] = size
+            self._bytes += size
+
+    @staticmethod
+    def make_key(endpoint: str, prompt: str, params: Dict[str, Any]) -> str:
+        blob = json.dumps([endpoint, prompt, params], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def _count(self, endpoint: str, name: str) -> None:
+        st = self._stats.setdefault(endpoint, {"hits": 0, "misses": 0, "writes": 0})
+        st[name] += 1
+
+    def _forget(self, path: Path) -> None:
+        size = self._index.pop(path, None)
+        if size is not None:
+            self._bytes -= size
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def get(self, endpoint: str, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            rec = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            rec = None
+        with self._lock:
+            if rec is not None and time.time() - float(rec.get("created", 0)) > self.ttl_s:
+                self._expired += 1
+                self._forget(path)
+                rec = None
+            if rec is None:
+                self._count(endpoint, "misses")
+                return None
+            self._count(endpoint, "hits")
+            if path in self._index:
+                self._index.move_to_end(path)
+        try:
+            os.utime(path)  # diger surecler icin de son kullanim
+        except OSError:
+            pass
+        return str(rec.get("result", ""))
+
+    def put(self, endpoint: str, key: str, result: str) -> None:
+        path = self._path(key)
+        data = json.dumps({"created": time.time(), "endpoint": endpoint, "result": result}, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._bytes -= self._index.pop(path, 0)
+            self._index[path] = size
+            self._bytes += size
+            self._count(endpoint, "writes")
+            while self._bytes > self.max_bytes and len(self._index) > 1:
+                oldest = next(iter(self._index))
+                self._forget(oldest)
+                self._evictions += 1
+
+    def lookup(self, endpoint: str, prompt: str, params: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        """-> (anahtar, cache'teki cevap veya None)"""
+        key = self.make_key(endpoint, prompt, params)
+        return key, self.get(endpoint, key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {k: dict(v) for k, v in self._stats.items()}
+            out: Dict[str, Any] = {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "evictions": self._evictions,
+                "expired": self._expired,
+            }
+        for st in endpoints.values():
+            lookups = st["hits"] + st["misses"]
+            st["hit_rate"] = round(st["hits"] / lookups, 4) if lookups else 0.0
+        out["endpoints"] = endpoints
+        return out
@@ -1,5 +1,8 @@
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
 @dataclass
 class ValidationResult:
@@ -8,5 +11,118 @@ class ValidationResult:
     errors: List[str]
 
 class Validator:
+    # Goreli maliyet (StagedValidator ucuz asamalari once calistirir)
+    COST: float = 1.0
+
     def validate(self, q: Dict[str, Any]) -> ValidationResult:
         raise NotImplementedError
+
+
+@dataclass(frozen=True)
+class Stage:
+    """Dogrulama asamasi.
+
+    run(q, context) -> ok / errors / score alanlari olan sonuc
+    (ValidationResult, SemanticResult ...). fields: asamanin okudugu
+    anahtarlar (cache anahtari); None ise tum soru.
+    """
+
+    name: str
+    cost: float
+    run: Callable[[Dict[str, Any], Dict[str, Any]], Any]
+    fields: Optional[Tuple[str, ...]] = None
+
+
+@dataclass
+class StagedResult:
+    ok: bool
+    score: float
+    errors: List[str]
+    failed_stage: Optional[str] = None
+    results: Dict[str, Any] = field(default_factory=dict)
+
+
+class StagedValidator:
+    """Asamalari maliyet sirasiyla calistirir, ilk elemede durur.
+
+    - Pahali asamalar (LLM judge) ancak ucuz asamalar gecilince calisir.
+    - cache (aday basina bir dict) verilirse asama sonuclari asamanin
+      okudugu alanlarin degerleriyle saklanir; ayni aday tekrar dogrulanirsa
+      (orn. highlight onarimindan sonra) degismeyen asamalar yeniden calismaz.
+    - stats(): asama basina calisma / eleme / cache isabeti sayisi ve sure.
+    """
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages: List[Stage] = sorted(stages, key=lambda s: s.cost)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {
+            s.name: {"runs": 0, "rejections": 0, "cache_hits": 0, "skipped": 0, "time_ms": 0.0} for s in self.stages
+        }
+
+    @staticmethod
+    def _cache_key(stage: Stage, q: Dict[str, Any], context: Dict[str, Any]) -> str:
+        if stage.fields is None:
+            values: Any = q
+        else:
+            values = [(f in q, q.get(f)) for f in stage.fields]
+        return json.dumps([stage.name, context, values], ensure_ascii=False, sort_keys=True, default=str)
+
+    def validate(
+        self,
+        q: Dict[str, Any],
+        *,
+        context: Optional[Dict[str, Any]] = None,
+        cache: Optional[Dict[str, Any]] = None,
+        stages: Optional[Iterable[str]] = None,
+    ) -> StagedResult:
+        """stages verilirse sadece o asamalar (yine maliyet sirasiyla) calisir."""
+        context = context or {}
+        selected = self.stages if stages is None else [s for s in self.stages if s.name in set(stages)]
+        result = StagedResult(ok=True, score=0.0, errors=[])
+        for i, stage in enumerate(selected):
+            key = self._cache_key(stage, q, context) if cache is not None else None
+            if key is not None and key in cache:
+                stage_result = cache[key]
+                self._count(stage.name, "cache_hits")
+            else:
+                start = time.perf_counter()
+                stage_result = stage.run(q, context)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                with self._lock:
+                    st = self._stats[stage.name]
+                    st["runs"] += 1
+                    st["time_ms"] += elapsed_ms
+                    if not stage_result.ok:
+                        st["rejections"] += 1
+                if key is not None:
+                    cache[key] = stage_result
+
+            result.results[stage.name] = stage_result
+            result.score += float(stage_result.score)
+            if not stage_result.ok:
+                result.ok = False
+                result.errors = list(stage_result.errors)
+                result.failed_stage = stage.name
+                for skipped in selected[i + 1:]:
+                    self._count(skipped.name, "skipped")
+                break
+        return result
+
+    def record_skip(self, name: str) -> None:
+        """Ayri validate() cagrisinda calisacak asama, onceki elemeden dolayi atlandi."""
+        self._count(name, "skipped")
+
+    def _count(self, name: str, key: str) -> None:
+        with self._lock:
+            self._stats[name][key] += 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            out = {}
+            for stage in self.stages:
+                st = dict(self._stats[stage.name])
+                st["cost"] = stage.cost
+                st["time_ms"] = round(st["time_ms"], 3)
+                st["avg_ms"] = round(st["time_ms"] / st["runs"], 3) if st["runs"] else 0.0
+                out[stage.name] = st
+            return out
@@ -24,8 +24,24 @@ class HardValidator:
     REQUIRED_KEYS = ["soru", "sik_a", "sik_b", "sik_c", "sik_d", "dogru_cevap", "question_type"]
     CHOICE_KEYS = ["sik_a", "sik_b", "sik_c", "sik_d"]
     VALID_ANSWERS = {"A", "B", "C", "D"}
-
-    def validate(self, q: Dict[str, Any]) -> ValidationResult:
+    # Dogrulamanin okudugu anahtarlar (StagedValidator cache anahtari)
+    FIELDS = tuple(REQUIRED_KEYS) + ("metin",)
+    COST = 1.0
+
+    # (kontrol, goreli maliyet): ucuz uzunluk/alan kontrolleri once,
+    # regex ve cumle bolme gerektirenler sonra calisir
+    CHECKS = (
+        ("_check_answer", 1.0),
+        ("_check_empty_choices", 1.0),
+        ("_check_stem_length", 1.0),
+        ("_check_text_length", 1.0),
+        ("_check_duplicate_choices", 2.0),
+        ("_check_garbage", 3.0),
+        ("_check_repetition", 5.0),
+    )
+
+    def validate(self, q: Dict[str, Any], *, fail_fast: bool = False) -> ValidationResult:
+        """fail_fast: ilk hatali kontrolde durur (pipeline; hata listesi tam olmaz)."""
         errors: List[str] = []
         score = 0.0
 
@@ -37,51 +53,54 @@ class HardValidator:
         if errors:
             return ValidationResult(ok=False, errors=errors, score=0.0)
 
+        stem = str(q.get("soru", "")).strip()
+        text = str(q.get("metin", "") or "").strip()
+        for name, _cost in self.CHECKS:
+            errors.extend(getattr(self, name)(q, stem, text))
+            if errors and fail_fast:
+                break
+
+        ok = len(errors) == 0
+        if ok:
+            score = 1.0
+        return ValidationResult(ok=ok, errors=errors, score=score)
+
+    def _check_answer(self, q: Dict[str, Any], stem: str, text: str) -> List[str]:
         # 2) Answer validity
         ans = str(q.get("dogru_cevap", "")).strip().upper()
-        if ans not in self.VALID_ANSWERS:
-            errors.append("invalid_answer_letter")
-
-        # 3) Choice fields non-empty + not too short
-        choices = []
-        for k in self.CHOICE_KEYS:
-            v = str(q.get(k, "")).strip()
-            if not v:
-                errors.append(f"empty_{k}")
-            choices.append(v)
+        return [] if ans in self.VALID_ANSWERS else ["invalid_answer_letter"]
 
-        # 4) Duplicate / near-duplicate choices
-        norm_choices = [self._normalize_text(c) for c in choices]
-        if len(set(norm_choices)) < 4:
-            errors.append("duplicate_choices")
+    def _check_empty_choices(self, q: Dict[str, Any], stem: str, text: str) -> List[str]:
+        # 3) Choice fields non-empty
+        return [f"empty_{k}" for k in self.CHOICE_KEYS if not str(q.get(k, "")).strip()]
 
+    def _check_stem_length(self, q: Dict[str, Any], stem: str, text: str) -> List[str]:
         # 5) Very short stem check
-        stem = str(q.get("soru", "")).strip()
-        if len(stem) < 15:
-            errors.append("stem_too_short")
+        return ["stem_too_short"] if len(stem) < 15 else []
 
+    def _check_text_length(self, q: Dict[str, Any], stem: str, text: str) -> List[str]:
         # 6) Optional text sanity (if provided)
-        text = str(q.get("metin", "") or "").strip()
-        if "metin" in q:
-            # metin alanı varsa aşırı kısa/boş ise sinyal (hard değil bazı tiplerde)
-            if text and len(text) < 30:
-                errors.append("text_too_short")
+        # metin alanı varsa aşırı kısa/boş ise sinyal (hard değil bazı tiplerde)
+        return ["text_too_short"] if "metin" in q and text and len(text) < 30 else []
 
+    def _check_duplicate_choices(self, q: Dict[str, Any], stem: str, text: str) -> List[str]:
+        # 4) Duplicate / near-duplicate choices
+        norm_choices = [self._normalize_text(str(q.get(k, "")).strip()) for k in self.CHOICE_KEYS]
+        return ["duplicate_choices"] if len(set(norm_choices)) < 4 else []
+
+    def _check_garbage(self, q: Dict[str, Any], stem: str, text: str) -> List[str]:
+        # 8) Basic profanity / obvious garbage token patterns (very light)
+        # (Bu bir dil filtresi değil; sadece aşırı bozuk üretimleri yakalar.)
+        return ["garbage_tokens"] if self._looks_like_garbage(text) or self._looks_like_garbage(stem) else []
+
+    def _check_repetition(self, q: Dict[str, Any], stem: str, text: str) -> List[str]:
         # 7) Loop / repetition detection (text + stem)
+        errors = []
         if self._has_repetition_loop(text):
             errors.append("text_repetition_loop")
         if self._has_repetition_loop(stem):
             errors.append("stem_repetition_loop")
-
-        # 8) Basic profanity / obvious garbage token patterns (very light)
-        # (Bu bir dil filtresi değil; sadece aşırı bozuk üretimleri yakalar.)
-        if self._looks_like_garbage(text) or self._looks_like_garbage(stem):
-            errors.append("garbage_tokens")
-
-        ok = len(errors) == 0
-        if ok:
-            score = 1.0
-        return ValidationResult(ok=ok, errors=errors, score=score)
+        return errors
 
     def _normalize_text(self, s: str) -> str:
         s = s.strip().lower()
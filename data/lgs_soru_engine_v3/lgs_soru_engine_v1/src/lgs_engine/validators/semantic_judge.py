@@ -25,8 +25,18 @@ class SemanticJudge:
     - Tek doğru cevap (solver-check)
     - Tip/Konu uyumu (alignment 0-10)
     - Eminlik (confidence 0-1)
+
+    Bir model cagrisi yaptigi icin en pahali asamadir: pipeline judge'i
+    ancak hard + type kontrolleri gecilince calistirir.
     """
 
+    # Judge prompt'una giren anahtarlar (StagedValidator cache anahtari)
+    FIELDS = (
+        "question_type", "metin", "highlight", "vurgulu_ifade", "soru",
+        "sik_a", "sik_b", "sik_c", "sik_d", "dogru_cevap",
+    )
+    COST = 100.0
+
     def __init__(
         self,
         model_client,
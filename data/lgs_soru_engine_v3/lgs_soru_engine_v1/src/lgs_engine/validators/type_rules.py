@@ -1,11 +1,9 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, Optional
 
-import yaml
-
+from ..core.config_store import ContractSnapshot, ContractStore
 from .base import Validator, ValidationResult
 from ..utils.text import (
     highlight_appears_in_text,
@@ -14,19 +12,6 @@ from ..utils.text import (
 )
 
 
-@dataclass(frozen=True)
-class TypeContract:
-    defaults: Dict[str, Any]
-    rules: Dict[str, Dict[str, Any]]
-
-    @staticmethod
-    def load(path: Path) -> "TypeContract":
-        obj = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
-        defaults = obj.get("defaults", {}) or {}
-        rules = obj.get("rules", {}) or {}
-        return TypeContract(defaults=defaults, rules=rules)
-
-
 class TypeRuleValidator(Validator):
     """Question-type sözleşmesini uygular.
 
@@ -37,18 +22,27 @@ class TypeRuleValidator(Validator):
     - topic_family uyuşmazlığı (kısmi)
     """
 
-    def __init__(self, contract_path: Optional[Path] = None):
-        if contract_path is None:
-            contract_path = Path(__file__).resolve().parents[3] / "configs" / "question_type_rules.yaml"
-        self.contract_path = contract_path
-        self.contract = TypeContract.load(contract_path)
+    # Dogrulamanin okudugu anahtarlar (StagedValidator cache anahtari)
+    FIELDS = ("question_type", "text", "topic_family", "highlight")
+    COST = 2.0
+
+    def __init__(self, contract_path: Optional[Path] = None, *, store: Optional[ContractStore] = None):
+        # Sozlesme paylasilan store'dan okunur; dosya degisince yeniden baslatmadan guncellenir
+        self.store = store or ContractStore.for_path(contract_path)
+        self.contract_path = self.store.path
+
+    @property
+    def contract(self) -> ContractSnapshot:
+        return self.store.snapshot()
 
-    def _rule(self, qtype: str) -> Optional[Dict[str, Any]]:
-        return self.contract.rules.get(qtype)
+    def _rule(self, qtype: str, contract: Optional[ContractSnapshot] = None) -> Optional[Dict[str, Any]]:
+        return (contract or self.contract).rules.get(qtype)
 
     def validate(self, q: Dict[str, Any]) -> ValidationResult:
+        # Tek dogrulama boyunca ayni snapshot
+        contract = self.contract
         qt = str(q.get("question_type", "")).strip()
-        rules = self._rule(qt)
+        rules = self._rule(qt, contract)
         if not rules:
             # Bilinmeyen tip: soft-pass. Pipeline yine de HardValidator ile korunur.
             return ValidationResult(True, 0.5, ["unknown_question_type"])
@@ -67,7 +61,7 @@ class TypeRuleValidator(Validator):
 
         # text_required
         text_required = bool(rules.get("text_required", True))
-        if text_required and not txt.strip() and self.contract.defaults.get("reject_if_text_empty_when_required", True):
+        if text_required and not txt.strip() and contract.defaults.get("reject_if_text_empty_when_required", True):
             errors.append("text_required_but_empty")
 
         # word limits
@@ -98,7 +92,7 @@ class TypeRuleValidator(Validator):
             if "highlight_max_words" in rules and hw > int(rules["highlight_max_words"]):
                 errors.append("highlight_too_long")
 
-            if self.contract.defaults.get("highlight_must_appear_in_text", True):
+            if contract.defaults.get("highlight_must_appear_in_text", True):
                 if not highlight_appears_in_text(txt, highlight_text):
                     errors.append("highlight_not_in_text")
 
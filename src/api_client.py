@@ -10,6 +10,8 @@ import json
 import time
 from typing import Optional, List, Dict, Union, Dict, Any
 
+from prompt_layout import PromptParts
+
 # API değişkenleri (env'den veya config'den)
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
@@ -32,6 +34,8 @@ class APIClient:
         # SSL doğrulamasını geliştirme ortamı için kapat (Cloudflare/Ngrok için gerekli olabiliyor)
         self.verify_ssl = False 
         self.last_api_used = None
+        # Colab çağrıları için keep-alive oturum (ilk çağrıda oluşturulur)
+        self._session = None
         
     
     def _call_colab(self, prompt: Union[str, Dict]) -> Optional[str]:
@@ -65,21 +69,23 @@ class APIClient:
             if isinstance(prompt, dict):
                 user_content = prompt.get("user", "")
                 
-                # Rastgele farkındalık konusu ekle (30% şans)
-                enhanced_user = user_content
+                # Metin uzunluğu vurgusu (sabit önekin parçası)
+                prefix = user_content + "\n\n⚠️ ÖNEMLİ: Metin TAM 80-150 kelime olmalı! Kısa metinler kabul edilmez!"
+                
+                # Rastgele farkındalık konusu ekle (30% şans) - sonek, önek KV cache'i bozulmasın
+                suffix = ""
                 if random.random() < 0.3:
                     topic = random.choice(AWARENESS_TOPICS)
-                    enhanced_user = f"{user_content}\n\n💡 FARK INDALIK KONUSU: {topic}\nMetinde bu konuyu işle!"
-                
-                # Metin uzunluğu vurgusu
-                enhanced_user += "\n\n⚠️ ÖNEMLİ: Metin TAM 80-150 kelime olmalı! Kısa metinler kabul edilmez!"
+                    suffix = f"\n\n💡 FARK INDALIK KONUSU: {topic}\nMetinde bu konuyu işle!"
                 
-                payload = {"prompt": enhanced_user}
+                payload = PromptParts.build(prefix, suffix).to_payload()
             else:
                 payload = {"prompt": prompt}
 
             url = f"{self.colab_url.rstrip('/')}/generate"
-            response = requests.post(url, json=payload, timeout=120, verify=False)
+            if self._session is None:
+                self._session = requests.Session()
+            response = self._session.post(url, json=payload, timeout=120, verify=self.verify_ssl)
             
             if response.status_code == 200:
                 self.last_api_used = "colab"
@@ -358,11 +364,12 @@ JSON:
                     enhanced_user += f"\n\n{topic_instructions}"
                 
                 # Conditional text length requirement
+                awareness = ""
                 if text_required:
-                    # Add awareness topic (40% chance)
+                    # Add awareness topic (40% chance) - appended last so the static part stays a shared prefix
                     if random.random() < 0.4:
                         topic = random.choice(AWARENESS_TOPICS)
-                        enhanced_user += f"\n\n🌍 FARK INDALIK KONUSU: {topic}\nMetinde bu konuyu işle ve 120-180 kelime TAM tut!"
+                        awareness = f"\n\n🌍 FARK INDALIK KONUSU: {topic}\nMetinde bu konuyu işle ve 120-180 kelime TAM tut!"
                 else:
                     # No text needed - emphasize
                     enhanced_user += "\n\n⚠️ ÖNEMLİ: Bu soru tipi için PARAGRAF METNİ GEREKSIZ! Metin alanını BOŞ BIRAK!"
@@ -392,6 +399,7 @@ JSON:
 Örnek yapı:
 "[Konu tanıtımı]. [Detay 1]. [Detay 2]. [Örnek]. [Açıklama]. [Sonuç/Özet]."
 """
+                enhanced_user += awareness
                 
                 messages.append({"role": "system", "content": ULTRA_STRICT_SYSTEM})
                 messages.append({"role": "user", "content": enhanced_user})
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Sıcak Yeniden Yüklenen Config Deposu
+====================================
+rag_docs/*.md ve question_type_rules.yaml gibi dosyaları bir kez okuyup
+değişmez (immutable) bir snapshot olarak sunar:
+
+- Dosyaların (yol, mtime, boyut) parmak izi snapshot() çağrılarında en
+  fazla ``poll_interval`` aralıkla (veya start_watcher ile arka planda)
+  kontrol edilir.
+- Değişiklikte loader yeni veriyi kurar, snapshot referansı tek atamayla
+  değiştirilir. Eski snapshot'ı almış istekler onunla tamamlanır.
+- Yükleme hata verirse eski snapshot kullanılmaya devam eder, hata
+  health() çıktısında görünür.
+
+Aynı dosyaları okuyan nesneler get_store ile tek depoyu paylaşır; dosyalar
+süreç başına bir kez parse edilir.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+def freeze(value: Any) -> Any:
+    """dict -> MappingProxyType, list -> tuple (iç içe); snapshot verisi değiştirilemesin."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Bir yükleme anındaki config verisi (değişmez)."""
+
+    version: int
+    data: Any
+    fingerprint: Tuple
+    loaded_at: float
+    reload_ms: float
+
+
+class ConfigStore:
+    """Dosya kümesi -> loader çıktısı; değişiklikte atomik olarak yeniden yüklenir."""
+
+    def __init__(
+        self,
+        name: str,
+        watch: Callable[[], Iterable[Path]],
+        loader: Callable[[], Any],
+        poll_interval: float = 1.0,
+    ):
+        """
+        Args:
+            name: Health çıktısındaki ad
+            watch: İzlenecek dosyaları döndürür (her kontrolde çağrılır; yeni
+                eklenen / silinen dosyalar da değişiklik sayılır)
+            loader: Dosyaları okuyup snapshot verisini kurar (değişmez olmalı)
+            poll_interval: snapshot() çağrılarında dosya kontrolü aralığı (sn)
+        """
+        self.name = name
+        self._watch = watch
+        self._loader = loader
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._last_check = 0.0
+        self._failed_fingerprint: Optional[Tuple] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.reload_count = 0
+        self.failed_reloads = 0
+        self.last_error: Optional[str] = None
+        self.reload(force=True)
+
+    def _fingerprint(self) -> Tuple:
+        fingerprint = []
+        for path in sorted(Path(p) for p in self._watch()):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            fingerprint.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+
+    def snapshot(self) -> ConfigSnapshot:
+        """
+        Geçerli snapshot. Arka plan izleyici yoksa ve aralık dolduysa önce
+        dosyalar kontrol edilir. İstek boyunca aynı snapshot kullanılmalıdır.
+        """
+        if self._watcher is None and time.monotonic() - self._last_check >= self.poll_interval:
+            self.reload()
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version if self._snapshot else 0
+
+    def reload(self, force: bool = False) -> bool:
+        """Dosyalar değiştiyse (veya force) yeniden yükler; yeni snapshot kurulduysa True."""
+        with self._lock:
+            self._last_check = time.monotonic()
+            fingerprint = self._fingerprint()
+            current = self._snapshot
+            if not force and current is not None and fingerprint == current.fingerprint:
+                return False
+            if not force and fingerprint == self._failed_fingerprint:
+                return False  # aynı bozuk dosyayı her kontrolde tekrar deneme
+
+            start = time.perf_counter()
+            try:
+                data = self._loader()
+            except Exception as e:
+                if current is None:
+                    raise
+                self.failed_reloads += 1
+                self._failed_fingerprint = fingerprint
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ {self.name} yeniden yüklenemedi, v{current.version} kullanılmaya devam ediliyor: {self.last_error}")
+                return False
+
+            # Tek referans ataması: okuyucular ya eski ya yeni snapshot'ı görür
+            self._snapshot = ConfigSnapshot(
+                version=(current.version + 1) if current else 1,
+                data=data,
+                fingerprint=fingerprint,
+                loaded_at=time.time(),
+                reload_ms=(time.perf_counter() - start) * 1000,
+            )
+            self._failed_fingerprint = None
+            self.last_error = None
+            if current is not None:
+                self.reload_count += 1
+                print(f"🔄 {self.name} yeniden yüklendi: v{self._snapshot.version} ({self._snapshot.reload_ms:.1f} ms)")
+            return True
+
+    def start_watcher(self, interval: Optional[float] = None):
+        """Dosyaları arka plan thread'inde izler (snapshot() artık dosya kontrolü yapmaz)."""
+        if self._watcher is not None:
+            return
+        interval = interval or self.poll_interval
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:  # izleyici thread'i ölmesin
+                    self.last_error = f"{type(e).__name__}: {e}"
+
+        self._watcher = threading.Thread(target=run, name=f"config-watch-{self.name}", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        if self._watcher is None:
+            return
+        self._stop.set()
+        self._watcher.join()
+        self._watcher = None
+
+    def health(self) -> Dict[str, Any]:
+        """Health endpoint'leri için sürüm, yükleme süresi ve hata bilgisi."""
+        snapshot = self._snapshot
+        return {
+            "name": self.name,
+            "version": snapshot.version if snapshot else 0,
+            "loaded_at": datetime.fromtimestamp(snapshot.loaded_at, timezone.utc).isoformat() if snapshot else None,
+            "last_reload_ms": round(snapshot.reload_ms, 3) if snapshot else None,
+            "reload_count": self.reload_count,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+            "files": len(snapshot.fingerprint) if snapshot else 0,
+            "watcher": self._watcher is not None,
+        }
+
+
+# Süreç geneli depolar: aynı anahtar -> aynı ConfigStore
+_STORES: Dict[Any, ConfigStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_store(key: Any, factory: Callable[[], ConfigStore]) -> ConfigStore:
+    """key için depoyu döndürür; yoksa factory ile bir kez oluşturur."""
+    store = _STORES.get(key)
+    if store is None:
+        with _STORES_LOCK:
+            store = _STORES.get(key)
+            if store is None:
+                store = factory()
+                _STORES[key] = store
+    return store
@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+"""
+Sahte Model Sunucusu (ağsız yük testi / CI)
+===========================================
+Colab inference server'ı ile aynı sözleşmeyi uygulayan, GPU / Groq /
+Gemini gerektirmeyen hafif HTTP sunucusu. Sorular model yerine veri
+setinden gelir; gecikme, hata ve bozuk JSON oranları ayarlanabilir.
+Böylece GenerationPipeline, augment_missing.py, Flask uygulamaları ve
+Colab istemcileri ağ olmadan uçtan uca çalıştırılıp ölçülebilir.
+
+Uç noktalar:
+    GET  /health          durum + istek / hata / bozuk JSON sayaçları
+    POST /generate        {"prompt": {"user": "Konu: X\\nAlt Konu: Y ..."}} veya {"konu", "alt_konu"}
+                          -> {"result": "<JSON>", "parsed": {...}, "success": true}
+    POST /batch_generate  {"requests": [{"konu", "alt_konu"}, ...]}
+                          -> {"results": [{"konu", "alt_konu", "result"}], "count", "success": true}
+    POST /judge           lgs_engine SemanticJudge istemi ("Soru JSON:\\n{...}")
+                          -> {"result": "{\\"predicted_answer\\": ..., \\"confidence\\", \\"alignment\\", \\"notes\\"}"}
+
+Soru seçimi (istemden okunur): "Soru tipi:" / question_type= -> lgs_engine
+question_type'ı, yoksa "Konu:" + "Alt Konu:", yoksa rastgele. Dönen JSON
+hem Colab şemasını (metin, soru, sik_a..d, dogru_cevap) hem lgs_engine
+validator alanlarını (text, highlight, question_type, topic_family) taşır.
+lgs_engine'in JSON ve highlight onarım istemleri de tanınır ve onarılmış
+soru döner; "seed" verilen istekler deterministiktir.
+
+    --mode canned     veri setindeki soru aynen
+    --mode template   şıklar karıştırılır, doğru cevap harfi yeniden hesaplanır
+
+Kullanım:
+    python src/fake_model_server.py --port 8001 --latency-ms 300 --jitter-ms 100
+    python src/fake_model_server.py --error-rate 0.05 --malformed-rate 0.1 --mode template
+
+    LGS_MODEL_URL=http://127.0.0.1:8001 uvicorn app.api.main:app      (lgs_engine)
+    COLAB_API_URL=http://127.0.0.1:8001 python src/web_app_v3.py
+
+Testlerde: server, url = start_background(FakeModel(...)) ... server.shutdown()
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENGINE_DATA_PATH = os.path.join(
+    PROJECT_ROOT, "data", "lgs_soru_engine_v3", "lgs_soru_engine_v1", "data", "processed", "normalized_merged_v2.jsonl"
+)
+CHAT_DATA_PATTERN = os.path.join(PROJECT_ROOT, "data", "v13_final", "*.jsonl")
+DATA_PATHS = (ENGINE_DATA_PATH, CHAT_DATA_PATTERN)
+
+CHOICE_KEYS = ("a", "b", "c", "d")
+ANSWERS = ("A", "B", "C", "D")
+MODES = ("canned", "template")
+
+KONU_RE = re.compile(r"^\s*\**Konu:\**\s*([^\n]+)", re.MULTILINE)
+ALT_KONU_RE = re.compile(r"^\s*\**Alt Konu:\**\s*([^\n]+)", re.MULTILINE)
+QTYPE_RE = re.compile(r"(?:Soru tipi:\s*|question_type=|\"question_type\":\s*\")([a-z_]+)")
+JSON_REPAIR_MARKER = "METIN:\n"
+HIGHLIGHT_REPAIR_MARKER = "underline"
+JSON_MARKER = "JSON:\n"
+JUDGE_MARKER = "Soru JSON:\n"
+
+
+def _key(value: Optional[str]) -> str:
+    return " ".join((value or "").lower().split())
+
+
+# ============================================
+# SORU HAVUZU
+# ============================================
+
+def _from_engine(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """lgs_engine normalized_merged_v2 kaydı -> yanıt şeması (+ konu / alt konu)."""
+    choices = raw.get("choices") or {}
+    if not raw.get("stem") or raw.get("answer") not in ANSWERS or not all(choices.get(a) for a in ANSWERS):
+        return None
+    text = raw.get("text") or ""
+    q = {"metin": text, "soru": raw["stem"]}
+    q.update({f"sik_{c}": choices[c.upper()] for c in CHOICE_KEYS})
+    q.update({
+        "dogru_cevap": raw["answer"],
+        "text": text,
+        "highlight": raw.get("highlight") or "",
+        "question_type": raw.get("question_type"),
+        "topic_family": raw.get("topic_family"),
+    })
+    return {"konu": raw.get("topic"), "alt_konu": raw.get("subtopic"), "question": q}
+
+
+def _from_chat(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """v13 sohbet kaydı: konu user satırlarında, soru assistant JSON'unda."""
+    try:
+        data = json.loads(raw.get("assistant") or "{}")
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or not data.get("soru") or data.get("dogru_cevap") not in ANSWERS:
+        return None
+    if not all(data.get(f"sik_{c}") for c in CHOICE_KEYS):
+        return None
+    user = raw.get("user") or ""
+    konu, alt = KONU_RE.search(user), ALT_KONU_RE.search(user)
+    text = data.get("metin") or ""
+    q = {"metin": text, "soru": data["soru"]}
+    q.update({f"sik_{c}": data[f"sik_{c}"] for c in CHOICE_KEYS})
+    q.update({"dogru_cevap": data["dogru_cevap"], "text": text, "highlight": ""})
+    return {
+        "konu": konu.group(1).strip() if konu else None,
+        "alt_konu": alt.group(1).strip() if alt else None,
+        "question": q,
+    }
+
+
+def iter_dataset(patterns=DATA_PATHS) -> Iterator[Dict[str, Any]]:
+    """Veri dosyalarındaki soruları {"konu", "alt_konu", "question"} olarak okur."""
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        raw = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    item = _from_chat(raw) if "assistant" in raw else _from_engine(raw)
+                    if item:
+                        yield item
+
+
+class QuestionBank:
+    """question_type, (konu, alt konu) ve konu ile indekslenmiş hazır sorular."""
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        if not items:
+            raise ValueError("Soru havuzu boş (veri dosyası bulunamadı)")
+        self.items = items
+        self.by_type: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_topic: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self.by_konu: Dict[str, List[Dict[str, Any]]] = {}
+        for item in items:
+            q = item["question"]
+            if q.get("question_type"):
+                self.by_type.setdefault(q["question_type"], []).append(q)
+            if item["konu"]:
+                self.by_konu.setdefault(_key(item["konu"]), []).append(q)
+                self.by_topic.setdefault((_key(item["konu"]), _key(item["alt_konu"])), []).append(q)
+
+    @classmethod
+    def load(cls, patterns=DATA_PATHS) -> "QuestionBank":
+        return cls(list(iter_dataset(patterns)))
+
+    def pick(
+        self,
+        rng: random.Random,
+        konu: Optional[str] = None,
+        alt_konu: Optional[str] = None,
+        question_type: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """En özel eşleşmeden genele: question_type -> (konu, alt konu) -> konu -> tümü."""
+        pool = (
+            self.by_type.get(question_type or "")
+            or self.by_topic.get((_key(konu), _key(alt_konu)))
+            or self.by_konu.get(_key(konu))
+            or [item["question"] for item in self.items]
+        )
+        q = dict(rng.choice(pool))
+        if question_type:
+            q["question_type"] = question_type
+        return q
+
+    def health(self) -> Dict[str, int]:
+        return {"questions": len(self.items), "question_types": len(self.by_type), "topics": len(self.by_topic)}
+
+
+# ============================================
+# SAHTE MODEL
+# ============================================
+
+def shuffle_choices(q: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    """Şıkları karıştırır; dogru_cevap yeni yerini gösterir."""
+    order = list(CHOICE_KEYS)
+    rng.shuffle(order)
+    correct = q["dogru_cevap"].lower()
+    out = dict(q)
+    for new, old in zip(CHOICE_KEYS, order):
+        out[f"sik_{new}"] = q[f"sik_{old}"]
+        if old == correct:
+            out["dogru_cevap"] = new.upper()
+    return out
+
+
+def add_highlight(q: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    """Boş highlight'ı metnin bir cümlesinden 3-8 kelimelik bir ifadeyle doldurur ([u]...[/u])."""
+    out = dict(q)
+    text = str(out.get("text") or out.get("metin") or "")
+    if str(out.get("highlight") or "").strip() or not text:
+        return out
+    sentence = max(re.split(r"(?<=[.!?])\s+", text), key=lambda s: len(s.split()))
+    words = sentence.split()
+    if len(words) < 3:
+        return out
+    size = min(len(words), rng.randint(3, 8))
+    start = rng.randint(0, len(words) - size)
+    phrase = " ".join(words[start:start + size]).strip(".,;:!?")
+    if phrase and phrase in text:
+        out["highlight"] = phrase
+        out["text"] = out["metin"] = text.replace(phrase, f"[u]{phrase}[/u]", 1)
+    return out
+
+
+def malform(result: str, rng: random.Random) -> str:
+    """Yarıda kesilmiş JSON (max_new_tokens'a takılan model çıktısı gibi)."""
+    cut = rng.randint(len(result) // 3, max(len(result) // 3, len(result) - 2))
+    return result[:cut]
+
+
+class FakeModel:
+    """
+    Sunucudan bağımsız sahte model: istem -> ham cevap.
+
+    Args:
+        latency_ms / jitter_ms: istek başına gecikme (normal dağılım, >= 0)
+        error_rate: 503 dönen istek oranı (istemcinin tekrar deneme yolu)
+        malformed_rate: yarıda kesilmiş JSON dönen istek oranı (onarım yolu)
+        mode: "canned" veya "template" (bkz. modül açıklaması)
+        seed: rastgelelik tohumu; istekteki "seed" ile birlikte deterministik
+    """
+
+    def __init__(
+        self,
+        bank: Optional[QuestionBank] = None,
+        *,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        mode: str = "canned",
+        seed: int = 0,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Bilinmeyen mod: {mode} (seçenekler: {MODES})")
+        self.bank = bank or QuestionBank.load()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.mode = mode
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {"requests": {}, "errors": 0, "malformed": 0, "busy_ms": 0.0}
+
+    # ---- yardımcılar ----
+
+    def request_rng(self, payload: Dict[str, Any], prompt: str) -> random.Random:
+        """seed verilen istek aynı cevabı alır; diğerleri paylaşılan akıştan tohumlanır."""
+        if payload.get("seed") is not None:
+            return random.Random(f"{self.seed}:{payload['seed']}:{prompt}")
+        with self._lock:
+            return random.Random(self._rng.getrandbits(64))
+
+    def _count(self, route: str, key: Optional[str] = None, busy_ms: float = 0.0) -> None:
+        with self._lock:
+            self._stats["requests"][route] = self._stats["requests"].get(route, 0) + 1
+            self._stats["busy_ms"] += busy_ms
+            if key:
+                self._stats[key] += 1
+
+    def _delay(self, rng: random.Random) -> float:
+        delay_ms = max(0.0, rng.gauss(self.latency_ms, self.jitter_ms)) if self.jitter_ms else self.latency_ms
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        return delay_ms
+
+    def question(self, rng: random.Random, konu=None, alt_konu=None, question_type=None) -> Dict[str, Any]:
+        q = self.bank.pick(rng, konu, alt_konu, question_type)
+        return shuffle_choices(q, rng) if self.mode == "template" else q
+
+    def _answer(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        """Üretim / onarım istemine uygun soru."""
+        if HIGHLIGHT_REPAIR_MARKER in prompt and JSON_MARKER in prompt:
+            try:
+                q = json.loads(prompt.split(JSON_MARKER, 1)[1])
+                if isinstance(q, dict):
+                    return add_highlight(q, rng)
+            except json.JSONDecodeError:
+                pass
+        qtype = QTYPE_RE.search(prompt)
+        if JSON_REPAIR_MARKER in prompt:
+            # bozuk çıktıdaki question_type korunur, konu bilgisi yok
+            return self.question(rng, question_type=qtype.group(1) if qtype else None)
+        konu, alt = KONU_RE.search(prompt), ALT_KONU_RE.search(prompt)
+        return self.question(
+            rng,
+            konu.group(1).strip() if konu else None,
+            alt.group(1).strip() if alt else None,
+            qtype.group(1) if qtype else None,
+        )
+
+    @staticmethod
+    def _prompt_text(payload: Dict[str, Any]) -> str:
+        prompt = payload.get("prompt", "")
+        if isinstance(prompt, dict):
+            return str(prompt.get("user", ""))
+        return str(prompt or "")
+
+    # ---- uç noktalar: (HTTP durum, JSON gövde) ----
+
+    def handle(self, route: str, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Tek istek: gecikme, olası 503 ve bozuk JSON dahil."""
+        prompt = self._prompt_text(payload)
+        rng = self.request_rng(payload, f"{route}:{prompt or json.dumps(payload, sort_keys=True)}")
+        start = time.perf_counter()
+        self._delay(rng)
+
+        if rng.random() < self.error_rate:
+            self._count(route, "errors", (time.perf_counter() - start) * 1000)
+            return 503, {"error": "Generation error", "message": "sahte model: yapay hata", "success": False}
+
+        if route == "/judge":
+            status, body = 200, {"result": json.dumps(self.judge(prompt, rng), ensure_ascii=False)}
+        elif route == "/batch_generate":
+            status, body = self.batch(payload, rng)
+        elif "prompt" in payload:
+            status, body = 200, self._generate_body(self._answer(prompt, rng))
+        else:
+            q = self.question(rng, payload.get("konu", "Paragraf"), payload.get("alt_konu", "Ana Düşünce"))
+            status, body = 200, self._generate_body(q)
+
+        if status == 200 and "result" in body and rng.random() < self.malformed_rate:
+            body = {"result": malform(body["result"], rng), "parsed": None, "success": True}
+            self._count(route, "malformed", (time.perf_counter() - start) * 1000)
+        else:
+            self._count(route, None, (time.perf_counter() - start) * 1000)
+        return status, body
+
+    @staticmethod
+    def _generate_body(q: Dict[str, Any]) -> Dict[str, Any]:
+        return {"result": json.dumps(q, ensure_ascii=False), "parsed": q, "success": True}
+
+    def batch(self, payload: Dict[str, Any], rng: random.Random) -> Tuple[int, Dict[str, Any]]:
+        results = []
+        for req in payload.get("requests", []):
+            konu = req.get("konu", "Paragraf")
+            alt_konu = req.get("alt_konu", "Ana Düşünce")
+            q = self.question(rng, konu, alt_konu)
+            results.append({"konu": konu, "alt_konu": alt_konu, "result": json.dumps(q, ensure_ascii=False)})
+        return 200, {"results": results, "count": len(results), "success": True}
+
+    @staticmethod
+    def judge(prompt: str, rng: random.Random) -> Dict[str, Any]:
+        """Sorudaki doğru cevabı 'çözer'; soru okunamazsa düşük güven."""
+        try:
+            q = json.loads(prompt.split(JUDGE_MARKER, 1)[1])
+            answer = str(q.get("dogru_cevap", "")).strip().upper()
+        except (IndexError, json.JSONDecodeError, AttributeError):
+            answer = ""
+        if answer not in ANSWERS:
+            return {"predicted_answer": "A", "confidence": 0.1, "alignment": 2.0, "notes": "soru okunamadi"}
+        return {
+            "predicted_answer": answer,
+            "confidence": round(rng.uniform(0.7, 0.95), 2),
+            "alignment": round(rng.uniform(7.0, 9.5), 1),
+            "notes": "sahte judge",
+        }
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {**self._stats, "requests": dict(self._stats["requests"])}
+        stats["busy_ms"] = round(stats["busy_ms"], 1)
+        return {
+            "status": "healthy",
+            "model": "fake",
+            "mode": self.mode,
+            "config": {
+                "latency_ms": self.latency_ms,
+                "jitter_ms": self.jitter_ms,
+                "error_rate": self.error_rate,
+                "malformed_rate": self.malformed_rate,
+                "seed": self.seed,
+            },
+            "bank": self.bank.health(),
+            "stats": stats,
+        }
+
+
+# ============================================
+# HTTP
+# ============================================
+
+class FakeModelHandler(BaseHTTPRequestHandler):
+    """Keep-alive (HTTP/1.1) JSON handler; model sunucu nesnesinde tutulur."""
+
+    protocol_version = "HTTP/1.1"
+    ROUTES = ("/generate", "/batch_generate", "/judge")
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._send(200, self.server.model.health())
+        else:
+            self._send(404, {"error": "Not found", "success": False})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        route = self.path.split("?", 1)[0].rstrip("/")
+        if route not in self.ROUTES:
+            self._send(404, {"error": "Not found", "success": False})
+            return
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            self._send(400, {"error": "JSON parse error", "message": str(e), "success": False})
+            return
+        if not isinstance(payload, dict):
+            self._send(400, {"error": "JSON parse error", "message": "nesne bekleniyor", "success": False})
+            return
+        self._send(*self.server.model.handle(route, payload))
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class FakeModelServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int], model: FakeModel, verbose: bool = False):
+        super().__init__(address, FakeModelHandler)
+        self.model = model
+        self.verbose = verbose
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_background(
+    model: Optional[FakeModel] = None, host: str = "127.0.0.1", port: int = 0
+) -> Tuple[FakeModelServer, str]:
+    """Sunucuyu arka plan thread'inde başlatır (port=0: boş port). Kapatma: server.shutdown()."""
+    server = FakeModelServer((host, port), model or FakeModel())
+    threading.Thread(target=server.serve_forever, name="fake-model-server", daemon=True).start()
+    return server, server.url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Colab sözleşmeli sahte model sunucusu (ağsız test)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Ortalama istek gecikmesi")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Gecikmenin standart sapması")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503 dönen istek oranı (0-1)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Bozuk JSON dönen istek oranı (0-1)")
+    parser.add_argument("--mode", choices=MODES, default="canned")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", nargs="+", default=list(DATA_PATHS), help="Soru dosyaları / glob'ları")
+    parser.add_argument("--verbose", action="store_true", help="Her isteği logla")
+    args = parser.parse_args()
+
+    bank = QuestionBank.load(args.data)
+    model = FakeModel(
+        bank,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        mode=args.mode,
+        seed=args.seed,
+    )
+    server = FakeModelServer((args.host, args.port), model, verbose=args.verbose)
+    print(f"📚 Soru havuzu: {bank.health()}")
+    print(f"🚀 Sahte model sunucusu: {server.url} (mod={args.mode}, gecikme={args.latency_ms}±{args.jitter_ms} ms, "
+          f"hata={args.error_rate}, bozuk={args.malformed_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Kapatılıyor")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
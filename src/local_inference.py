@@ -3,17 +3,39 @@
 LGS Fine-Tuned Model - Yerel Inference
 ======================================
 Eğitilmiş Llama-3 modelini yükleyip soru üretir.
+
+Prompt sabit önek + sonek (prompt_layout.PromptParts) olarak verilirse
+önekin KV cache'i prefix_id ile saklanır; aynı alt konunun sonraki
+isteklerinde prefill sadece sonek için yapılır.
 """
 
+import copy
 import os
 import torch
+from collections import OrderedDict
 from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
 from peft import PeftModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
+
+from prompt_layout import PromptParts
+
+# Llama-3 Instruct formatı: kullanıcı mesajından önceki ve sonraki sabit kısımlar
+PROMPT_HEAD = """<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+
+Sen MEB LGS Türkçe soru yazma konusunda uzmanlaşmış bir yapay zeka asistanısın.<|eot_id|><|start_header_id|>user<|end_header_id|>
+
+"""
+PROMPT_TAIL = """<|eot_id|><|start_header_id|>assistant<|end_header_id|>
+
+"""
+MAX_PROMPT_TOKENS = 2048
 
 class LocalLGSModel:
     """Fine-tuned Llama-3 modelini yükler ve inference yapar."""
     
+    # Saklanan önek KV cache sayısı (alt konu başına bir önek)
+    PREFIX_CACHE_SIZE = 8
+    
     def __init__(
         self,
         adapter_path: str = "models/lgs_turkish_lora",
@@ -26,6 +48,12 @@ class LocalLGSModel:
         self.model = None
         self.tokenizer = None
         
+        # prefix_id -> (önek token id'leri, önekin KV cache'i)
+        self._prefix_cache: "OrderedDict[str, Any]" = OrderedDict()
+        self.prefix_hits = 0
+        self.prefix_misses = 0
+        self.prefill_tokens_saved = 0
+        
     def load_model(self):
         """Modeli ve tokenizer'ı yükler."""
         print(f"🔄 Base model yükleniyor: {self.base_model}")
@@ -99,32 +127,37 @@ class LocalLGSModel:
     
     def generate(
         self,
-        prompt: str,
+        prompt: Union[str, PromptParts],
         max_new_tokens: int = 1024,
         temperature: float = 0.7,
         top_p: float = 0.9,
         do_sample: bool = True
     ) -> str:
-        """Prompt'tan metin üretir."""
+        """
+        Prompt'tan metin üretir.
+        
+        PromptParts verilirse önek (sistem mesajı + prompt öneki) KV cache'ten
+        kullanılır; sadece sonek ve asistan başlığı için prefill yapılır.
+        """
         
         if self.model is None:
             raise RuntimeError("Model henüz yüklenmedi. Önce load_model() çağırın.")
         
+        if isinstance(prompt, PromptParts):
+            generated = self._generate_with_prefix(prompt, max_new_tokens, temperature, top_p, do_sample)
+            if generated is not None:
+                return generated
+            prompt = prompt.text
+        
         # Llama-3 Instruct formatı
-        formatted_prompt = f"""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
-
-Sen MEB LGS Türkçe soru yazma konusunda uzmanlaşmış bir yapay zeka asistanısın.<|eot_id|><|start_header_id|>user<|end_header_id|>
-
-{prompt}<|eot_id|><|start_header_id|>assistant<|end_header_id|>
-
-"""
+        formatted_prompt = f"{PROMPT_HEAD}{prompt}{PROMPT_TAIL}"
         
         # Tokenize
         inputs = self.tokenizer(
             formatted_prompt,
             return_tensors="pt",
             truncation=True,
-            max_length=2048
+            max_length=MAX_PROMPT_TOKENS
         ).to(self.model.device)
         
         # Generate
@@ -146,6 +179,77 @@ Sen MEB LGS Türkçe soru yazma konusunda uzmanlaşmış bir yapay zeka asistan
         )
         
         return generated_text.strip()
+    
+    def _prefix_state(self, parts: PromptParts):
+        """Önek token'ları ve KV cache'i (prefix_id ile LRU cache'ten; yoksa bir kez prefill)."""
+        cached = self._prefix_cache.get(parts.prefix_id)
+        if cached is not None:
+            self._prefix_cache.move_to_end(parts.prefix_id)
+            self.prefix_hits += 1
+            return cached
+        
+        self.prefix_misses += 1
+        prefix_ids = self.tokenizer(
+            f"{PROMPT_HEAD}{parts.prefix}",
+            return_tensors="pt"
+        )["input_ids"].to(self.model.device)
+        with torch.no_grad():
+            past_key_values = self.model(input_ids=prefix_ids, use_cache=True).past_key_values
+        
+        cached = (prefix_ids, past_key_values)
+        self._prefix_cache[parts.prefix_id] = cached
+        if len(self._prefix_cache) > self.PREFIX_CACHE_SIZE:
+            self._prefix_cache.popitem(last=False)
+        return cached
+    
+    def _generate_with_prefix(
+        self,
+        parts: PromptParts,
+        max_new_tokens: int,
+        temperature: float,
+        top_p: float,
+        do_sample: bool
+    ) -> Optional[str]:
+        """Önek KV cache'i ile üretim; prompt MAX_PROMPT_TOKENS'u aşarsa None (normal yola düşer)."""
+        prefix_ids, past_key_values = self._prefix_state(parts)
+        suffix_ids = self.tokenizer(
+            f"{parts.suffix}{PROMPT_TAIL}",
+            return_tensors="pt",
+            add_special_tokens=False
+        )["input_ids"].to(self.model.device)
+        
+        input_ids = torch.cat([prefix_ids, suffix_ids], dim=1)
+        if input_ids.shape[1] > MAX_PROMPT_TOKENS:
+            return None
+        
+        # generate cache'i yerinde genişletir: saklanan önek cache'i kopyalanır
+        with torch.no_grad():
+            outputs = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=copy.deepcopy(past_key_values),
+                max_new_tokens=max_new_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                do_sample=do_sample,
+                pad_token_id=self.tokenizer.eos_token_id,
+                eos_token_id=self.tokenizer.eos_token_id
+            )
+        self.prefill_tokens_saved += prefix_ids.shape[1]
+        
+        generated_text = self.tokenizer.decode(
+            outputs[0][input_ids.shape[1]:],
+            skip_special_tokens=True
+        )
+        return generated_text.strip()
+    
+    def prefix_cache_stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._prefix_cache),
+            "hits": self.prefix_hits,
+            "misses": self.prefix_misses,
+            "prefill_tokens_saved": self.prefill_tokens_saved,
+        }
 
 
 # Global instance (lazy loading)
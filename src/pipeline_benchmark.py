@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Üretim Hattı Yük Testi (ağsız)
+==============================
+lgs_engine GenerationPipeline'ı (veya ham /generate uç noktasını) eş
+zamanlı isteklerle çalıştırıp ölçer. --base-url verilmezse süreç içinde
+sahte model sunucusu (fake_model_server) başlatılır; ağ, GPU veya API
+anahtarı gerekmez, CI'da çalışır.
+
+    throughput_rps       saniyede tamamlanan istek
+    p50/p95/p99_ms       istek gecikmesi
+    ok / failed          kabul edilen soru / hata türleri (ValueError, TimeoutError ...)
+    model_calls          sahte sunucuya giden istekler (uç nokta başına)
+    sampling             question_type başına geçme oranı, kabul başına aday
+    validation           doğrulama aşamalarının eleme sayısı ve süresi
+    response_cache       onarım / judge cevap cache'i isabet oranı (--cache-dir verilirse)
+
+Modlar:
+    pipeline   generate_best (üret + onar + hard/type + judge), question_type sırayla
+    generate   sadece ModelClient.generate ("Konu: X\\nAlt Konu: Y" istemi)
+
+Kullanım:
+    python src/pipeline_benchmark.py --requests 100 --concurrency 8 --latency-ms 200 --jitter-ms 50
+    python src/pipeline_benchmark.py --malformed-rate 0.2 --error-rate 0.05 --output bench.json
+    python src/pipeline_benchmark.py --cache-dir /tmp/lgs_cache   (iki kez: ikinci koşuda judge cache'ten)
+    python src/pipeline_benchmark.py --base-url http://127.0.0.1:8001 --mode generate
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fake_model_server import FakeModel, QuestionBank, start_background
+from rag_benchmark import _percentiles, load_konular
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENGINE_SRC = os.path.join(PROJECT_ROOT, "data", "lgs_soru_engine_v3", "lgs_soru_engine_v1", "src")
+sys.path.insert(0, ENGINE_SRC)
+
+from lgs_engine.core.pipeline import GenerationPipeline  # noqa: E402
+from lgs_engine.core.qtype_selector import QuestionTypeSelector  # noqa: E402
+from lgs_engine.core.telemetry import Telemetry  # noqa: E402
+from lgs_engine.model.client import ModelClient  # noqa: E402
+from lgs_engine.model.response_cache import ResponseCache  # noqa: E402
+
+MODES = ("pipeline", "generate")
+
+
+def build_jobs(mode: str, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """İstek listesi: pipeline modunda question_type'lar, generate modunda KONULAR çiftleri sırayla."""
+    if mode == "pipeline":
+        qtypes = QuestionTypeSelector().available_types()
+        return [
+            {"question_type": qtypes[i % len(qtypes)], "prompt": "LGS Turkce sorusu uret. Sadece JSON.", "seed": seed + i}
+            for i in range(count)
+        ]
+    pairs = [(konu, alt) for konu, alts in load_konular().items() for alt in alts] or [("Paragraf", "Ana Düşünce")]
+    return [
+        {"prompt": f"Konu: {pairs[i % len(pairs)][0]}\nAlt Konu: {pairs[i % len(pairs)][1]}", "seed": seed + i}
+        for i in range(count)
+    ]
+
+
+def run_benchmark(
+    base_url: str,
+    mode: str = "pipeline",
+    requests: int = 50,
+    concurrency: int = 4,
+    n: int = 5,
+    workers: int = 4,
+    judge: bool = True,
+    deadline_s: Optional[float] = None,
+    seed: int = 0,
+    cache_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """İstekleri `concurrency` thread ile gönderip sonuçları toplar (bkz. modül açıklaması)."""
+    model = ModelClient(
+        base_url=base_url,
+        max_connections=max(workers, concurrency),
+        timeout=30.0,
+        cache=ResponseCache(Path(cache_dir)) if cache_dir else None,
+    )
+    # Elenen adaylar projenin hard_negatives.jsonl'una değil geçici dosyaya yazılır
+    tmp = tempfile.TemporaryDirectory()
+    telemetry = Telemetry(out_path=Path(tmp.name) / "hard_negatives.jsonl")
+    pipeline = GenerationPipeline(model, enable_semantic_judge=judge, telemetry=telemetry, max_workers=workers)
+    jobs = build_jobs(mode, requests, seed)
+
+    def run(job: Dict[str, Any]) -> float:
+        start = time.perf_counter()
+        if mode == "pipeline":
+            pipeline.generate_best(
+                f"Soru tipi: {job['question_type']}\n{job['prompt']}",
+                n=n,
+                expected_question_type=job["question_type"],
+                seed=job["seed"],
+                deadline_s=deadline_s,
+            )
+        else:
+            model.generate(job["prompt"], seed=job["seed"])
+        return (time.perf_counter() - start) * 1000
+
+    latencies: List[float] = []
+    failures: Dict[str, int] = {}
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(run, job) for job in jobs]
+            for fut in futures:
+                try:
+                    latencies.append(fut.result())
+                except Exception as e:
+                    failures[type(e).__name__] = failures.get(type(e).__name__, 0) + 1
+        wall_s = time.perf_counter() - start
+        # close() havuzları boşaltır; istatistikler kapatmadan önce alınır
+        pool = model.pool_stats()
+        response_cache = model.cache_stats()
+    finally:
+        pipeline.close()
+        model.close()
+        tmp.cleanup()
+
+    return {
+        "mode": mode,
+        "requests": requests,
+        "concurrency": concurrency,
+        "n": n,
+        "workers": workers,
+        "judge": judge,
+        "ok": len(latencies),
+        "failed": failures,
+        "wall_s": wall_s,
+        "throughput_rps": len(latencies) / max(wall_s, 1e-9),
+        **_percentiles(latencies),
+        "sampling": telemetry.sampling_stats(),
+        "validation": pipeline.validation.stats() if mode == "pipeline" else {},
+        "pool": pool,
+        "response_cache": response_cache,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GenerationPipeline yük testi (sahte model sunucusuyla, JSON çıktı)")
+    parser.add_argument("--mode", choices=MODES, default="pipeline")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4, help="Eş zamanlı istek sayısı")
+    parser.add_argument("--n", type=int, default=5, help="generate_best aday üst sınırı")
+    parser.add_argument("--workers", type=int, default=4, help="GenerationPipeline max_workers")
+    parser.add_argument("--no-judge", action="store_true", help="Semantic judge aşamasını kapat")
+    parser.add_argument("--deadline-s", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache-dir", help="Onarım / judge cevap cache'i (verilmezse cache yok)")
+    parser.add_argument("--base-url", help="Gerçek / harici sunucu (verilmezse sahte sunucu başlatılır)")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--fake-mode", choices=("canned", "template"), default="template")
+    parser.add_argument("--output", default="pipeline_benchmark.json")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        fake = FakeModel(
+            QuestionBank.load(),
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            malformed_rate=args.malformed_rate,
+            mode=args.fake_mode,
+            seed=args.seed,
+        )
+        server, base_url = start_background(fake)
+        print(f"🧪 Sahte model sunucusu: {base_url}")
+
+    try:
+        result = run_benchmark(
+            base_url,
+            mode=args.mode,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            n=args.n,
+            workers=args.workers,
+            judge=not args.no_judge,
+            deadline_s=args.deadline_s,
+            seed=args.seed,
+            cache_dir=args.cache_dir,
+        )
+        if server is not None:
+            result["model_calls"] = server.model.health()["stats"]
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    report = {
+        "meta": {
+            "base_url": args.base_url or "fake",
+            "fake": None if args.base_url else {
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "error_rate": args.error_rate,
+                "malformed_rate": args.malformed_rate,
+                "mode": args.fake_mode,
+            },
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "result": result,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"\n📊 {result['mode']}: {result['ok']}/{result['requests']} istek, "
+          f"{result['throughput_rps']:.2f} istek/sn, p50={result['p50_ms']:.0f} p95={result['p95_ms']:.0f} "
+          f"p99={result['p99_ms']:.0f} ms, hatalar={result['failed']}")
+    if "model_calls" in result:
+        print(f"📞 Model çağrıları: {result['model_calls']['requests']}")
+    if result["response_cache"]:
+        print(f"🗄 Cevap cache'i: {result['response_cache']['endpoints']}")
+    print(f"💾 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+Token Bütçeli Prompt Sıkıştırma
+===============================
+RAG V3 tam prompt'u konunun bütün rag_docs markdown'ını ekler; prompt
+uzunluğu (prefill süresi, token maliyeti) doc'larla birlikte büyür. Bu modül:
+
+1. Doc'ları başlıklara göre bölümlere ayırır (## bölüm, ### alt bölüm).
+2. Bölümleri istenen alt konuya göre puanlar: başlıkta alt konu geçen
+   bölümler en yüksek, genel bölümler düşük puan alır; başka bir alt konuya
+   ayrılmış bölümler (örn. "Çok Anlamlılık" istenirken "Eş Anlamlılık")
+   bütçe kalsa bile eklenmez (modeli yanlış soru tipine yönlendirir).
+3. Alt konuya ayrılmış en iyi bölümün yerini önce ayırır (sığmazsa paragraf
+   / liste maddesi sınırından kısaltır), kalan bütçeyi diğer bölümlerle puan
+   sırasıyla doldurur ve doc'taki orijinal sırayla (üst başlıklarıyla
+   birlikte) yeniden birleştirir.
+
+Token sayısı modelin tokenizer'ı verilmişse onunla, yoksa kelime uzunluğuna
+dayalı bir tahminle ölçülür (TokenCounter.exact).
+"""
+
+import re
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from prompt_layout import PromptParts
+
+# Başlık / alt konu eşleştirmesinde yok sayılan kelimeler (katlanmış)
+STOPWORDS = frozenset({
+    "alt", "konu", "ve", "ile", "icin", "bir", "bu", "da", "de", "mi", "ya",
+    "nasil", "olculur", "sorulari", "sorusu", "genel",
+})
+# Türkçe ekleri kabaca atmak için kelimenin ilk STEM_LENGTH harfi kullanılır
+# ("fiilimsiler" / "fiilimsi" -> "fiili")
+STEM_LENGTH = 5
+
+# Puanlama ağırlıkları
+TITLE_WEIGHT = 3.0
+BODY_WEIGHT = 1.0
+BASE_SCORE = 0.2
+
+_HEADING = re.compile(r"^(#{1,3}) +(.*)$")
+_WORD = re.compile(r"\w+|[^\w\s]")
+# Kısaltmada kesilebilecek satırlar: boş satır (paragraf sonu) veya liste maddesi başı
+_BLOCK_START = re.compile(r"^\s*$|^\s*(?:[-*+]|\d+[.)])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokenizer yokken yaklaşık token sayısı (kelime başına ~4 harf / token, noktalama 1)."""
+    return sum(len(w) // 4 + 1 if w[0].isalnum() else 1 for w in _WORD.findall(text))
+
+
+class TokenCounter:
+    """Metin -> token sayısı; gerçek tokenizer varsa onunla, yoksa tahminle."""
+
+    def __init__(self, tokenizer=None):
+        """
+        Args:
+            tokenizer: encode(text) -> id listesi veren tokenizer (HF AutoTokenizer vb.)
+        """
+        self.tokenizer = tokenizer
+        self.count = lru_cache(maxsize=8192)(self._count)
+
+    @property
+    def exact(self) -> bool:
+        return self.tokenizer is not None
+
+    @classmethod
+    def from_pretrained(cls, model_name: str) -> "TokenCounter":
+        """Modelin tokenizer'ını yükler; yüklenemezse tahmine düşer."""
+        try:
+            from transformers import AutoTokenizer
+            return cls(AutoTokenizer.from_pretrained(model_name))
+        except Exception as e:
+            print(f"⚠️ Tokenizer yüklenemedi ({model_name}), token sayısı tahmin edilecek: {e}")
+            return cls()
+
+    def _count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.tokenizer is None:
+            return estimate_tokens(text)
+        try:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+        except TypeError:
+            return len(self.tokenizer.encode(text))
+
+
+def stems(text: str, fold: Callable[[str], str]) -> FrozenSet[str]:
+    """Metnin katlanmış, kısaltılmış kelime kümesi (eşleştirme için)."""
+    words = re.split(r"[^a-z0-9]+", fold(text))
+    return frozenset(w[:STEM_LENGTH] for w in words if w and w not in STOPWORDS)
+
+
+@dataclass(frozen=True)
+class DocSection:
+    """
+    Bir doc'un seçilebilir parçası.
+
+    Başlık parçaları (doc girişi, alt bölümleri olan ## bölümün girişi) tek
+    başına seçilmez; altındaki bir bölüm seçilince onunla birlikte eklenir.
+    """
+
+    doc: str
+    index: int
+    title: str
+    text: str
+    parent: Optional[int]
+    is_header: bool
+
+
+def split_sections(doc: str, markdown: str) -> Tuple[DocSection, ...]:
+    """
+    Markdown'ı bölümlere ayırır (metin olduğu gibi korunur, birleşimi doc'un kendisidir).
+
+    Yapı: doc girişi (# başlık) -> ## bölümler; ### alt bölümü olan ## bölümün
+    girişi başlık parçası olur, her ### ayrı seçilir.
+    """
+    blocks: List[List] = [[1, "", []]]  # [seviye, başlık, satırlar]
+    for line in markdown.splitlines(keepends=True):
+        match = _HEADING.match(line.rstrip("\n"))
+        if match and len(match.group(1)) >= 2:
+            blocks.append([len(match.group(1)), match.group(2).strip(), [line]])
+        else:
+            if match and not blocks[-1][1]:
+                blocks[-1][1] = match.group(2).strip()
+            blocks[-1][2].append(line)
+
+    sections: List[DocSection] = []
+    lead = "".join(blocks[0][2])
+    sections.append(DocSection(doc, 0, blocks[0][1], lead, None, True))
+    h2_index, h2_title = 0, ""
+    for i, (level, title, lines) in enumerate(blocks[1:], start=1):
+        text = "".join(lines)
+        has_children = level == 2 and i + 1 < len(blocks) and blocks[i + 1][0] == 3
+        if level == 2:
+            h2_index, h2_title = len(sections), title
+            sections.append(DocSection(doc, h2_index, title, text, 0, has_children))
+        else:
+            # ### başlığı üst bölümün adını da taşır (alt konu eşleşmesi miras kalır)
+            sections.append(DocSection(doc, len(sections), f"{h2_title} > {title}", text, h2_index, False))
+    return tuple(sections)
+
+
+def section_score(
+    section: DocSection,
+    query: FrozenSet[str],
+    subtopics: Sequence[FrozenSet[str]],
+    fold: Callable[[str], str],
+) -> float:
+    """
+    Bölümün alt konuya uygunluğu (0: eklenmez).
+
+    Args:
+        query: Alt konunun kelime kökleri
+        subtopics: Her alt konu adının ayırt edici kökleri (konu ailesi
+            adlarında geçenler çıkarılmış); başlığı bunlardan birini tamamen
+            içeren bölüm o alt konuya ayrılmış sayılır
+    """
+    title = stems(section.title, fold)
+    targeted = [names for names in subtopics if names <= title]
+    if targeted and not any(names & query for names in targeted):
+        return 0.0  # başka bir alt konuya ayrılmış bölüm
+    if not query:
+        return BASE_SCORE
+    body = stems(section.text, fold)
+    return BASE_SCORE + TITLE_WEIGHT * len(title & query) / len(query) + BODY_WEIGHT * len(body & query) / len(query)
+
+
+@dataclass(frozen=True)
+class CompactPrompt:
+    """Bütçeli prompt (sabit önek + sonek) ve token raporu."""
+
+    parts: PromptParts
+    tokens: int
+    full_tokens: int
+    budget: int
+    sections: Tuple[str, ...]
+    exact: bool
+
+    @property
+    def prompt(self) -> str:
+        return self.parts.text
+
+    @property
+    def prefix_id(self) -> str:
+        return self.parts.prefix_id
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.full_tokens - self.tokens
+
+    @property
+    def fits(self) -> bool:
+        return self.tokens <= self.budget
+
+
+def rank_sections(
+    sections: Sequence[DocSection],
+    query: FrozenSet[str],
+    subtopics: Sequence[FrozenSet[str]],
+    fold: Callable[[str], str],
+    weight: float = 1.0,
+) -> List[Tuple[float, DocSection]]:
+    """Seçilebilir (başlık olmayan) bölümler ve puanları."""
+    return [
+        (weight * section_score(section, query, subtopics, fold), section)
+        for section in sections
+        if not section.is_header
+    ]
+
+
+def best_targeted_section(
+    ranked: Iterable[Tuple[float, DocSection]],
+    query: FrozenSet[str],
+    fold: Callable[[str], str],
+    doc: str,
+) -> Optional[DocSection]:
+    """doc'ta başlığı alt konuyu içeren en yüksek puanlı bölüm (yoksa None)."""
+    best = None
+    for score, section in ranked:
+        if section.doc == doc and score > 0 and stems(section.title, fold) & query:
+            if best is None or score > best[0]:
+                best = (score, section)
+    return best[1] if best else None
+
+
+def truncate_section(section: DocSection, counter: TokenCounter, max_tokens: int) -> Optional[DocSection]:
+    """
+    Bölümü max_tokens'a sığacak şekilde paragraf / liste maddesi sınırından kısaltır.
+
+    Başlık satırı ve en az bir içerik satırı korunur; bu bile sığmazsa None.
+    """
+    if counter.count(section.text) <= max_tokens:
+        return section
+    lines = section.text.splitlines(keepends=True)
+    text = None
+    for i in range(2, len(lines)):
+        if not _BLOCK_START.match(lines[i]):
+            continue
+        candidate = "".join(lines[:i]).rstrip("\n") + "\n"
+        if counter.count(candidate) > max_tokens:
+            break
+        text = candidate
+    return replace(section, text=text) if text else None
+
+
+def select_sections(
+    ranked: Iterable[Tuple[float, DocSection]],
+    sections_by_doc: Dict[str, Sequence[DocSection]],
+    counter: TokenCounter,
+    budget: int,
+    wrapper_tokens: Dict[str, int],
+    doc_caps: Optional[Dict[str, int]] = None,
+    pinned: Optional[DocSection] = None,
+) -> List[DocSection]:
+    """
+    Bölümleri puan sırasıyla (eşitlikte doc sırasıyla) bütçeye sığdığı kadar seçer.
+
+    Bir bölüm seçilince henüz eklenmemiş üst başlıkları ve doc'un prompt
+    başlığı (wrapper_tokens) da maliyete katılır. doc_caps verilen doc'lar
+    için ayrıca doc başına token sınırı uygular. pinned (alt konuya ayrılmış
+    bölüm) diğerlerinden önce yerleştirilir, sığmazsa kısaltılır; böylece
+    daha düşük puanlı genel bölümler onun yerini dolduramaz.
+    """
+    chosen = set()
+    used_by_doc: Dict[str, int] = {}
+    shortened: Dict[Tuple[str, int], DocSection] = {}
+    remaining = budget
+    caps = doc_caps or {}
+
+    def overhead(section: DocSection) -> Tuple[List[DocSection], int]:
+        # Eklenmemiş üst başlıklar + doc'un ilk bölümünde prompt başlığı
+        doc_sections = sections_by_doc[section.doc]
+        parents = []
+        parent = section.parent
+        while parent is not None and (section.doc, parent) not in chosen:
+            parents.append(doc_sections[parent])
+            parent = doc_sections[parent].parent
+        cost = sum(counter.count(s.text) for s in parents)
+        if section.doc not in used_by_doc:
+            cost += wrapper_tokens.get(section.doc, 0)
+        return parents, cost
+
+    def room(doc: str) -> int:
+        cap = caps.get(doc)
+        return remaining if cap is None else min(remaining, cap - used_by_doc.get(doc, 0))
+
+    def add(section: DocSection, parents: List[DocSection], cost: int) -> None:
+        nonlocal remaining
+        remaining -= cost
+        used_by_doc[section.doc] = used_by_doc.get(section.doc, 0) + cost
+        chosen.update((s.doc, s.index) for s in [section, *parents])
+
+    if pinned is not None:
+        parents, extra = overhead(pinned)
+        fitted = truncate_section(pinned, counter, room(pinned.doc) - extra)
+        if fitted is not None:
+            if fitted is not pinned:
+                shortened[(pinned.doc, pinned.index)] = fitted
+            add(pinned, parents, extra + counter.count(fitted.text))
+
+    for score, section in sorted(ranked, key=lambda item: -item[0]):
+        if score <= 0:
+            break
+        if (section.doc, section.index) in chosen:
+            continue
+        parents, extra = overhead(section)
+        cost = extra + counter.count(section.text)
+        if cost > room(section.doc):
+            continue
+        add(section, parents, cost)
+    return [
+        shortened.get((doc, s.index), s)
+        for doc in sections_by_doc
+        for s in sections_by_doc[doc]
+        if (doc, s.index) in chosen
+    ]
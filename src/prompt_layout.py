@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Sabit Önek / Değişken Sonek Prompt Düzeni
+=========================================
+Aynı soru tipi için üretilen prompt'ların büyük kısmı (rol, kılavuz,
+kurallar, çıktı formatı) her istekte aynıdır; tema / farkındalık konusu
+gibi isteğe özel parçalar ise kısadır. Prompt kurucular bu iki kısmı ayrı
+verir:
+
+    prefix   Soru tipi başına sabit (kılavuz + kurallar + format)
+    suffix   İsteğe özel kısa kısım (tema, farkındalık konusu, uyarılar)
+
+prefix_id önekin içerik hash'idir: yerel inference sunucusu önekin KV
+cache'ini bu anahtarla saklayıp sonraki isteklerde sadece soneki işler
+(prefill süresi tekrar eden alt konularda sonek uzunluğuna iner).
+"""
+
+import hashlib
+from dataclasses import dataclass, replace
+from typing import Any, Dict
+
+
+def make_prefix_id(prefix: str) -> str:
+    """Önek metninin kısa içerik hash'i (aynı önek -> aynı id)."""
+    return hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class PromptParts:
+    """İki parçalı prompt; tam metin prefix + suffix."""
+
+    prefix: str
+    suffix: str
+    prefix_id: str
+
+    @classmethod
+    def build(cls, prefix: str, suffix: str = "") -> "PromptParts":
+        return cls(prefix=prefix, suffix=suffix, prefix_id=make_prefix_id(prefix))
+
+    @property
+    def text(self) -> str:
+        return self.prefix + self.suffix
+
+    def with_suffix(self, suffix: str) -> "PromptParts":
+        """Aynı önek (ve id) ile farklı sonek; id yeniden hesaplanmaz."""
+        return replace(self, suffix=suffix)
+
+    def to_payload(self) -> Dict[str, Any]:
+        """
+        /generate isteği: mevcut {"prompt": {"user": ...}} biçimine ek olarak
+        prefix_id ve önekin karakter uzunluğu (sunucu metni bölebilsin diye).
+        """
+        return {
+            "prompt": {"user": self.text},
+            "prefix_id": self.prefix_id,
+            "prefix_chars": len(self.prefix),
+        }
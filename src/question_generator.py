@@ -80,10 +80,12 @@ class LGSQuestionGenerator:
         self.stats = compute_stats(self.questions)
         print(f"✓ {len(self.questions)} soru yüklendi ve istatistikler hesaplandı")
         
-        # RAG sistemini başlat
+        # RAG sistemini başlat (bu veri setinin kendi index klasörü; birleşik
+        # data/rag_index ile paylaşılırsa her açılışta birbirini yeniden encode eder)
         cache_dir = os.path.dirname(self.data_path)
+        index_name = f"rag_index_{os.path.splitext(os.path.basename(self.data_path))[0]}"
         self.rag = SimpleRAG()
-        self.rag.initialize(cache_dir=cache_dir)
+        self.rag.initialize(cache_dir=cache_dir, index_name=index_name)
         self.rag.build_index(self.questions)
         print("✓ RAG sistemi hazır")
     
@@ -123,7 +125,8 @@ class LGSQuestionGenerator:
                     k=4,
                     topic=konu,
                     subtopic=alt_konu,
-                    must_not_have=["numaralanmış", "numaralandırılmış", "I., II., III."]  # Problemli pattern'ler
+                    must_not_have=["numaralanmış", "numaralandırılmış", "I., II., III."],  # Problemli pattern'ler
+                    mmr_lambda=0.7  # Birbirinin kopyası referans kökleri ele
                 )
                 
                 if rag_results:
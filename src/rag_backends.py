@@ -0,0 +1,496 @@
+# -*- coding: utf-8 -*-
+"""
+RAG Vektör Arama Backend'leri
+=============================
+L2-normalize embedding matrisi üzerinde top-k arama:
+
+    flat : tam (exact) tarama, tek matris-vektör çarpımı
+    ivf  : inverted file; vektörler k-means ile nlist kümeye ayrılır,
+           sorgu yalnızca en yakın nprobe kümenin satırlarını tarar
+
+İki backend de opsiyonel sıkıştırılmış depolamayla (storage="float16" /
+"int8") çalışır: kaba arama sıkıştırılmış matriste, ilk adaylar float32
+ile yeniden skorlanır.
+
+Backend'in kalıcı verisi (ivf için merkezler + küme listeleri, sıkıştırılmış
+matris) rag_store index klasörüne dizi olarak yazılır ve mmap ile açılır;
+backend ilk aramada kurulur. recall_latency_report backend'leri,
+compression_report sıkıştırılmış depolamayı tam taramayla karşılaştırır.
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """Vektörleri (veya matrisin satırlarını) birim uzunluğa getirir."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    En yüksek skorlu k indeksi azalan sırada döndürür.
+
+    Tam argsort yerine argpartition kullanır; sıralama (eşitlikler dahil)
+    ``np.argsort(scores, kind="stable")[-k:][::-1]`` ile aynıdır. k. skorla
+    eşit satırlardan argsort'un seçeceği (en büyük indeksli) olanlar alınır;
+    argpartition'ın sınırdaki keyfi seçimine bırakılmaz.
+    """
+    n = scores.shape[0]
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        candidates = np.arange(n)
+    else:
+        kth = scores[np.argpartition(scores, n - k)[n - k]]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)
+        candidates = np.sort(np.concatenate([above, ties[len(ties) - (k - len(above)):]]))
+    order = np.argsort(scores[candidates], kind="stable")[::-1]
+    return candidates[order]
+
+
+STORAGE_MODES = ("float32", "float16", "int8")
+
+
+class CompressedVectors:
+    """
+    Embedding matrisinin sıkıştırılmış kopyası (kaba arama için).
+
+        float16 : yarı hassasiyet, 2x küçük
+        int8    : boyut başına ölçek (scale = max|x| / 127), ~4x küçük
+
+    Skorlar yaklaşıktır; adaylar float32 matrisle yeniden skorlanır.
+    """
+
+    def __init__(self, mode: str, data: np.ndarray, scale: Optional[np.ndarray] = None):
+        self.mode = mode
+        self.data = data
+        self.scale = scale
+
+    @classmethod
+    def encode(cls, embeddings: np.ndarray, mode: str, chunk_size: int = 8192) -> "CompressedVectors":
+        if mode == "float16":
+            return cls(mode, np.asarray(embeddings, dtype=np.float16))
+        if mode != "int8":
+            raise ValueError(f"Bilinmeyen depolama modu: {mode} (seçenekler: {', '.join(STORAGE_MODES)})")
+
+        scale = np.abs(embeddings).max(axis=0).astype(np.float32) / 127.0
+        scale[scale == 0] = 1.0
+        codes = np.empty(embeddings.shape, dtype=np.int8)
+        for start in range(0, embeddings.shape[0], chunk_size):
+            block = embeddings[start:start + chunk_size] / scale
+            codes[start:start + chunk_size] = np.clip(np.rint(block), -127, 127)
+        return cls(mode, codes, scale)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], mode: str) -> Optional["CompressedVectors"]:
+        if mode == "float16" and "float16_data" in arrays:
+            return cls(mode, arrays["float16_data"])
+        if mode == "int8" and "int8_codes" in arrays and "int8_scale" in arrays:
+            return cls(mode, arrays["int8_codes"], arrays["int8_scale"])
+        return None
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        if self.mode == "float16":
+            return {"float16_data": self.data}
+        return {"int8_codes": self.data, "int8_scale": self.scale}
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None, chunk_size: int = 1024) -> np.ndarray:
+        """
+        Yaklaşık skorlar; float32'ye çevirme cache'e sığan parçalarla yapılır.
+
+        NumPy'da int8/float16 matris-vektör çarpımı olmadığından kazanç bellek
+        ve bant genişliği tarafındadır; float16 dönüşümü int8'den belirgin yavaştır.
+        """
+        data = self.data if rows is None else self.data[rows]
+        q = (query * self.scale if self.scale is not None else query).astype(np.float32)
+        out = np.empty(data.shape[0], dtype=np.float32)
+        for start in range(0, data.shape[0], chunk_size):
+            out[start:start + chunk_size] = data[start:start + chunk_size].astype(np.float32) @ q
+        return out
+
+    def scores_many(self, queries: np.ndarray, chunk_size: int = 1024) -> np.ndarray:
+        """
+        (n, m) yaklaşık skor matrisi; her parça bir kez float32'ye çevrilip
+        tüm sorgularla çarpılır (dönüşüm maliyeti sorgular arasında paylaşılır).
+        """
+        q = (queries * self.scale if self.scale is not None else queries).astype(np.float32)
+        out = np.empty((self.data.shape[0], q.shape[0]), dtype=np.float32)
+        for start in range(0, self.data.shape[0], chunk_size):
+            out[start:start + chunk_size] = self.data[start:start + chunk_size].astype(np.float32) @ q.T
+        return out
+
+
+class _VectorBackend:
+    """
+    Backend'lerin ortak skorlama kısmı.
+
+    storage="float32" iken satırlar doğrudan skorlanır. Sıkıştırılmış modda
+    kaba arama sıkıştırılmış matriste yapılır, ilk ``k * rerank`` aday
+    float32 embedding'lerle yeniden skorlanır; float32 matrisin yalnızca
+    bu satırları okunur.
+    """
+
+    def __init__(self, embeddings: np.ndarray, compressed: Optional[CompressedVectors] = None, rerank: int = 4):
+        self.embeddings = embeddings
+        self.compressed = compressed
+        self.rerank = rerank
+
+    @property
+    def is_exact(self) -> bool:
+        """Tüm satırları float32 ile tarayan backend mi (flat + float32)."""
+        return False
+
+    @staticmethod
+    def _compress(embeddings: np.ndarray, storage: str) -> Optional[CompressedVectors]:
+        return None if storage == "float32" else CompressedVectors.encode(embeddings, storage)
+
+    @staticmethod
+    def _load_compressed(arrays: Dict[str, np.ndarray], storage: str):
+        """(sıkıştırılmış kopya, bulundu mu)."""
+        if storage == "float32":
+            return None, True
+        compressed = CompressedVectors.from_arrays(arrays, storage)
+        return compressed, compressed is not None
+
+    def _storage_arrays(self) -> Dict[str, np.ndarray]:
+        return self.compressed.to_arrays() if self.compressed is not None else {}
+
+    def _score(self, query: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if self.compressed is None:
+            scores = (self.embeddings if rows is None else self.embeddings[rows]) @ query
+            top = top_k_indices(scores, k)
+            return (top if rows is None else rows[top]), scores[top]
+
+        return self._rerank(query, self.compressed.scores(query, rows), k, rows)
+
+    def _rerank(
+        self, query: np.ndarray, coarse: np.ndarray, k: int, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Kaba skorların ilk ``k * rerank`` adayını float32 ile yeniden skorlar."""
+        candidates = top_k_indices(coarse, k * self.rerank)
+        # Artan satır sırası: eşit skorlarda flat ile aynı sıra, mmap'te sıralı okuma
+        candidates = np.sort(candidates if rows is None else rows[candidates])
+        exact = self.embeddings[candidates] @ query
+        top = top_k_indices(exact, k)
+        return candidates[top], exact[top]
+
+    def search_many(self, queries: np.ndarray, k: int, batch_size: int = 64) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Sorgu başına search sonucu; backend'ler toplu taramayla hızlandırabilir."""
+        return [self.search(q, k) for q in queries]
+
+
+class FlatIndex(_VectorBackend):
+    """Tam tarama (mevcut davranış); storage ile sıkıştırılmış kaba tarama + re-rank."""
+
+    name = "flat"
+
+    @property
+    def is_exact(self) -> bool:
+        return self.compressed is None
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, storage: str = "float32", rerank: int = 4, **params) -> "FlatIndex":
+        return cls(embeddings, cls._compress(embeddings, storage), rerank)
+
+    @classmethod
+    def from_arrays(
+        cls, embeddings: np.ndarray, arrays: Dict[str, np.ndarray],
+        storage: str = "float32", rerank: int = 4, **params
+    ) -> Optional["FlatIndex"]:
+        compressed, found = cls._load_compressed(arrays, storage)
+        return cls(embeddings, compressed, rerank) if found else None
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return self._storage_arrays()
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(satırlar, skorlar) azalan skor sırasında."""
+        return self._score(query, k)
+
+    def search_many(self, queries: np.ndarray, k: int, batch_size: int = 64) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Toplu arama: matris her ``batch_size`` sorgu için bir kez taranır
+        (matris-matris çarpımı). Sonuçlar search ile aynıdır; BLAS toplama
+        sırası farkından skorlar son basamakta farklı olabilir.
+        """
+        results = []
+        for start in range(0, len(queries), batch_size):
+            block = np.asarray(queries[start:start + batch_size], dtype=np.float32)
+            if self.compressed is None:
+                scores = np.asarray(self.embeddings @ block.T)
+                for j in range(block.shape[0]):
+                    top = top_k_indices(scores[:, j], k)
+                    results.append((top, scores[top, j]))
+            else:
+                coarse = self.compressed.scores_many(block)
+                results.extend(self._rerank(q, coarse[:, j], k) for j, q in enumerate(block))
+        return results
+
+
+class IVFIndex(_VectorBackend):
+    """
+    Inverted file (IVF) yaklaşık arama.
+
+    Kümeler spherical k-means ile (cosine) eğitilir. Sorguda merkezlere
+    göre en yakın nprobe küme seçilir, bu kümelerin satırları skorlanır.
+    nprobe büyüdükçe recall artar, hız düşer.
+    """
+
+    name = "ivf"
+    ARRAY_KEYS = ("ivf_centroids", "ivf_offsets", "ivf_rows")
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_rows: np.ndarray,
+        nprobe: int = 8,
+        compressed: Optional[CompressedVectors] = None,
+        rerank: int = 4,
+    ):
+        super().__init__(embeddings, compressed, rerank)
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        iterations: int = 10,
+        sample_size: int = 20000,
+        seed: int = 0,
+        storage: str = "float32",
+        rerank: int = 4,
+        **params,
+    ) -> "IVFIndex":
+        """
+        Args:
+            nlist: Küme sayısı (varsayılan: ~sqrt(n))
+            nprobe: Sorgu başına taranan küme sayısı
+            iterations: k-means iterasyonu
+            sample_size: k-means eğitim örneği üst sınırı
+            storage: "float32", "float16" veya "int8"
+            rerank: Sıkıştırılmış modda k başına float32 ile yeniden skorlanan aday
+        """
+        n = embeddings.shape[0]
+        nlist = max(1, min(nlist or int(round(np.sqrt(n))), n))
+        rng = np.random.default_rng(seed)
+
+        sample = embeddings
+        if n > sample_size:
+            sample = embeddings[np.sort(rng.choice(n, sample_size, replace=False))]
+        centroids = _spherical_kmeans(np.asarray(sample, dtype=np.float32), nlist, iterations, rng)
+
+        assign = _assign(embeddings, centroids)
+        rows = np.argsort(assign, kind="stable").astype(np.int32)
+        counts = np.bincount(assign, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(
+            embeddings, centroids, offsets, rows, nprobe=nprobe,
+            compressed=cls._compress(embeddings, storage), rerank=rerank,
+        )
+
+    @classmethod
+    def from_arrays(
+        cls, embeddings: np.ndarray, arrays: Dict[str, np.ndarray], nprobe: int = 8,
+        storage: str = "float32", rerank: int = 4, **params
+    ) -> Optional["IVFIndex"]:
+        """Index klasöründeki dizilerden kurar; diziler yoksa None."""
+        compressed, found = cls._load_compressed(arrays, storage)
+        if not found or not all(key in arrays for key in cls.ARRAY_KEYS):
+            return None
+        return cls(
+            embeddings, arrays["ivf_centroids"], arrays["ivf_offsets"], arrays["ivf_rows"], nprobe=nprobe,
+            compressed=compressed, rerank=rerank,
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "ivf_centroids": self.centroids,
+            "ivf_offsets": self.list_offsets,
+            "ivf_rows": self.list_rows,
+            **self._storage_arrays(),
+        }
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        """En yakın nprobe kümenin satırları (artan sırada)."""
+        probe = top_k_indices(self.centroids @ query, self.nprobe)
+        parts = [self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int32)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(satırlar, skorlar) azalan skor sırasında."""
+        return self._score(query, k, self.candidates(query))
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    """Her vektörün en yakın (cosine) merkezi; bellek için parça parça."""
+    assign = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], chunk_size):
+        assign[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+    return assign
+
+
+def _spherical_kmeans(sample: np.ndarray, nlist: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        # Boş kalan kümeler rastgele bir örnekle yeniden başlatılır
+        empty = np.bincount(assign, minlength=nlist) == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()), replace=False)]
+        centroids = l2_normalize(sums)
+    return centroids
+
+
+BACKENDS = {
+    FlatIndex.name: FlatIndex,
+    IVFIndex.name: IVFIndex,
+}
+
+
+def create_backend(
+    name: str,
+    embeddings: np.ndarray,
+    arrays: Optional[Dict[str, np.ndarray]] = None,
+    **params,
+):
+    """
+    Backend'i index dizilerinden açar; diziler yoksa embedding'lerden eğitir.
+
+    Args:
+        name: "flat" veya "ivf"
+        embeddings: L2-normalize embedding matrisi
+        arrays: rag_store index klasöründen yüklenen diziler
+        **params: Backend parametreleri (ör. nlist, nprobe, storage, rerank)
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Bilinmeyen index backend'i: {name} (seçenekler: {', '.join(BACKENDS)})")
+    cls = BACKENDS[name]
+    backend = cls.from_arrays(embeddings, arrays or {}, **params)
+    if backend is None:
+        print(f"⚠ '{name}' backend verisi index'te yok, bellekte oluşturuluyor...")
+        backend = cls.build(embeddings, **params)
+    return backend
+
+
+def recall_latency_report(
+    embeddings: np.ndarray,
+    queries: np.ndarray,
+    backends: Dict[str, Any],
+    k: int = 10,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Backend'leri tam taramaya göre recall@k ve sorgu gecikmesiyle karşılaştırır.
+
+    Args:
+        embeddings: L2-normalize embedding matrisi (referans tam tarama için)
+        queries: (m, d) L2-normalize sorgu vektörleri
+        backends: ad -> backend (search(query, k) arayüzü)
+        k: recall@k için k
+
+    Returns:
+        ad -> {"recall_at_k", "mean_ms", "p95_ms"}
+    """
+    exact = FlatIndex(embeddings)
+    truth = [set(exact.search(q, k)[0].tolist()) for q in queries]
+
+    report = {}
+    for name, backend in backends.items():
+        hits, latencies = 0, []
+        for q, expected in zip(queries, truth):
+            start = time.perf_counter()
+            rows, _ = backend.search(q, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(expected.intersection(rows.tolist()))
+        report[name] = {
+            "recall_at_k": hits / max(1, sum(len(t) for t in truth)),
+            "mean_ms": float(np.mean(latencies)) if latencies else 0.0,
+            "p95_ms": float(np.percentile(latencies, 95)) if latencies else 0.0,
+        }
+    return report
+
+
+def compression_report(
+    embeddings: np.ndarray,
+    backend: Any,
+    k: int = 10,
+    n_queries: int = 100,
+    seed: int = 0,
+) -> Optional[Dict[str, Any]]:
+    """
+    Sıkıştırılmış backend için sıkıştırma oranı ve tam taramayla top-k uyumu.
+
+    Sorgular index'in kendi satırlarından (küçük gürültüyle) örneklenir,
+    encoder gerekmez. Backend sıkıştırılmamışsa None döner.
+    """
+    if getattr(backend, "compressed", None) is None or len(embeddings) == 0:
+        return None
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(embeddings), min(n_queries, len(embeddings)), replace=False)
+    # Index satırlarına küçük gürültü: sorgu vektörü birebir index'te olmasın
+    queries = l2_normalize(embeddings[np.sort(sample)] + rng.normal(scale=0.05, size=(len(sample), embeddings.shape[1])))
+    agreement = recall_latency_report(embeddings, queries, {"compressed": backend}, k=k)["compressed"]
+    return {
+        "storage": backend.compressed.mode,
+        "ratio": embeddings.nbytes / backend.compressed.nbytes,
+        "agreement_at_k": agreement["recall_at_k"],
+        "k": k,
+    }
+
+
+def main():
+    """Mevcut bir index üzerinde flat / ivf (farklı nprobe) / sıkıştırılmış depolama karşılaştırması."""
+    import argparse
+
+    from rag_store import load_index
+
+    parser = argparse.ArgumentParser(description="RAG index backend recall@k / gecikme raporu")
+    parser.add_argument("index_dir", help="rag_store index klasörü (ör. data/rag_index)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="Sorgu olarak kullanılacak örnek satır sayısı")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    loaded = load_index(args.index_dir)
+    embeddings = loaded.embeddings
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(embeddings), min(args.queries, len(embeddings)), replace=False)
+    # Index satırlarına küçük gürültü: sorgu vektörü birebir index'te olmasın
+    queries = l2_normalize(embeddings[sample] + rng.normal(scale=0.05, size=(len(sample), embeddings.shape[1])))
+
+    ivf = create_backend("ivf", embeddings, loaded.arrays)
+    backends: Dict[str, Any] = {"flat": FlatIndex(embeddings)}
+    for nprobe in args.nprobe:
+        backends[f"ivf(nprobe={nprobe})"] = IVFIndex(
+            embeddings, ivf.centroids, ivf.list_offsets, ivf.list_rows, nprobe=nprobe,
+        )
+    for storage in STORAGE_MODES[1:]:
+        backends[f"flat+{storage}"] = create_backend("flat", embeddings, loaded.arrays, storage=storage)
+
+    report = recall_latency_report(embeddings, queries, backends, k=args.k)
+    print(f"\n📊 {len(embeddings)} vektör, {len(queries)} sorgu, k={args.k}, nlist={len(ivf.centroids)}")
+    for name, row in report.items():
+        print(f"  {name:<20} recall@{args.k}={row['recall_at_k']:.3f}  ort={row['mean_ms']:.3f} ms  p95={row['p95_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+RAG Arama Benchmark'ı
+=====================
+Her backend (flat, ivf) ve depolama modu (float32, float16, int8) için,
+istenen boyutlarda index kurup sabit bir sorgu kümesiyle ölçer:
+
+    build_s              backend kurulum süresi
+    p50/p95/p99_ms       tek sorgu gecikmesi
+    batch_qps            search_many ile toplu sorgu çıkışı (sorgu/sn)
+    search_bytes         arama sırasında taranan yapıların boyutu
+    index_bytes          diske yazılan toplam (float32 matris + backend dizileri)
+    recall_at_k          tam (flat, float32) aramaya göre recall@k
+
+Sorgu kümesi web_app_v2.KONULAR ve configs/question_type_rules.yaml'dan
+türetilir ve encoder ile (veya no-encoder modunda .npz'den) encode edilir;
+encoder yoksa index satırlarından gürültülü sorgular üretilir.
+
+Korpus mevcut bir index'in vektörlerinden (yoksa rastgele birim
+vektörlerden) istenen boyuta örneklenir / gürültüyle çoğaltılır.
+Sonuçlar JSON'a yazılır; --baseline ile önceki bir sonuçla
+karşılaştırılıp gerilemeler listelenir.
+
+Kullanım:
+    python src/rag_benchmark.py --sizes 10000 100000 --output rag_benchmark.json
+    python src/rag_benchmark.py --baseline eski.json --output yeni.json
+"""
+
+import argparse
+import ast
+import json
+import os
+import platform
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rag_backends import BACKENDS, STORAGE_MODES, FlatIndex, l2_normalize
+from rag_encoder import DEFAULT_MODEL_NAME, ENCODERS
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KONULAR_SOURCE = os.path.join(PROJECT_ROOT, "src", "web_app_v2.py")
+RULES_PATH = os.path.join(PROJECT_ROOT, "configs", "question_type_rules.yaml")
+ZORLUKLAR = ("kolay", "orta", "zor")
+
+
+def load_konular(path: str = KONULAR_SOURCE) -> Dict[str, List[str]]:
+    """Web uygulamasındaki KONULAR sözlüğü (Flask import etmeden, AST'den okunur)."""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "KONULAR" for t in node.targets):
+            return ast.literal_eval(node.value)
+    return {}
+
+
+def load_rule_queries(path: str = RULES_PATH) -> List[str]:
+    """Kural dosyasındaki her soru tipi için "konu ailesi + alt konu" ve izinli soru kökleri."""
+    try:
+        import yaml
+    except ImportError:
+        print("⚠ PyYAML yüklü değil, kural sorguları atlanıyor.")
+        return []
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        rules = yaml.safe_load(f) or {}
+
+    queries = []
+    for rule in rules.values():
+        if not isinstance(rule, dict):
+            continue
+        if rule.get("topic_family") and rule.get("alt_konu"):
+            queries.append(f"{rule['topic_family']} {rule['alt_konu']}")
+        queries.extend(rule.get("allowed_question_roots") or [])
+    return queries
+
+
+def build_query_set(konular: Dict[str, List[str]], rule_queries: Sequence[str]) -> List[str]:
+    """Sabit sorgu kümesi: SimpleRAG ve SimpleRAGv2 sorgu biçimleri + kural sorguları."""
+    queries = []
+    for konu, alt_konular in konular.items():
+        for alt_konu in alt_konular:
+            queries.append(f"{konu} {alt_konu}")  # SimpleRAG.get_full_examples
+            queries.extend(f"Konu: {konu} Alt Konu: {alt_konu} Zorluk: {z}" for z in ZORLUKLAR)  # SimpleRAGv2
+    queries.extend(rule_queries)
+    return list(dict.fromkeys(queries))
+
+
+def encode_queries(
+    queries: List[str], model_name: str = DEFAULT_MODEL_NAME, query_vectors: Optional[str] = None
+) -> Optional[np.ndarray]:
+    """Sorguları encoder (veya .npz) ile encode eder; mümkün değilse None."""
+    if query_vectors:
+        ENCODERS.use_precomputed(model_name, query_vectors)
+    try:
+        return l2_normalize(ENCODERS.get(model_name).encode(queries, convert_to_numpy=True))
+    except (ImportError, KeyError) as e:
+        print(f"⚠ Sorgular encode edilemedi ({e}); index satırlarından sentetik sorgu kullanılacak.")
+        return None
+
+
+def synthetic_queries(embeddings: np.ndarray, n: int, seed: int = 0) -> np.ndarray:
+    """Index satırlarına küçük gürültü eklenmiş sorgular (sorgu birebir index'te olmasın)."""
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(embeddings), min(n, len(embeddings)), replace=False)
+    return l2_normalize(embeddings[np.sort(sample)] + rng.normal(scale=0.05, size=(len(sample), embeddings.shape[1])))
+
+
+def make_corpus(base: Optional[np.ndarray], size: int, dim: int = 384, seed: int = 0) -> np.ndarray:
+    """
+    ``size`` satırlık L2-normalize korpus.
+
+    base verilmişse satırları örneklenir; base'den büyük boyutlar için
+    satırlar gürültüyle çoğaltılır (gerçek dağılıma yakın kümelenme korunur).
+    """
+    rng = np.random.default_rng(seed)
+    if base is None or len(base) == 0:
+        return l2_normalize(rng.normal(size=(size, dim)))
+    base = np.asarray(base, dtype=np.float32)
+    if size <= len(base):
+        return np.ascontiguousarray(base[np.sort(rng.choice(len(base), size, replace=False))])
+    rows = rng.integers(0, len(base), size)
+    return l2_normalize(base[rows] + rng.normal(scale=0.05, size=(size, base.shape[1])).astype(np.float32))
+
+
+def default_configs(nprobes: Sequence[int] = (4, 16)) -> List[Tuple[str, Dict[str, Any]]]:
+    """(backend adı, parametreler): her backend x depolama modu (ivf için her nprobe)."""
+    configs = [("flat", {"storage": storage}) for storage in STORAGE_MODES]
+    configs += [
+        ("ivf", {"nprobe": nprobe, "storage": storage})
+        for nprobe in nprobes
+        for storage in STORAGE_MODES
+    ]
+    return configs
+
+
+def _percentiles(latencies_ms: List[float]) -> Dict[str, float]:
+    values = np.asarray(latencies_ms) if latencies_ms else np.zeros(1)
+    return {
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+    }
+
+
+def benchmark_backend(
+    embeddings: np.ndarray,
+    queries: np.ndarray,
+    truth: List[set],
+    name: str,
+    params: Dict[str, Any],
+    k: int = 10,
+    batch_size: int = 64,
+) -> Dict[str, Any]:
+    """Tek bir backend yapılandırmasını ölçer (bkz. modül açıklaması)."""
+    start = time.perf_counter()
+    backend = BACKENDS[name].build(embeddings, **params)
+    build_s = time.perf_counter() - start
+
+    arrays = backend.to_arrays()
+    array_bytes = sum(a.nbytes for a in arrays.values())
+    compressed = getattr(backend, "compressed", None)
+    search_bytes = (compressed.nbytes if compressed is not None else embeddings.nbytes) + sum(
+        a.nbytes for key, a in arrays.items() if key.startswith("ivf_")
+    )
+
+    # Tek sorgu gecikmesi (ilk sorgu ısınma, ölçüme girmez)
+    backend.search(queries[0], k)
+    latencies, hits = [], 0
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        rows, _ = backend.search(q, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected.intersection(rows.tolist()))
+
+    start = time.perf_counter()
+    backend.search_many(queries, k, batch_size=batch_size)
+    batch_s = time.perf_counter() - start
+
+    return {
+        "backend": name,
+        "params": params,
+        "build_s": build_s,
+        **_percentiles(latencies),
+        "batch_qps": len(queries) / max(batch_s, 1e-9),
+        "search_bytes": int(search_bytes),
+        "index_bytes": int(embeddings.nbytes + array_bytes),
+        "recall_at_k": hits / max(1, sum(len(t) for t in truth)),
+    }
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(peak if platform.system() == "Darwin" else peak * 1024)
+
+
+def run_benchmark(
+    sizes: Sequence[int],
+    query_vectors: Optional[np.ndarray] = None,
+    base: Optional[np.ndarray] = None,
+    configs: Optional[List[Tuple[str, Dict[str, Any]]]] = None,
+    k: int = 10,
+    n_synthetic: int = 200,
+    batch_size: int = 64,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Her boyut ve yapılandırma için ölçüm yapar.
+
+    Args:
+        sizes: Korpus boyutları (satır)
+        query_vectors: Encode edilmiş sabit sorgular; None ise sentetik sorgular
+        base: Korpusun örnekleneceği vektörler (ör. mevcut index); None ise rastgele
+        configs: (backend, parametreler) listesi (varsayılan: default_configs())
+    """
+    configs = configs or default_configs()
+    dim = base.shape[1] if base is not None else (query_vectors.shape[1] if query_vectors is not None else 384)
+    if query_vectors is not None and query_vectors.shape[1] != dim:
+        print(f"⚠ Sorgu boyutu ({query_vectors.shape[1]}) korpusla ({dim}) uyuşmuyor; sentetik sorgu kullanılacak.")
+        query_vectors = None
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "k": k,
+            "dim": dim,
+            "batch_size": batch_size,
+            "query_source": "encoded" if query_vectors is not None else "synthetic",
+            "corpus_source": "index" if base is not None else "random",
+            "numpy": np.__version__,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": [],
+    }
+    for size in sizes:
+        embeddings = make_corpus(base, size, dim, seed)
+        queries = query_vectors if query_vectors is not None else synthetic_queries(embeddings, n_synthetic, seed)
+        exact = FlatIndex(embeddings)
+        truth = [set(rows.tolist()) for rows, _ in exact.search_many(queries, k)]
+        print(f"\n📊 {size} vektör, {len(queries)} sorgu, k={k}")
+
+        for name, params in configs:
+            row = {"size": size, "n_queries": len(queries), **benchmark_backend(
+                embeddings, queries, truth, name, params, k=k, batch_size=batch_size,
+            )}
+            report["results"].append(row)
+            print(f"  {config_label(name, params):<32} recall@{k}={row['recall_at_k']:.3f}  "
+                  f"p50={row['p50_ms']:.3f} p95={row['p95_ms']:.3f} p99={row['p99_ms']:.3f} ms  "
+                  f"toplu={row['batch_qps']:.0f} q/s  bellek={row['search_bytes'] / 2**20:.1f} MB")
+
+    report["meta"]["peak_rss_bytes"] = _peak_rss_bytes()
+    return report
+
+
+def config_label(name: str, params: Dict[str, Any]) -> str:
+    extra = ",".join(f"{key}={value}" for key, value in sorted(params.items()))
+    return f"{name}({extra})" if extra else name
+
+
+def compare_reports(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    recall_tolerance: float = 0.01,
+    latency_tolerance: float = 0.25,
+) -> List[str]:
+    """
+    Aynı (boyut, backend, parametre) satırlarını karşılaştırıp gerilemeleri listeler.
+
+    Recall ``recall_tolerance``dan fazla düşerse veya p95 gecikmesi / toplu
+    çıkış ``latency_tolerance`` oranından fazla kötüleşirse satır raporlanır.
+    """
+    def key(row):
+        return row["size"], config_label(row["backend"], row["params"])
+
+    previous = {key(row): row for row in baseline.get("results", [])}
+    regressions = []
+    for row in current.get("results", []):
+        old = previous.get(key(row))
+        if old is None:
+            continue
+        label = f"{key(row)[1]} @ {row['size']}"
+        if row["recall_at_k"] < old["recall_at_k"] - recall_tolerance:
+            regressions.append(f"{label}: recall {old['recall_at_k']:.3f} -> {row['recall_at_k']:.3f}")
+        if row["p95_ms"] > old["p95_ms"] * (1 + latency_tolerance):
+            regressions.append(f"{label}: p95 {old['p95_ms']:.3f} -> {row['p95_ms']:.3f} ms")
+        if row["batch_qps"] < old["batch_qps"] / (1 + latency_tolerance):
+            regressions.append(f"{label}: toplu {old['batch_qps']:.0f} -> {row['batch_qps']:.0f} q/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG backend / depolama modu benchmark'ı (JSON çıktı)")
+    parser.add_argument("--index-dir", default=os.path.join(PROJECT_ROOT, "data", "rag_index"),
+                        help="Korpus vektörlerinin örnekleneceği rag_store index'i (yoksa rastgele vektörler)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--query-vectors", help="No-encoder modu: precompute_query_vectors ile üretilmiş .npz")
+    parser.add_argument("--synthetic-queries", action="store_true", help="Encoder kullanma, sentetik sorgu üret")
+    parser.add_argument("--output", default="rag_benchmark.json")
+    parser.add_argument("--baseline", help="Karşılaştırılacak önceki sonuç JSON'u")
+    args = parser.parse_args()
+
+    base = None
+    if os.path.exists(os.path.join(args.index_dir, "header.json")):
+        from rag_store import load_index
+        base = load_index(args.index_dir).embeddings
+        print(f"📂 Korpus tabanı: {args.index_dir} ({len(base)} vektör)")
+
+    query_vectors = None
+    if not args.synthetic_queries:
+        queries = build_query_set(load_konular(), load_rule_queries())
+        print(f"🔎 Sabit sorgu kümesi: {len(queries)} sorgu")
+        query_vectors = encode_queries(queries, query_vectors=args.query_vectors)
+
+    report = run_benchmark(
+        args.sizes, query_vectors, base, default_configs(args.nprobe),
+        k=args.k, batch_size=args.batch_size,
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Sonuçlar: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_reports(report, json.load(f))
+        if regressions:
+            print(f"⚠ {len(regressions)} gerileme:")
+            for line in regressions:
+                print(f"  - {line}")
+        else:
+            print("✓ Önceki sonuca göre gerileme yok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Süreç Geneli Embedding Encoder Kaydı
+====================================
+SimpleRAG, SimpleRAGv2 ve web uygulamaları aynı SentenceTransformer
+modelini kullanır. Model (ve sentence_transformers/torch importu) ilk
+encode ihtiyacında bir kez yüklenir, aynı süreçteki tüm RAG nesneleri bu
+tek örneği paylaşır.
+
+No-encoder modu: sorgu vektörleri önceden hesaplanıp .npz dosyasına
+yazılırsa (precompute_query_vectors), use_precomputed ile kaydedilen
+model adı için torch hiç import edilmeden bu vektörler kullanılır.
+"""
+
+import importlib.util
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def sbert_available() -> bool:
+    """sentence_transformers kurulu mu (import etmeden kontrol eder)."""
+    return importlib.util.find_spec("sentence_transformers") is not None
+
+
+def _normalize_query(text: str) -> str:
+    # QueryEmbeddingCache.normalize ile aynı
+    return " ".join((text or "").split())
+
+
+class PrecomputedEncoder:
+    """
+    Önceden hesaplanmış sorgu vektörlerinden encode eden hafif encoder.
+
+    Dosyada olmayan bir sorgu istenirse KeyError verir; model yüklemeye
+    geri dönmez (no-encoder modunun amacı torch'u hiç yüklememektir).
+    """
+
+    def __init__(self, vectors: Dict[str, np.ndarray]):
+        self.vectors = vectors
+
+    @classmethod
+    def load(cls, path: str) -> "PrecomputedEncoder":
+        data = np.load(path, allow_pickle=False)
+        return cls(dict(zip(data["queries"].tolist(), data["vectors"])))
+
+    def encode(self, texts: List[str], convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        missing = [t for t in texts if _normalize_query(t) not in self.vectors]
+        if missing:
+            raise KeyError(f"Önceden hesaplanmış vektör yok: {missing[:3]}")
+        return np.stack([self.vectors[_normalize_query(t)] for t in texts])
+
+
+class EncoderRegistry:
+    """Model adı -> encoder; ilk erişimde yüklenir, thread-safe."""
+
+    def __init__(self):
+        self._encoders: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.import_seconds: Optional[float] = None
+        self.load_seconds: Dict[str, float] = {}
+
+    def use_precomputed(self, model_name: str, path: str):
+        """No-encoder modu: model_name için sorguları .npz dosyasından karşılar."""
+        with self._lock:
+            self._encoders[model_name] = PrecomputedEncoder.load(path)
+        print(f"📦 Önceden hesaplanmış sorgu vektörleri: {path} ({model_name})")
+
+    def is_loaded(self, model_name: str) -> bool:
+        return model_name in self._encoders
+
+    def get(self, model_name: str = DEFAULT_MODEL_NAME):
+        """Encoder'ı döndürür; gerekirse sentence_transformers'ı import edip modeli yükler."""
+        encoder = self._encoders.get(model_name)
+        if encoder is not None:
+            return encoder
+
+        with self._lock:
+            encoder = self._encoders.get(model_name)
+            if encoder is None:
+                encoder = self._load(model_name)
+                self._encoders[model_name] = encoder
+        return encoder
+
+    def _load(self, model_name: str):
+        start = time.perf_counter()
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("SentenceTransformers gerekli: pip install sentence-transformers")
+        if self.import_seconds is None:
+            self.import_seconds = time.perf_counter() - start
+
+        print(f"🔄 Embedding model yükleniyor: {model_name}...")
+        start = time.perf_counter()
+        encoder = SentenceTransformer(model_name)
+        self.load_seconds[model_name] = time.perf_counter() - start
+        print(f"✓ Model hazır (import {self.import_seconds:.2f} sn, yükleme {self.load_seconds[model_name]:.2f} sn)")
+        return encoder
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "import_seconds": self.import_seconds,
+            "load_seconds": dict(self.load_seconds),
+            "models": {name: type(enc).__name__ for name, enc in self._encoders.items()},
+        }
+
+
+# Süreç genelinde paylaşılan kayıt
+ENCODERS = EncoderRegistry()
+
+
+def get_encoder(model_name: str = DEFAULT_MODEL_NAME):
+    return ENCODERS.get(model_name)
+
+
+def precompute_query_vectors(queries: List[str], path: str, model_name: str = DEFAULT_MODEL_NAME):
+    """
+    Sorguları gerçek modelle bir kez encode edip no-encoder modu için kaydeder.
+
+    Vektörler L2-normalize edilmeden saklanır; okuyan taraf (QueryEmbeddingCache)
+    normalize eder.
+    """
+    texts = list(dict.fromkeys(_normalize_query(q) for q in queries))
+    vectors = np.asarray(get_encoder(model_name).encode(texts, convert_to_numpy=True), dtype=np.float32)
+    np.savez(path, queries=np.array(texts), vectors=vectors)
+    print(f"💾 {len(texts)} sorgu vektörü kaydedildi: {path}")
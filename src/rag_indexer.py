@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Akışlı (Streaming) ve Devam Ettirilebilir RAG Index Oluşturucu
+==============================================================
+SimpleRAG.build_index tüm korpusu tek seferde encode eder. Bu modül
+aynı index'i parçalar halinde üretir:
+
+1. Kaynak (JSON, JSONL, klasör / ODSGM yıl dosyaları) tembel okunur,
+   kayıtlar çalışma klasöründeki metadata.jsonl'e yazılır.
+2. Embedding'ler sabit boyutlu parçalar halinde (opsiyonel: süreç havuzu)
+   encode edilip diskteki memmap matrise eklenir; her parçadan sonra
+   progress.json güncellenir.
+3. Bitince index rag_store formatında yazılır, çalışma klasörü silinir.
+
+Süreç yarıda kesilirse aynı kaynak ve modelle tekrar çalıştırıldığında son
+tamamlanan parçadan devam eder. Mevcut index'teki vektörler parmak izine
+göre yeniden kullanılır (sadece yeni/değişen kayıtlar encode edilir).
+
+Çalışma klasörü:
+
+    rag_index.build/
+    ├── metadata.jsonl    # kaynaktan okunan kayıtlar
+    ├── offsets.npy
+    ├── embeddings.npy    # (n, d) memmap, parça parça doldurulur
+    └── progress.json     # checksum, model, parça boyutu, tamamlanan satır
+"""
+
+import glob
+import json
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from rag_backends import l2_normalize
+from rag_encoder import get_encoder
+from rag_store import IndexRecords, load_index, read_header, text_fingerprint, write_records
+
+PROGRESS_FILE = "progress.json"
+
+
+def iter_source(source: Union[str, Iterable[str]]) -> Iterator[Dict[str, Any]]:
+    """
+    Soru kayıtlarını tembel okur.
+
+    Args:
+        source: .json (liste veya {"sorular": [...]}) / .jsonl dosyası, klasör
+            (içindeki .json/.jsonl dosyaları ad sırasıyla), glob deseni veya
+            bunların listesi
+    """
+    if not isinstance(source, str):
+        for item in source:
+            yield from iter_source(item)
+        return
+
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "*.json")) + glob.glob(os.path.join(source, "*.jsonl")))
+    elif any(ch in source for ch in "*?["):
+        paths = sorted(glob.glob(source))
+    else:
+        paths = [source]
+
+    for path in paths:
+        if path.endswith(".jsonl"):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        pass
+            continue
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"⚠ Okunamadı, atlanıyor: {path} ({e})")
+            continue
+        if isinstance(data, dict):
+            data = data.get("sorular", [])
+        yield from data
+
+
+def _encode_in_worker(model_name: str, texts: List[str]) -> np.ndarray:
+    """Süreç havuzu görevi: her worker modeli bir kez yükler (ENCODERS)."""
+    return l2_normalize(get_encoder(model_name).encode(texts, convert_to_numpy=True))
+
+
+class StreamingIndexer:
+    """SimpleRAG için parçalı, checkpoint'li index oluşturucu."""
+
+    def __init__(self, rag, chunk_size: int = 256, workers: int = 0):
+        """
+        Args:
+            rag: initialize() edilmiş SimpleRAG
+            chunk_size: Parça başına encode edilen kayıt
+            workers: >0 ise parçalar bu kadar süreçte paralel encode edilir
+                (her süreç modeli ayrıca yükler)
+        """
+        self.rag = rag
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.work_dir = f"{rag.index_path}.build"
+
+    def _progress_path(self) -> str:
+        return os.path.join(self.work_dir, PROGRESS_FILE)
+
+    def _read_progress(self) -> Optional[Dict[str, Any]]:
+        path = self._progress_path()
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_progress(self, progress: Dict[str, Any]):
+        # Atomik: yarım yazılmış checkpoint kalmasın
+        tmp = self._progress_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(progress, f)
+        os.replace(tmp, self._progress_path())
+
+    def build(self, source: Union[str, Iterable[str], Iterable[Dict[str, Any]]], force: bool = False):
+        """
+        Kaynaktan index oluşturur (veya yarıda kalan oluşturmaya devam eder).
+
+        Args:
+            source: iter_source'un kabul ettiği kaynak (dosya yolu / listesi) ya da
+                hazır kayıt akışı (ör. rag_sources.iter_normalized())
+            force: Mevcut index'teki vektörleri yeniden kullanma (checkpoint'ten
+                devam etme davranışı değişmez)
+        """
+        rag = self.rag
+        if not rag.has_encoder:
+            raise RuntimeError("Önce initialize() çağırın.")
+        os.makedirs(self.work_dir, exist_ok=True)
+
+        # 1. Kaynağı tembel oku, kayıtları çalışma klasörüne yaz
+        print("📖 Kaynak okunuyor...")
+        records = iter_source(source) if isinstance(source, (str, list, tuple)) else source
+        offsets, checksum = write_records(os.path.join(self.work_dir, "metadata.jsonl"), records)
+        np.save(os.path.join(self.work_dir, "offsets.npy"), offsets)
+        records = IndexRecords(os.path.join(self.work_dir, "metadata.jsonl"), offsets)
+        count = len(records)
+        print(f"📊 {count} soru")
+
+        header = read_header(rag.index_path)
+        if (
+            not force and header
+            and header.get("dataset_checksum") == checksum
+            and header.get("model_name") == rag.model_name
+        ):
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+            rag.load_index()
+            # Vektörler güncel; eksik backend dizileri / eski kelime index'i yazılır
+            rag.repair_index()
+            print(f"✓ Index zaten güncel: {count} soru")
+            return
+
+        texts = [rag._create_embedding_text(q) for q in records]
+        fingerprints = [text_fingerprint(t) for t in texts]
+
+        # Önceki index'ten yeniden kullanılacak vektörler
+        previous = None
+        previous_rows: Dict[str, int] = {}
+        if not force and header and header.get("model_name") == rag.model_name:
+            previous = load_index(rag.index_path)
+            previous_rows = {fp: row for row, fp in enumerate(previous.fingerprints or [])}
+
+        # 2. Checkpoint: aynı veri + model + parça boyutuysa kaldığı yerden devam
+        progress = self._read_progress()
+        embeddings_path = os.path.join(self.work_dir, "embeddings.npy")
+        resume = (
+            progress is not None
+            and progress.get("dataset_checksum") == checksum
+            and progress.get("model_name") == rag.model_name
+            and progress.get("chunk_size") == self.chunk_size
+            and os.path.exists(embeddings_path)
+        )
+        if resume:
+            embeddings = np.load(embeddings_path, mmap_mode="r+")
+            done = progress["done"]
+            print(f"⏯ Checkpoint bulundu: {done}/{count} satır tamamlanmış, devam ediliyor")
+        else:
+            dim = self._probe_dim(texts, previous)
+            embeddings = np.lib.format.open_memmap(embeddings_path, mode="w+", dtype=np.float32, shape=(count, dim))
+            done = 0
+            progress = {
+                "dataset_checksum": checksum,
+                "model_name": rag.model_name,
+                "chunk_size": self.chunk_size,
+                "count": count,
+                "done": 0,
+            }
+            self._write_progress(progress)
+
+        # 3. Parçaları encode et, memmap'e yaz, checkpoint güncelle
+        starts = list(range(done, count, self.chunk_size))
+        missing_by_chunk = []
+        for start in starts:
+            end = min(start + self.chunk_size, count)
+            missing = [i for i in range(start, end) if fingerprints[i] not in previous_rows]
+            missing_by_chunk.append(missing)
+
+        def finish_chunk(start: int, missing: List[int], vectors: Optional[np.ndarray]):
+            end = min(start + self.chunk_size, count)
+            reuse = [i for i in range(start, end) if fingerprints[i] in previous_rows]
+            if reuse:
+                embeddings[reuse] = previous.embeddings[[previous_rows[fingerprints[i]] for i in reuse]]
+            if missing:
+                embeddings[missing] = vectors
+            embeddings.flush()
+            progress["done"] = end
+            self._write_progress(progress)
+            print(f"  💾 {end}/{count} ({len(missing)} encode, {len(reuse)} yeniden kullanıldı)")
+
+        if self.workers > 0:
+            # Parçalar sırayla yazılır: checkpoint her zaman ardışık bir önek gösterir.
+            # Bellek için aynı anda en fazla 2 * workers parça bekler.
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                pending = deque()
+                for start, missing in zip(starts, missing_by_chunk):
+                    future = pool.submit(_encode_in_worker, rag.model_name, [texts[i] for i in missing]) if missing else None
+                    pending.append((start, missing, future))
+                    if len(pending) >= 2 * self.workers:
+                        start, missing, future = pending.popleft()
+                        finish_chunk(start, missing, future.result() if future else None)
+                while pending:
+                    start, missing, future = pending.popleft()
+                    finish_chunk(start, missing, future.result() if future else None)
+        else:
+            for start, missing in zip(starts, missing_by_chunk):
+                vectors = None
+                if missing:
+                    vectors = l2_normalize(rag.model.encode([texts[i] for i in missing], convert_to_numpy=True))
+                finish_chunk(start, missing, vectors)
+
+        # 4. rag_store formatında yaz, çalışma klasörünü temizle
+        rag.questions = records
+        rag.embeddings = embeddings
+        rag.save_index(fingerprints)
+        rag.load_index()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        print(f"✓ Index hazır: {count} soru")
+
+    def _probe_dim(self, texts: List[str], previous) -> int:
+        """Embedding boyutu: önceki index'ten, yoksa tek bir metni encode ederek."""
+        if previous is not None:
+            return previous.embeddings.shape[1]
+        if self.workers > 0:
+            # Ana süreçte modeli yüklememek için boyut bir worker'dan alınır
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                return pool.submit(_encode_in_worker, self.rag.model_name, texts[:1] or [""]).result().shape[1]
+        return np.asarray(self.rag.model.encode(texts[:1] or [""], convert_to_numpy=True)).shape[1]
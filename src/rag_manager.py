@@ -9,14 +9,19 @@ Cosine similarity ile benzer soru bulma.
 import json
 import os
 import pickle
-from typing import List, Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
 
-try:
-    from sentence_transformers import SentenceTransformer
-    SBERT_AVAILABLE = True
-except ImportError:
-    SBERT_AVAILABLE = False
+from rag_backends import BACKENDS, compression_report, create_backend, l2_normalize, top_k_indices
+from rag_encoder import DEFAULT_MODEL_NAME, ENCODERS, sbert_available
+from rag_postings import TOKENIZER_VERSION, BM25Index, PostingLists, tokenize
+from rag_store import FacetColumn, dataset_checksum, load_index, read_header, text_fingerprint, write_index
+
+# sentence_transformers/torch burada import edilmez; model ilk encode'da ENCODERS ile yüklenir
+SBERT_AVAILABLE = sbert_available()
+if not SBERT_AVAILABLE:
     print("⚠ SentenceTransformers yüklü değil. 'pip install sentence-transformers' ile yükleyin.")
 
 
@@ -25,30 +30,239 @@ def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
 
+# Zorluk dengelemede round-robin sırası (bilinmeyen zorluk "orta" sayılır)
+DIFFICULTY_ORDER = ("kolay", "orta", "zor")
+
+
+def round_robin_order(groups: np.ndarray, k: int) -> np.ndarray:
+    """
+    Skor sırasındaki adaylardan gruplar arası round-robin seçimin ilk k pozisyonu.
+    
+    Her turda grup 0, 1, 2... sırasıyla her gruptan sıradaki aday alınır.
+    Adayın grup içi sırası (rank) ile sıralamak aynı sonucu tek seferde verir:
+    anahtar (rank, grup).
+    """
+    n = len(groups)
+    order = np.argsort(groups, kind="stable")
+    sorted_groups = groups[order]
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n) - np.searchsorted(sorted_groups, sorted_groups, side="left")
+    return np.lexsort((groups, rank))[:k]
+
+
+def mmr_order(
+    vectors: np.ndarray,
+    relevance: np.ndarray,
+    k: int,
+    mmr_lambda: float,
+    groups: Optional[np.ndarray] = None,
+    quotas: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Maximal Marginal Relevance ile k aday seçer (pozisyonlar, seçim sırasında).
+    
+    Skor: mmr_lambda * relevance - (1 - mmr_lambda) * seçilenlere en yüksek benzerlik.
+    vectors L2-normalize olduğundan benzerlik doğrudan iç çarpımdır.
+    groups/quotas verilirse her gruptan en fazla quotas[grup] aday seçilir.
+    """
+    n = len(relevance)
+    pairwise = vectors @ vectors.T
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    remaining = None if quotas is None else np.array(quotas, dtype=np.int64)
+    
+    selected: List[int] = []
+    for _ in range(min(k, n)):
+        allowed = available if remaining is None else available & (remaining[groups] > 0)
+        if not allowed.any():
+            break
+        scores = np.where(allowed, mmr_lambda * relevance - (1 - mmr_lambda) * redundancy, -np.inf)
+        i = int(np.argmax(scores))
+        selected.append(i)
+        available[i] = False
+        redundancy = np.maximum(redundancy, pairwise[i])
+        if remaining is not None:
+            remaining[groups[i]] -= 1
+    return np.array(selected, dtype=np.int64)
+
+
+class QueryEmbeddingCache:
+    """
+    Sorgu embedding'leri için sınırlı (LRU) ve thread-safe cache.
+    
+    Anahtar: (model_name, normalize edilmiş sorgu metni). Değerler
+    L2-normalize, salt-okunur vektörlerdir. Aynı süreçteki tüm RAG
+    nesneleri varsayılan olarak tek bir cache'i (QUERY_CACHE) paylaşır.
+    """
+    
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Baştaki/sondaki ve ardışık boşlukları sadeleştirir."""
+        return " ".join((query or "").split())
+    
+    def get_or_encode(self, model_name: str, model, queries: List[str]) -> np.ndarray:
+        """
+        Sorguları cache'ten döndürür; eksik olanları tek batch'te encode eder.
+        
+        model None ise encoder süreç geneli kayıttan (ENCODERS) alınır; tüm
+        sorgular cache'teyse model hiç yüklenmez.
+        """
+        keys = [(model_name, self.normalize(q)) for q in queries]
+        vectors: List[Optional[np.ndarray]] = [None] * len(keys)
+        
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._data.get(key)
+                if vec is not None:
+                    self._data.move_to_end(key)
+                    vectors[i] = vec
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        
+        missing = [i for i, vec in enumerate(vectors) if vec is None]
+        if missing:
+            # Aynı batch'te tekrar eden sorgular bir kez encode edilir
+            unique_texts = list(dict.fromkeys(keys[i][1] for i in missing))
+            encoder = model if model is not None else ENCODERS.get(model_name)
+            encoded = l2_normalize(encoder.encode(unique_texts, convert_to_numpy=True))
+            encoded.flags.writeable = False
+            by_text = dict(zip(unique_texts, encoded))
+            with self._lock:
+                for text, vec in by_text.items():
+                    self._data[(model_name, text)] = vec
+                    self._data.move_to_end((model_name, text))
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+            for i in missing:
+                vectors[i] = by_text[keys[i][1]]
+        
+        return np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Süreç genelinde paylaşılan varsayılan cache
+QUERY_CACHE = QueryEmbeddingCache()
+
+
 class SimpleRAG:
     """Basit NumPy tabanlı RAG sistemi."""
     
-    def __init__(self, model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"):
+    # Index'te kategorik kolon olarak saklanan alanlar (alan -> varsayılan)
+    # (kaynak, konu_ailesi: birleşik index'te rag_sources adaptörlerinin eklediği alanlar)
+    FACET_FIELDS = {
+        "konu_basligi": None, "alt_konu_basligi": None, "zorluk": "orta",
+        "kaynak": None, "konu_ailesi": None,
+    }
+    
+    # find_similar_strict'e özgü filtre anahtarları (find_similar_many için)
+    STRICT_FILTER_KEYS = ("topic", "subtopic", "must_have_keywords", "must_not_have")
+    
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+        backend: str = "flat",
+        backend_params: Optional[Dict[str, Any]] = None
+    ):
         """
         Args:
             model_name: Embedding modeli 
             (multilingual model kullanıyoruz çünkü BERTurk yüklemesi uzun sürebilir)
+            query_cache: Sorgu embedding cache'i (varsayılan: süreç geneli QUERY_CACHE)
+            backend: Vektör arama backend'i, "flat" (tam) veya "ivf" (yaklaşık, büyük korpus)
+            backend_params: Backend parametreleri (ör. {"nlist": 256, "nprobe": 8},
+                sıkıştırılmış depolama için {"storage": "int8", "rerank": 4})
         """
         self.model_name = model_name
-        self.model = None
-        self.embeddings = None
+        self.query_cache = query_cache or QUERY_CACHE
+        self.backend_name = backend
+        self.backend_params = backend_params or {}
+        self._backend = None
+        self._index_arrays: Dict[str, np.ndarray] = {}
+        self._model = None  # None: encoder ilk ihtiyaçta ENCODERS'tan alınır
+        self._encoder_enabled = False
+        self.embeddings = None  # L2-normalize float32 (diskten mmap ile açılır)
         self.questions = None
         self.index_path = None
+        self.header = None
+        self.facets: Dict[str, FacetColumn] = {}
+        self.fingerprints: Optional[List[str]] = None
+        self.keyword_index: Optional[PostingLists] = None  # konu + alt konu + soru kökü + metin token'ları
+        self.bm25: Optional[BM25Index] = None  # keyword_index üzerinde sparse arama
         
-    def initialize(self, cache_dir: str = "./data"):
-        """Model ve cache'i başlatır."""
-        if not SBERT_AVAILABLE:
-            raise ImportError("SentenceTransformers gerekli: pip install sentence-transformers")
+    def initialize(
+        self,
+        cache_dir: str = "./data",
+        load_model: bool = True,
+        query_vectors: Optional[str] = None,
+        index_name: str = "rag_index",
+    ):
+        """
+        Index yolunu ve encoder'ı ayarlar.
         
-        print(f"🔄 Embedding model yükleniyor: {self.model_name}...")
-        self.model = SentenceTransformer(self.model_name)
-        self.index_path = os.path.join(cache_dir, "rag_index.pkl")
-        print("✓ Model hazır.")
+        Model burada yüklenmez: ilk encode ihtiyacında süreç geneli kayıttan
+        (rag_encoder.ENCODERS) alınır ve tüm RAG nesneleriyle paylaşılır.
+        Index güncelse ve sorgular cache'teyse model hiç yüklenmez.
+        
+        Args:
+            cache_dir: Index klasörünün bulunduğu dizin
+            load_model: False ise embedding modeli kullanılmaz; mevcut index
+                sadece sparse (BM25) arama için açılabilir
+            query_vectors: No-encoder modu; precompute_query_vectors ile
+                üretilmiş .npz dosyası (sorgular torch yüklenmeden karşılanır)
+            index_name: Index klasörü adı; farklı korpuslar farklı klasör kullanmalı
+                (aynı klasörü paylaşırlarsa her açılışta birbirinin index'ini yeniden encode eder)
+        """
+        self.index_path = os.path.join(cache_dir, index_name)
+        self.legacy_index_path = os.path.join(cache_dir, "rag_index.pkl")
+        if query_vectors:
+            ENCODERS.use_precomputed(self.model_name, query_vectors)
+        elif load_model and not SBERT_AVAILABLE:
+            raise ImportError("SentenceTransformers gerekli: pip install sentence-transformers")
+        self._encoder_enabled = load_model or bool(query_vectors)
+    
+    def set_index_name(self, index_name: str):
+        """Aynı cache_dir altında başka bir index klasörüne geçer (bkz. rag_sources.source_index_name)."""
+        self.index_path = os.path.join(os.path.dirname(self.index_path), index_name)
+    
+    @property
+    def model(self):
+        """Embedding encoder'ı (ilk erişimde ENCODERS'tan yüklenir)."""
+        if self._model is None and self._encoder_enabled:
+            self._model = ENCODERS.get(self.model_name)
+        return self._model
+    
+    @model.setter
+    def model(self, value):
+        self._model = value
+    
+    @property
+    def has_encoder(self) -> bool:
+        """Encode yapılabilir mi (modeli yüklemeden kontrol eder)."""
+        return self._model is not None or self._encoder_enabled
         
     def _create_embedding_text(self, question: Dict[str, Any]) -> str:
         """Soru kaydından embedding için metin oluşturur."""
@@ -71,59 +285,190 @@ class SimpleRAG:
         
         return " ".join(parts)
     
+    @staticmethod
+    def _sparse_text(question: Dict[str, Any]) -> str:
+        """BM25/keyword index'ine giren metin: konu, alt konu, tam soru kökü ve metin."""
+        return " ".join(
+            question.get(field) or ""
+            for field in ("konu_basligi", "alt_konu_basligi", "soru_kökü", "metin")
+        )
+    
     def build_index(self, questions: List[Dict[str, Any]], force: bool = False):
-        """Soru listesinden embedding index oluşturur."""
-        if not self.model:
+        """
+        Soru listesinden embedding index oluşturur.
+        
+        Her kayıt, embedding metninin hash'i ile parmak izlenir. Mevcut index
+        varsa yalnızca yeni/değişen kayıtlar encode edilir, değişmeyenlerin
+        vektörleri yeniden kullanılır, silinen kayıtlar index'ten düşer.
+        """
+        if not self.has_encoder:
             raise RuntimeError("Önce initialize() çağırın.")
         
+        texts = [self._create_embedding_text(q) for q in questions]
+        fingerprints = [text_fingerprint(t) for t in texts]
+        
         # Cache kontrolü
-        if not force and os.path.exists(self.index_path):
+        previous_rows: Dict[str, int] = {}
+        if not force and (read_header(self.index_path) or os.path.exists(self.legacy_index_path)):
             print("📂 Mevcut index yükleniyor...")
             self.load_index()
-            if len(self.questions) == len(questions):
+            if self.header.get("model_name") != self.model_name:
+                print("⚠ Embedding modeli değişmiş, tamamen yeniden indexleniyor...")
+            elif self.header.get("dataset_checksum") == dataset_checksum(questions):
+                self.repair_index()
                 print(f"✓ Index hazır: {len(self.questions)} soru")
                 return
-            print("⚠ Soru sayısı değişmiş, yeniden indexleniyor...")
-        
-        print(f"🔄 {len(questions)} soru indexleniyor...")
+            elif self.fingerprints is not None:
+                previous_rows = {fp: row for row, fp in enumerate(self.fingerprints)}
+        
+        reuse = [(i, previous_rows[fp]) for i, fp in enumerate(fingerprints) if fp in previous_rows]
+        missing = [i for i, fp in enumerate(fingerprints) if fp not in previous_rows]
+        print(f"🔄 {len(questions)} soru indexleniyor ({len(reuse)} vektör yeniden kullanılıyor, {len(missing)} encode edilecek)...")
+        
+        # Sadece yeni/değişen kayıtlar encode edilir
+        new_vectors = None
+        if missing:
+            new_vectors = l2_normalize(self.model.encode([texts[i] for i in missing], show_progress_bar=True, convert_to_numpy=True))
+        dim = new_vectors.shape[1] if new_vectors is not None else self.embeddings.shape[1]
+        
+        embeddings = np.empty((len(questions), dim), dtype=np.float32)
+        if reuse:
+            new_rows, old_rows = map(list, zip(*reuse))
+            embeddings[new_rows] = self.embeddings[old_rows]
+        if missing:
+            embeddings[missing] = new_vectors
         
         self.questions = questions
-        texts = [self._create_embedding_text(q) for q in questions]
+        self.embeddings = embeddings
         
-        # Batch halinde embedding oluştur
-        self.embeddings = self.model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
-        
-        # Kaydet
-        self.save_index()
+        # Kaydet (ve mmap ile yeniden aç)
+        self.save_index(fingerprints)
+        self.load_index()
         print(f"✓ Index hazır: {len(self.questions)} soru")
     
-    def save_index(self):
-        """Index'i diske kaydeder."""
+    def repair_index(self) -> bool:
+        """
+        Yüklü index'in veriden türetilen kısımlarını tamamlar (encode gerekmez).
+        
+        Seçilen backend'in dizileri eksikse veya kelime index'i eski tokenize()
+        ile yazılmışsa index yeniden kaydedilip yüklenir; böylece her açılışta
+        bellekte yeniden kurulmaz.
+        
+        Returns:
+            Index yeniden yazıldıysa True
+        """
+        backend_cls = BACKENDS[self.backend_name]
+        if backend_cls.from_arrays(self.embeddings, self._index_arrays, **self.backend_params) is None:
+            print(f"🔄 '{self.backend_name}' backend verisi index'e ekleniyor...")
+        elif self.header.get("tokenizer_version") != TOKENIZER_VERSION:
+            print("🔄 Kelime index'i yeniden kuruluyor...")
+        else:
+            return False
+        self.save_index(self.fingerprints)
+        self.load_index()
+        return True
+    
+    def save_index(self, fingerprints: Optional[List[str]] = None):
+        """Index'i diske kaydeder (rag_store formatı)."""
         if self.embeddings is None or self.questions is None:
             return
         
-        data = {
-            "embeddings": self.embeddings,
-            "questions": self.questions,
-            "model_name": self.model_name
-        }
-        
-        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-        with open(self.index_path, 'wb') as f:
-            pickle.dump(data, f)
+        if fingerprints is None:
+            fingerprints = [text_fingerprint(self._create_embedding_text(q)) for q in self.questions]
+        facets = {field: [q.get(field, default) for q in self.questions] for field, default in self.FACET_FIELDS.items()}
+        # Tek geçiş: aynı token index'i hem keyword filtrelerine hem BM25'e hizmet eder
+        bm25 = BM25Index.build([tokenize(self._sparse_text(q)) for q in self.questions])
+        # Kayıtta backend güncel embedding'lerden eğitilir; create_backend'in uyarısı yükleme yolu içindir
+        backend = BACKENDS[self.backend_name].build(self.embeddings, **self.backend_params)
+        report = compression_report(self.embeddings, backend)
+        if report:
+            print(f"🗜 {report['storage']} depolama: {report['ratio']:.1f}x küçük, "
+                  f"top-{report['k']} uyumu {report['agreement_at_k']:.3f}")
+        arrays = backend.to_arrays()
+        write_index(
+            self.index_path, self.embeddings, self.questions,
+            model_name=self.model_name, facets=facets, fingerprints=fingerprints,
+            postings={"keywords": bm25.postings}, arrays=arrays,
+        )
         print(f"💾 Index kaydedildi: {self.index_path}")
     
     def load_index(self):
-        """Index'i diskten yükler."""
-        if not os.path.exists(self.index_path):
-            raise FileNotFoundError(f"Index bulunamadı: {self.index_path}")
+        """Index'i diskten yükler (embeddings ve metadata mmap ile, tembel)."""
+        if read_header(self.index_path) is None and os.path.exists(self.legacy_index_path):
+            self._migrate_legacy_index()
+        
+        loaded = load_index(self.index_path)
+        self.header = loaded.header
+        self.embeddings = loaded.embeddings
+        self.questions = loaded.records
+        self.facets = loaded.facets
+        self.fingerprints = loaded.fingerprints
+        self.keyword_index = loaded.postings.get("keywords")
+        if self.keyword_index is not None and self.header.get("tokenizer_version") != TOKENIZER_VERSION:
+            # Eski tokenize() ile yazılmış: bellekte yeniden kurulur (kalıcı hali build_index yazar)
+            self.keyword_index = BM25Index.build([tokenize(self._sparse_text(q)) for q in self.questions]).postings
+        self.bm25 = BM25Index(self.keyword_index, len(self.questions)) if self.keyword_index else None
+        self._index_arrays = loaded.arrays or {}
+        self._backend = None  # ilk aramada kurulur
+        print(f"📂 Index yüklendi: {len(self.questions)} soru")
+    
+    @property
+    def backend(self):
+        """Vektör arama backend'i (ilk erişimde index dizilerinden kurulur)."""
+        if self._backend is None:
+            self._backend = create_backend(
+                self.backend_name, self.embeddings, self._index_arrays, **self.backend_params
+            )
+        return self._backend
+    
+    def _candidate_scores(self, q: np.ndarray, depth: int, filter_topic: Optional[str]) -> np.ndarray:
+        """
+        Tüm satırlar için similarity vektörü (_select_similar girdisi).
         
-        with open(self.index_path, 'rb') as f:
+        Flat/float32 backend'de tam çarpım. Diğerlerinde konu filtresi varsa
+        konunun satırları (posting listesi) tam skorlanır, yoksa backend'in
+        ilk ``depth`` adayı skorlanır; kalan satırlar -1 olur ve seçilmez.
+        """
+        if self.backend.is_exact:
+            return self.embeddings @ q
+        
+        similarities = np.full(len(self.embeddings), -1.0, dtype=np.float32)
+        if filter_topic:
+            rows = self.facets["konu_basligi"].rows(filter_topic)
+            similarities[rows] = self.embeddings[rows] @ q
+        else:
+            rows, row_scores = self.backend.search(q, depth)
+            similarities[rows] = row_scores
+        return similarities
+    
+    def _encode_query(self, query: str) -> np.ndarray:
+        """Sorguyu L2-normalize vektöre çevirir (LRU cache üzerinden)."""
+        return self.query_cache.get_or_encode(self.model_name, self._model, [query])[0]
+    
+    def _migrate_legacy_index(self):
+        """Eski pickle index'i (rag_index.pkl) yeni formata bir kez çevirir."""
+        print(f"🔄 Eski pickle index yeni formata çevriliyor: {self.legacy_index_path}")
+        with open(self.legacy_index_path, 'rb') as f:
             data = pickle.load(f)
         
-        self.embeddings = data["embeddings"]
+        self.embeddings = l2_normalize(data["embeddings"])
         self.questions = data["questions"]
-        print(f"📂 Index yüklendi: {len(self.questions)} soru")
+        self.model_name = data.get("model_name", self.model_name)
+        self.save_index()
+    
+    def _format_result(self, idx: int, similarity: float) -> Dict[str, Any]:
+        """Index satırını sonuç sözlüğüne çevirir."""
+        q = self.questions[idx]
+        return {
+            "soru_id": q.get("soru_id", ""),
+            "similarity": float(similarity),
+            "konu_basligi": q.get("konu_basligi", ""),
+            "alt_konu_basligi": q.get("alt_konu_basligi", ""),
+            "zorluk": q.get("zorluk", "orta"),
+            "soru_kökü": q.get("soru_kökü", ""),
+            "metin": q.get("metin", "")[:200] + "..." if len(q.get("metin", "")) > 200 else q.get("metin", ""),
+            "question": q  # Tam soru objesi
+        }
     
     def find_similar(
         self, 
@@ -131,7 +476,8 @@ class SimpleRAG:
         k: int = 3, 
         filter_topic: Optional[str] = None,
         topic_weight: float = 3.0,
-        balance_difficulty: bool = True
+        balance_difficulty: bool = True,
+        mmr_lambda: Optional[float] = None
     ) -> List[Dict[str, Any]]:
         """
         Sorguya en benzer k soruyu bulur (Metadata-Aware).
@@ -142,76 +488,62 @@ class SimpleRAG:
             filter_topic: Sadece bu konudaki soruları ara
             topic_weight: Konu eşleşmesine verilecek ek ağırlık (varsayılan: 3.0)
             balance_difficulty: Farklı zorluk seviyelerinden dengeli seçim yap
+            mmr_lambda: Verilirse adaylar MMR ile çeşitlendirilir (1.0 = sadece
+                benzerlik, düştükçe birbirine benzeyen sorular elenir; ör. 0.7).
+                balance_difficulty ile birlikte zorluk dağılımı korunur.
         """
-        if self.embeddings is None or not self.model:
+        if self.embeddings is None or not self.has_encoder:
             raise RuntimeError("Önce initialize() ve build_index() çağırın.")
         
-        # Query embedding
-        query_embedding = self.model.encode([query], convert_to_numpy=True)[0]
+        # Query embedding + similarity (flat: tek matris-vektör çarpımı)
+        similarities = self._candidate_scores(self._encode_query(query), k * 3, filter_topic)
+        return self._select_similar(similarities, k, filter_topic, topic_weight, balance_difficulty, mmr_lambda)
+    
+    def _difficulty_groups(self, rows: np.ndarray) -> np.ndarray:
+        """Satırların DIFFICULTY_ORDER içindeki grup no'su."""
+        column = self.facets["zorluk"]
+        orta = DIFFICULTY_ORDER.index("orta")
+        lookup = np.array([DIFFICULTY_ORDER.index(v) if v in DIFFICULTY_ORDER else orta for v in column.values])
+        return lookup[column.codes[rows]]
+    
+    def _select_similar(
+        self,
+        similarities: np.ndarray,
+        k: int,
+        filter_topic: Optional[str],
+        topic_weight: float,
+        balance_difficulty: bool,
+        mmr_lambda: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """find_similar seçim aşaması: ham cosine skorlarından sonuç listesi."""
+        raw = similarities
         
-        # Tüm sorularla similarity hesapla
-        similarities = []
-        for i, emb in enumerate(self.embeddings):
-            # Temel cosine similarity
-            base_sim = cosine_similarity(query_embedding, emb)
-            
-            # Konu filtresi
-            if filter_topic and self.questions[i].get("konu_basligi") != filter_topic:
-                similarities.append(-1)  # Filtrelenen sorular için düşük skor
-                continue
-            
-            # Metadata-Aware Scoring: Konu eşleşmesi varsa bonus ver
-            final_sim = base_sim
-            if filter_topic:
-                question_topic = self.questions[i].get("konu_basligi", "")
-                if question_topic == filter_topic:
-                    # Konu eşleşmesi için ağırlık ekle
-                    final_sim = base_sim * topic_weight
-            
-            similarities.append(final_sim)
+        # Konu filtresi + Metadata-Aware Scoring (eşleşene ağırlık, diğerlerine -1)
+        if filter_topic:
+            topic_mask = self.facets["konu_basligi"].mask(filter_topic)
+            similarities = np.where(topic_mask, similarities * topic_weight, -1.0)
         
         # Top-k bul
-        top_indices = np.argsort(similarities)[-k*3:][::-1]  # 3x al, sonra dengele
-        
-        # Zorluk dengeleme
-        if balance_difficulty and len(top_indices) >= k:
-            difficulty_groups = {'kolay': [], 'orta': [], 'zor': []}
-            for idx in top_indices:
-                if similarities[idx] > 0:
-                    diff = self.questions[idx].get('zorluk', 'orta')
-                    difficulty_groups.get(diff, difficulty_groups['orta']).append(idx)
-            
-            # Her gruptan dengeli seç
-            balanced_indices = []
-            for _ in range(k):
-                for diff in ['kolay', 'orta', 'zor']:
-                    if difficulty_groups[diff]:
-                        balanced_indices.append(difficulty_groups[diff].pop(0))
-                        if len(balanced_indices) >= k:
-                            break
-                if len(balanced_indices) >= k:
-                    break
-            
-            top_indices = balanced_indices[:k]
+        top_indices = top_k_indices(similarities, k * 3)  # 3x al, sonra dengele / çeşitlendir
+        pool = top_indices[similarities[top_indices] > 0]
+        
+        balanced = balance_difficulty and len(top_indices) >= k
+        if balanced or mmr_lambda is not None:
+            groups = self._difficulty_groups(pool)
+            quotas = None
+            if balanced:
+                # Zorluk dengeleme: kolay/orta/zor round-robin
+                chosen = round_robin_order(groups, k)
+                quotas = np.bincount(groups[chosen], minlength=len(DIFFICULTY_ORDER))
+            if mmr_lambda is not None:
+                # Round-robin'in zorluk dağılımı kota olarak korunur
+                chosen = mmr_order(self.embeddings[pool], raw[pool], k, mmr_lambda, groups, quotas)
+            top_indices = pool[chosen]
         else:
             top_indices = top_indices[:k]
         
-        results = []
-        for idx in top_indices:
-            if similarities[idx] > 0:  # Filtrelenmemiş olanlar
-                q = self.questions[idx]
-                results.append({
-                    "soru_id": q.get("soru_id", ""),
-                    "similarity": float(similarities[idx]),
-                    "konu_basligi": q.get("konu_basligi", ""),
-                    "alt_konu_basligi": q.get("alt_konu_basligi", ""),
-                    "zorluk": q.get("zorluk", "orta"),
-                    "soru_kökü": q.get("soru_kökü", ""),
-                    "metin": q.get("metin", "")[:200] + "..." if len(q.get("metin", "")) > 200 else q.get("metin", ""),
-                    "question": q  # Tam soru objesi
-                })
-        
-        return results
+        # Filtrelenmemiş olanlar
+        return [self._format_result(idx, similarities[idx]) for idx in top_indices if similarities[idx] > 0]
     
     def find_similar_strict(
         self,
@@ -220,7 +552,8 @@ class SimpleRAG:
         topic: str = None,
         subtopic: str = None,
         must_have_keywords: List[str] = None,
-        must_not_have: List[str] = None
+        must_not_have: List[str] = None,
+        mmr_lambda: Optional[float] = None
     ) -> List[Dict]:
         """
         Sıkı metadata ve keyword filtresi ile benzer sorular bulur.
@@ -232,75 +565,243 @@ class SimpleRAG:
             subtopic: Alt konu filtresi (zorunlu eşleşme)
             must_have_keywords: Soru kökünde OLMASI gereken kelimeler (en az biri)
             must_not_have: Soru kökünde ve metinde OLMAMASI gereken kelimeler
+            mmr_lambda: Verilirse ilk 3k aday MMR ile çeşitlendirilir (ör. 0.7)
             
         Returns:
-            Filtrelenmiş soru listesi (similarity azalan sırada)
+            Filtrelenmiş soru listesi (similarity azalan sırada; MMR'de seçim sırasında)
         """
-        if self.embeddings is None or not self.model:
+        if self.embeddings is None or not self.has_encoder:
             raise RuntimeError("Önce initialize() ve build_index() çağırın.")
         
-        # Query embedding
-        query_embedding = self.model.encode([query], convert_to_numpy=True)[0]
+        rows = self._strict_rows(topic, subtopic, must_have_keywords, must_not_have)
         
-        # Filtre uygula
-        filtered_questions = []
-        filtered_embeddings = []
-        
-        for i, q in enumerate(self.questions):
-            # 1. Konu filtresi (zorunlu)
-            if topic and q.get("konu_basligi") != topic:
-                continue
-            
-            # 2. Alt konu filtresi (zorunlu)
-            if subtopic and q.get("alt_konu_basligi") != subtopic:
-                continue
-            
-            # 3. Must have keywords (soru kökünde en az biri olmalı)
-            if must_have_keywords:
-                soru_koku = q.get("soru_kökü", "").lower()
-                if not any(kw.lower() in soru_koku for kw in must_have_keywords):
-                    continue
-            
-            # 4. Must not have keywords (soru kökü VE metinde olmamalı)
-            if must_not_have:
-                soru_koku = q.get("soru_kökü", "").lower()
-                metin = q.get("metin", "").lower()
-                combined_text = soru_koku + " " + metin
-                
-                if any(kw.lower() in combined_text for kw in must_not_have):
-                    continue
-            
-            # Filtreyi geçti
-            filtered_questions.append(q)
-            filtered_embeddings.append(self.embeddings[i])
+        # Sadece filtreyi geçen satırlar skorlanır (vektörel gather)
+        row_scores = self.embeddings[rows] @ self._encode_query(query) if len(rows) else np.empty(0)
+        return self._select_strict(rows, row_scores, k, topic, subtopic, mmr_lambda)
+    
+    def _keyword_candidates(self, keyword: str, rows: np.ndarray) -> np.ndarray:
+        """rows içinde keyword'ü içerebilecek satırlar (inverted index ile daraltılmış)."""
+        candidates = self.keyword_index.substring_candidates(keyword) if self.keyword_index else None
+        if candidates is None:
+            return rows
+        return np.intersect1d(rows, candidates, assume_unique=True)
+    
+    def _strict_rows(
+        self,
+        topic: Optional[str],
+        subtopic: Optional[str],
+        must_have_keywords: Optional[List[str]],
+        must_not_have: Optional[List[str]]
+    ) -> np.ndarray:
+        """
+        find_similar_strict filtrelerini geçen satır id'leri (artan sırada).
         
+        Konu/alt konu posting listeleri kesiştirilir; kelime filtreleri için
+        inverted index aday satırları verir ve yalnızca adaylar (tam alt dizi
+        kontrolüyle) doğrulanır.
+        """
+        # 1-2. Konu / alt konu filtresi (zorunlu)
+        rows = None
+        if topic:
+            rows = self.facets["konu_basligi"].rows(topic)
+        if subtopic:
+            sub_rows = self.facets["alt_konu_basligi"].rows(subtopic)
+            rows = sub_rows if rows is None else np.intersect1d(rows, sub_rows, assume_unique=True)
+        if rows is None:
+            rows = np.arange(len(self.questions), dtype=np.int32)
+        
+        # 3. Must have keywords (soru kökünde en az biri olmalı)
+        if must_have_keywords and len(rows):
+            keywords = [kw.lower() for kw in must_have_keywords]
+            candidates = np.unique(np.concatenate([self._keyword_candidates(kw, rows) for kw in keywords]))
+            keep = [
+                i for i in candidates
+                if any(kw in self.questions[i].get("soru_kökü", "").lower() for kw in keywords)
+            ]
+            rows = np.asarray(keep, dtype=np.int32)
+        
+        # 4. Must not have keywords (soru kökü VE metinde olmamalı)
+        if must_not_have and len(rows):
+            excluded = set()
+            for kw in (kw.lower() for kw in must_not_have):
+                for i in self._keyword_candidates(kw, rows):
+                    if i in excluded:
+                        continue
+                    q = self.questions[i]
+                    if kw in q.get("soru_kökü", "").lower() + " " + q.get("metin", "").lower():
+                        excluded.add(i)
+            if excluded:
+                rows = np.setdiff1d(rows, np.fromiter(excluded, dtype=np.int32), assume_unique=True)
+        
+        return rows
+    
+    def _select_strict(
+        self,
+        rows: np.ndarray,
+        row_scores: np.ndarray,
+        k: int,
+        topic: Optional[str],
+        subtopic: Optional[str],
+        mmr_lambda: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """find_similar_strict seçim aşaması: filtrelenmiş satırlar arasında top-k."""
         # Filtrelenmiş sorular yoksa boş dön
-        if not filtered_questions:
+        if len(rows) == 0:
             print(f"⚠️ Filtreler sonrası hiç soru bulunamadı (topic={topic}, subtopic={subtopic})")
             return []
         
-        # Similarity hesapla
-        similarities = []
-        for emb in filtered_embeddings:
-            sim = cosine_similarity(query_embedding, emb)
-            similarities.append(sim)
+        if mmr_lambda is None:
+            top = top_k_indices(row_scores, k)
+        else:
+            pool = top_k_indices(row_scores, k * 3)
+            top = pool[mmr_order(self.embeddings[rows[pool]], row_scores[pool], k, mmr_lambda)]
+        return [self._format_result(rows[i], row_scores[i]) for i in top]
+    
+    def search_sparse(
+        self,
+        query: str,
+        k: int = 3,
+        filter_topic: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 ile kelime bazlı arama (embedding modeli gerekmez).
+        
+        "numaralanmış cümlelerin hangisinde" gibi kalıp soru köklerini,
+        dense modelin yakalayamadığı tam kelime eşleşmeleriyle bulur.
+        Sonuçlarda "similarity" BM25 skorudur.
+        """
+        if self.bm25 is None:
+            raise RuntimeError("Önce initialize() ve build_index()/load_index() çağırın.")
         
-        # Top-k bul
-        top_indices = np.argsort(similarities)[-k:][::-1]
+        ranking = self._sparse_ranking(self.bm25.scores(query), filter_topic, k)
+        return [self._format_result(row, score) for row, score in ranking]
+    
+    def _sparse_ranking(self, scores: np.ndarray, filter_topic: Optional[str], depth: int) -> List[Tuple[int, float]]:
+        """BM25 skoru > 0 olan satırlardan en iyi ``depth`` tanesi (satır, skor)."""
+        if filter_topic:
+            rows = self.facets["konu_basligi"].rows(filter_topic)
+            rows = rows[scores[rows] > 0]
+        else:
+            rows = np.flatnonzero(scores > 0)
+        order = top_k_indices(scores[rows], depth)
+        return [(int(rows[i]), float(scores[rows[i]])) for i in order]
+    
+    def find_similar_hybrid(
+        self,
+        query: str,
+        k: int = 3,
+        filter_topic: Optional[str] = None,
+        rrf_k: int = 60,
+        depth: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """
+        Dense (embedding) ve sparse (BM25) sıralamalarını Reciprocal Rank Fusion ile birleştirir.
+        
+        Her sıralamadan ilk ``depth`` aday alınır; adayın skoru
+        sum(1 / (rrf_k + sıra)) olur. Encoder yoksa (initialize(load_model=False))
+        sadece BM25 kullanılır.
+        
+        Args:
+            query: Arama sorgusu
+            k: Döndürülecek sonuç sayısı
+            filter_topic: Sadece bu konudaki soruları ara
+            rrf_k: RRF sabiti (büyüdükçe alt sıralar daha fazla ağırlık alır)
+            depth: Her sıralamadan füzyona giren aday sayısı
+        """
+        if self.bm25 is None:
+            raise RuntimeError("Önce initialize() ve build_index()/load_index() çağırın.")
         
+        rankings = {"bm25": self._sparse_ranking(self.bm25.scores(query), filter_topic, depth)}
+        if self.has_encoder:
+            q = self._encode_query(query)
+            if filter_topic:
+                rows = self.facets["konu_basligi"].rows(filter_topic)
+                row_scores = self.embeddings[rows] @ q
+                order = top_k_indices(row_scores, depth)
+                rows, row_scores = rows[order], row_scores[order]
+            else:
+                rows, row_scores = self.backend.search(q, depth)
+            rankings["dense"] = [(int(row), float(score)) for row, score in zip(rows, row_scores)]
+        
+        fused: Dict[int, float] = {}
+        raw_scores: Dict[int, Dict[str, float]] = {}
+        for name, ranking in rankings.items():
+            for rank, (row, score) in enumerate(ranking, start=1):
+                fused[row] = fused.get(row, 0.0) + 1.0 / (rrf_k + rank)
+                raw_scores.setdefault(row, {})[name] = score
+        
+        # Eşit füzyon skorunda satır sırası (deterministik)
+        best = sorted(fused.items(), key=lambda item: (-item[1], item[0]))[:k]
         results = []
-        for idx in top_indices:
-            q = filtered_questions[idx]
-            results.append({
-                "soru_id": q.get("soru_id", ""),
-                "similarity": float(similarities[idx]),
-                "konu_basligi": q.get("konu_basligi", ""),
-                "alt_konu_basligi": q.get("alt_konu_basligi", ""),
-                "zorluk": q.get("zorluk", "orta"),
-                "soru_kökü": q.get("soru_kökü", ""),
-                "metin": q.get("metin", "")[:200] + "..." if len(q.get("metin", "")) > 200 else q.get("metin", ""),
-                "question": q
-            })
+        for row, score in best:
+            result = self._format_result(row, score)
+            result["bm25_score"] = raw_scores[row].get("bm25", 0.0)
+            if "dense" in rankings:
+                result["dense_score"] = raw_scores[row].get("dense")
+            results.append(result)
+        return results
+    
+    def find_similar_many(
+        self,
+        queries: List[str],
+        k: int = 3,
+        filters: Optional[Any] = None,
+        chunk_size: int = 256
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Çok sayıda sorgu için toplu arama (bulk üretim işleri için).
+        
+        Tüm sorgular tek batch'te encode edilir ve index'e karşı matris-matris
+        çarpımıyla skorlanır; seçim aşaması find_similar / find_similar_strict
+        ile birebir aynıdır.
+        
+        Args:
+            queries: Arama sorguları
+            k: Sorgu başına sonuç sayısı
+            filters: Tek bir sözlük (tüm sorgulara uygulanır) veya sorgu başına
+                sözlük listesi. Anahtarlar find_similar parametreleridir
+                (filter_topic, topic_weight, balance_difficulty, mmr_lambda); topic, subtopic,
+                must_have_keywords veya must_not_have içeren sözlükler
+                find_similar_strict semantiğiyle değerlendirilir.
+            chunk_size: Tek seferde skorlanan sorgu sayısı (bellek sınırı)
+        
+        Returns:
+            Her sorgu için sonuç listesi (queries ile aynı sırada)
+        """
+        if self.embeddings is None or not self.has_encoder:
+            raise RuntimeError("Önce initialize() ve build_index() çağırın.")
+        
+        if filters is None or isinstance(filters, dict):
+            filters = [filters or {}] * len(queries)
+        if len(filters) != len(queries):
+            raise ValueError("filters listesi queries ile aynı uzunlukta olmalı")
+        
+        query_embeddings = self.query_cache.get_or_encode(self.model_name, self._model, queries)
+        
+        # Flat/float32 backend'de her parça tek matris-matris çarpımıyla skorlanır
+        flat = self.backend.is_exact
+        results: List[List[Dict[str, Any]]] = []
+        for start in range(0, len(queries), chunk_size):
+            block = query_embeddings[start:start + chunk_size]
+            scores = block @ self.embeddings.T if flat else None
+            for j, opts in enumerate(filters[start:start + chunk_size]):
+                opts = opts or {}
+                if any(key in opts for key in self.STRICT_FILTER_KEYS):
+                    rows = self._strict_rows(
+                        opts.get("topic"), opts.get("subtopic"),
+                        opts.get("must_have_keywords"), opts.get("must_not_have"),
+                    )
+                    row_scores = scores[j][rows] if flat else self.embeddings[rows] @ block[j]
+                    results.append(self._select_strict(
+                        rows, row_scores, k, opts.get("topic"), opts.get("subtopic"), opts.get("mmr_lambda"),
+                    ))
+                else:
+                    similarities = scores[j] if flat else self._candidate_scores(block[j], k * 3, opts.get("filter_topic"))
+                    results.append(self._select_similar(
+                        similarities, k,
+                        opts.get("filter_topic"), opts.get("topic_weight", 3.0),
+                        opts.get("balance_difficulty", True), opts.get("mmr_lambda"),
+                    ))
         
         return results
 
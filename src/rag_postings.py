@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+RAG Posting Listeleri (Inverted Index)
+======================================
+Anahtar -> satır id dizisi eşlemesi, CSR düzeninde saklanır:
+
+    keys     : anahtar listesi (JSON)
+    offsets  : int64, len(keys) + 1
+    rows     : int32, her anahtarın satırları artan sırada ardışık
+    weights  : (opsiyonel) float32, satır başına ağırlık (ör. BM25 katkısı)
+
+Metadata filtreleri (konu, alt konu, zorluk) ve soru kökü/metin üzerindeki
+kelime filtreleri tüm korpusu gezmek yerine bu listelerin kesişimiyle
+çalışır; maliyet eşleşme sayısıyla orantılıdır. Aynı kelime index'i BM25
+sparse aramasına da hizmet eder (BM25Index).
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from question_templates import TR_MAP
+
+TOKEN_RE = re.compile(r"\w+")
+COMBINING_DOT = "\u0307"
+# tokenize() çıktısı değişince artırılır; eski sürümle yazılmış kelime index'leri yeniden kurulur
+TOKENIZER_VERSION = 2
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Türkçe karakterleri katlayıp (TR_MAP) küçük harfe çevirir ve kelimelere ayırır.
+
+    Katlama lower()'dan önce yapılır (normalize_key gibi): "İ".lower() "i" +
+    U+0307 (birleşik nokta) verir ve TOKEN_RE kelimeyi o noktada böler. Önceden
+    küçültülmüş girdilerde kalan U+0307 silinir.
+
+    Katlama karakter bazlı olduğundan ``a.lower()`` ``b.lower()`` içinde
+    geçiyorsa katlanmış halleri de birbirini içerir; substring_candidates
+    bu sayede kesin eşleşmeleri kaçırmaz.
+    """
+    return TOKEN_RE.findall((text or "").translate(TR_MAP).lower().replace(COMBINING_DOT, ""))
+
+
+class PostingLists:
+    """CSR düzeninde anahtar -> satır listesi."""
+
+    def __init__(
+        self,
+        keys: Sequence[Optional[str]],
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        weights: Optional[np.ndarray] = None,
+    ):
+        self.keys = list(keys)
+        self.offsets = offsets
+        self.rows = rows
+        self.weights = weights
+        self._lookup = {key: i for i, key in enumerate(self.keys)}
+        self._substring_cache: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_codes(cls, keys: Sequence[Optional[str]], codes: np.ndarray) -> "PostingLists":
+        """Kategorik kod kolonundan (FacetColumn) posting listeleri."""
+        rows = np.argsort(codes, kind="stable").astype(np.int32)
+        counts = np.bincount(codes, minlength=len(keys))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(keys, offsets, rows)
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Iterable[str]]) -> "PostingLists":
+        """Satır başına token listesinden inverted index (weights = terim frekansı)."""
+        vocab: Dict[str, int] = {}
+        token_codes: List[int] = []
+        token_rows: List[int] = []
+        token_counts: List[int] = []
+        for row, tokens in enumerate(docs):
+            for token, count in Counter(tokens).items():
+                token_codes.append(vocab.setdefault(token, len(vocab)))
+                token_rows.append(row)
+                token_counts.append(count)
+
+        codes = np.asarray(token_codes, dtype=np.int64)
+        # Stabil sıralama: satırlar her anahtar içinde artan kalır
+        order = np.argsort(codes, kind="stable")
+        rows = np.asarray(token_rows, dtype=np.int32)[order]
+        weights = np.asarray(token_counts, dtype=np.float32)[order]
+        counts = np.bincount(codes, minlength=len(vocab))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(list(vocab), offsets, rows, weights)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def index_of(self, key: Optional[str]) -> Optional[int]:
+        return self._lookup.get(key)
+
+    def get(self, key: Optional[str]) -> np.ndarray:
+        """Anahtarın satırları (artan sırada); yoksa boş dizi."""
+        i = self._lookup.get(key)
+        if i is None:
+            return np.empty(0, dtype=np.int32)
+        return self.rows[self.offsets[i]:self.offsets[i + 1]]
+
+    def get_weights(self, key: Optional[str]) -> np.ndarray:
+        i = self._lookup.get(key)
+        if i is None or self.weights is None:
+            return np.empty(0, dtype=np.float32)
+        return self.weights[self.offsets[i]:self.offsets[i + 1]]
+
+    def union(self, keys: Iterable[Optional[str]]) -> np.ndarray:
+        parts = [self.get(key) for key in keys]
+        if not parts:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(parts))
+
+    def substring_candidates(self, phrase: str) -> Optional[np.ndarray]:
+        """
+        ``phrase.lower()`` ifadesini alt dizi olarak içerebilecek satırların üst kümesi.
+
+        İfade metinde geçiyorsa, ifadenin her kelimesi metindeki bir kelimenin
+        alt dizisidir; bu yüzden sonuç kesin eşleşmeleri kaçırmaz, sadece
+        doğrulanması gereken adayları verir. Kelime içermeyen ifadeler için
+        None döner (tam tarama gerekir).
+        """
+        tokens = set(tokenize(phrase))
+        if not tokens:
+            return None
+
+        result = None
+        for token in tokens:
+            rows = self._substring_cache.get(token)
+            if rows is None:
+                rows = self.union(key for key in self.keys if token in key)
+                self._substring_cache[token] = rows
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def save(self, index_dir: str, name: str):
+        with open(os.path.join(index_dir, f"postings_{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(self.keys, f, ensure_ascii=False)
+        np.save(os.path.join(index_dir, f"postings_{name}_offsets.npy"), self.offsets)
+        np.save(os.path.join(index_dir, f"postings_{name}_rows.npy"), self.rows)
+        if self.weights is not None:
+            np.save(os.path.join(index_dir, f"postings_{name}_weights.npy"), self.weights)
+
+    @classmethod
+    def load(cls, index_dir: str, name: str, mmap_mode: Optional[str] = "r") -> "PostingLists":
+        with open(os.path.join(index_dir, f"postings_{name}.json"), "r", encoding="utf-8") as f:
+            keys = json.load(f)
+        offsets = np.load(os.path.join(index_dir, f"postings_{name}_offsets.npy"), mmap_mode=mmap_mode)
+        rows = np.load(os.path.join(index_dir, f"postings_{name}_rows.npy"), mmap_mode=mmap_mode)
+        weights = None
+        weights_path = os.path.join(index_dir, f"postings_{name}_weights.npy")
+        if os.path.exists(weights_path):
+            weights = np.load(weights_path, mmap_mode=mmap_mode)
+        return cls(keys, offsets, rows, weights)
+
+
+class BM25Index:
+    """
+    PostingLists üzerinde Okapi BM25.
+
+    Belge uzunluğu normalizasyonu build sırasında posting ağırlıklarına
+    gömülür (``weights`` = terim katkısı); sorgu anında sadece sorgu
+    kelimelerinin posting'leri toplanır, encoder gerekmez.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, postings: PostingLists, n_docs: int):
+        self.postings = postings
+        self.n_docs = n_docs
+        df = np.diff(np.asarray(postings.offsets))
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    @classmethod
+    def build(cls, docs: Sequence[List[str]]) -> "BM25Index":
+        """Token listelerinden index; weights terim frekansından BM25 katkısına çevrilir."""
+        postings = PostingLists.from_documents(docs)
+        doc_lengths = np.array([len(d) for d in docs], dtype=np.float32)
+        avgdl = float(doc_lengths.mean()) if len(doc_lengths) and doc_lengths.mean() > 0 else 1.0
+
+        tf = postings.weights
+        norm = cls.K1 * (1 - cls.B + cls.B * doc_lengths[postings.rows] / avgdl)
+        postings.weights = (tf * (cls.K1 + 1) / (tf + norm)).astype(np.float32)
+        return cls(postings, len(docs))
+
+    def scores(self, query: str) -> np.ndarray:
+        """Tüm belgeler için BM25 skoru (eşleşmeyenler 0)."""
+        rows, contributions = [], []
+        for token in set(tokenize(query)):
+            i = self.postings.index_of(token)
+            if i is None:
+                continue
+            rows.append(self.postings.get(token))
+            contributions.append(self.postings.get_weights(token) * self.idf[i])
+        if not rows:
+            return np.zeros(self.n_docs, dtype=np.float32)
+        return np.bincount(
+            np.concatenate(rows), weights=np.concatenate(contributions), minlength=self.n_docs
+        ).astype(np.float32)
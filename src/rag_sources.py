@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+RAG Soru Kaynakları - Şema Adaptörleri
+======================================
+Projedeki soru kaynakları farklı şemalar kullanır:
+
+    odsgm       ODSGM_Yapısal_Veri/*.json            soru_kökü, şık_a, doğru_cevap ...
+    engine      lgs_engine normalized_merged_v2.jsonl stem, choices{A..D}, answer ...
+    guncel      guncel_yapilandirilmiş_veri_seti*.json (ODSGM şeması)
+    last_clean  last_clean_data_merged                soru, sik_a, dogru_cevap ...
+    v13         v13_final/*.jsonl                     {"user": "Konu: ...", "assistant": "<JSON>"}
+
+Her adaptör kaydı bir kez SimpleRAG'in kanonik şemasına çevirir
+(konu_basligi, alt_konu_basligi, soru_kökü, metin, şık_a..d, doğru_cevap,
+soru_id, kaynak, konu_ailesi ...). iter_normalized tüm kaynakları tekrar
+eden soruları eleyerek tek akışta verir; StreamingIndexer bu akıştan tek
+bir index oluşturur (kaynak ve konu_ailesi index'te kategorik kolondur).
+"""
+
+import glob
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from rag_indexer import StreamingIndexer, iter_source
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOPIC_MAPPING_PATH = os.path.join(PROJECT_ROOT, "data", "topic_mapping.json")
+# Tüm adaptörlerin birleşik korpusunun index klasörü (cache_dir altında)
+UNIFIED_INDEX_NAME = "rag_index"
+
+# Kanonik şemada tutulan alanlar (kaynakta varsa)
+CANONICAL_FIELDS = (
+    "soru_id", "kaynak", "yıl", "konu_basligi", "alt_konu_basligi", "konu_ailesi",
+    "zorluk", "soru_tipi", "metin", "soru_kökü",
+    "şık_a", "şık_b", "şık_c", "şık_d", "doğru_cevap",
+)
+CHOICE_KEYS = ("a", "b", "c", "d")
+
+
+@lru_cache(maxsize=1)
+def load_topic_mapping() -> Dict[str, str]:
+    """Ham konu -> kanonik konu ailesi (data/topic_mapping.json)."""
+    if not os.path.exists(TOPIC_MAPPING_PATH):
+        return {}
+    with open(TOPIC_MAPPING_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def content_key(record: Dict[str, Any]) -> str:
+    """Kaynaktan bağımsız tekrar tespiti için soru içeriğinin hash'i."""
+    parts = [record.get("metin") or "", record.get("soru_kökü") or ""]
+    parts += [record.get(f"şık_{c}") or "" for c in CHOICE_KEYS]
+    text = "\x1f".join(" ".join(p.lower().split()) for p in parts)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _finalize(record: Dict[str, Any], kaynak: str) -> Optional[Dict[str, Any]]:
+    """Ortak son adım: boş soruları ele, kaynak/konu ailesi/id ekle, alanları sırala."""
+    if not record.get("soru_kökü"):
+        return None
+    record["kaynak"] = kaynak
+    konu = record.get("konu_basligi")
+    if konu:
+        record["konu_ailesi"] = load_topic_mapping().get(konu, konu)
+    if not record.get("soru_id"):
+        record["soru_id"] = f"{kaynak}-{content_key(record)[:12]}"
+    if record.get("doğru_cevap"):
+        record["doğru_cevap"] = str(record["doğru_cevap"]).strip().upper()
+    return {field: record[field] for field in CANONICAL_FIELDS if record.get(field) not in (None, "")}
+
+
+def normalize_odsgm(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """ODSGM / güncel veri seti: alanlar zaten kanonik."""
+    return {field: raw.get(field) for field in CANONICAL_FIELDS}
+
+
+def normalize_engine(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """lgs_engine normalized_merged_v2 kaydı."""
+    choices = raw.get("choices") or {}
+    record = {
+        "soru_id": raw.get("id"),
+        "yıl": raw.get("year"),
+        "konu_basligi": raw.get("topic"),
+        "alt_konu_basligi": raw.get("subtopic"),
+        "soru_tipi": raw.get("question_type"),
+        "metin": raw.get("text"),
+        "soru_kökü": raw.get("stem"),
+        "doğru_cevap": raw.get("answer"),
+    }
+    for c in CHOICE_KEYS:
+        record[f"şık_{c}"] = choices.get(c.upper())
+    return record
+
+
+def normalize_flat(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """ASCII anahtarlı düz kayıt (konu, alt_konu, soru, sik_a, dogru_cevap)."""
+    record = {
+        "konu_basligi": raw.get("konu"),
+        "alt_konu_basligi": raw.get("alt_konu"),
+        "zorluk": raw.get("zorluk"),
+        "metin": raw.get("metin"),
+        "soru_kökü": raw.get("soru"),
+        "doğru_cevap": raw.get("dogru_cevap"),
+    }
+    for c in CHOICE_KEYS:
+        record[f"şık_{c}"] = raw.get(f"sik_{c}")
+    return record
+
+
+def normalize_chat(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Fine-tune sohbet kaydı: konu bilgisi user satırlarında, soru assistant JSON'unda."""
+    try:
+        data = json.loads(raw.get("assistant") or "{}")
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    for line in (raw.get("user") or "").split("\n"):
+        key, _, value = line.partition(":")
+        field = {"Konu": "konu", "Alt Konu": "alt_konu", "Zorluk": "zorluk"}.get(key.strip())
+        if field and value.strip():
+            data.setdefault(field, value.strip())
+    return normalize_flat(data)
+
+
+def detect_normalizer(raw: Dict[str, Any]) -> Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+    """Kaydın anahtarlarından şemayı tahmin eder (elle verilen dosyalar için)."""
+    if "assistant" in raw:
+        return normalize_chat
+    if "stem" in raw:
+        return normalize_engine
+    if "soru_kökü" in raw:
+        return normalize_odsgm
+    if "soru" in raw:
+        return normalize_flat
+    return None
+
+
+@dataclass(frozen=True)
+class SourceAdapter:
+    """Bir soru kaynağı: proje köküne göre dosya desenleri + şema dönüştürücü."""
+
+    name: str
+    patterns: Tuple[str, ...]
+    normalize: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+    def paths(self, root: str = PROJECT_ROOT) -> List[str]:
+        found: List[str] = []
+        for pattern in self.patterns:
+            found.extend(p for p in sorted(glob.glob(os.path.join(root, pattern))) if p not in found)
+        return found
+
+    def iter_records(self, root: str = PROJECT_ROOT) -> Iterator[Dict[str, Any]]:
+        """Kaynağın kayıtlarını kanonik şemada tembel okur."""
+        for raw in iter_source(self.paths(root)):
+            if not isinstance(raw, dict):
+                continue
+            record = self.normalize(raw)
+            record = _finalize(record, self.name) if record else None
+            if record:
+                yield record
+
+
+# Öncelik sırası: aynı soru birden fazla kaynakta varsa ilk kaynaktaki kayıt tutulur
+ADAPTERS: Dict[str, SourceAdapter] = {
+    adapter.name: adapter
+    for adapter in (
+        SourceAdapter("odsgm", ("ODSGM_Yapısal_Veri/*.json",), normalize_odsgm),
+        SourceAdapter(
+            "engine",
+            ("data/lgs_soru_engine_v3/lgs_soru_engine_v1/data/processed/normalized_merged_v2.jsonl",),
+            normalize_engine,
+        ),
+        SourceAdapter("guncel", ("data/guncel_yapilandirilmiş_veri_seti*.json",), normalize_odsgm),
+        SourceAdapter("last_clean", ("data/last_clean_data_merged/merged_questions.json",), normalize_flat),
+        SourceAdapter("v13", ("data/v13_final/*.jsonl",), normalize_chat),
+    )
+}
+
+
+def iter_files(paths: Iterable[str], kaynak: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Elle verilen dosya/klasör/glob'ları şemayı kayıt bazında tahmin ederek normalize eder.
+
+    Args:
+        kaynak: "kaynak" kolonuna yazılacak ad (varsayılan: dosya adı bilinmediğinden "ek")
+    """
+    for raw in iter_source(list(paths)):
+        if not isinstance(raw, dict):
+            continue
+        normalize = detect_normalizer(raw)
+        record = normalize(raw) if normalize else None
+        record = _finalize(record, kaynak or "ek") if record else None
+        if record:
+            yield record
+
+
+def iter_normalized(
+    names: Optional[Sequence[str]] = None,
+    root: str = PROJECT_ROOT,
+    extra_paths: Optional[Sequence[str]] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Seçilen kaynakların kanonik kayıtlarını tek akışta verir (tekrarlar elenir).
+
+    Args:
+        names: ADAPTERS anahtarları (None: hepsi, öncelik sırasıyla; boş liste: hiçbiri)
+        root: Proje kökü
+        extra_paths: Ayrıca eklenecek dosyalar (şema otomatik tahmin edilir)
+        stats: Verilirse kaynak başına eklenen kayıt sayısı ve "tekrar" sayacı doldurulur
+    """
+    names = list(ADAPTERS) if names is None else list(names)
+    unknown = set(names) - set(ADAPTERS)
+    if unknown:
+        raise ValueError(f"Bilinmeyen kaynak: {sorted(unknown)} (seçenekler: {list(ADAPTERS)})")
+
+    streams = [(name, ADAPTERS[name].iter_records(root)) for name in names]
+    if extra_paths:
+        streams.append(("ek", iter_files(extra_paths)))
+
+    stats = stats if stats is not None else {}
+    seen = set()
+    for name, records in streams:
+        for record in records:
+            key = content_key(record)
+            if key in seen:
+                stats["tekrar"] = stats.get("tekrar", 0) + 1
+                continue
+            seen.add(key)
+            stats[name] = stats.get(name, 0) + 1
+            yield record
+
+
+def source_index_name(names: Optional[Sequence[str]] = None, extra_paths: Optional[Sequence[str]] = None) -> str:
+    """
+    Korpusa özgü index klasörü adı.
+
+    Varsayılan korpus (tüm adaptörler, ek dosya yok) UNIFIED_INDEX_NAME'i
+    kullanır; başka kaynak seçimi veya ek dosyalar kendi klasörüne yazılır.
+    Böylece farklı korpuslar birbirinin index'ini yeniden encode etmez.
+    """
+    names = list(ADAPTERS) if names is None else list(names)
+    if names == list(ADAPTERS) and not extra_paths:
+        return UNIFIED_INDEX_NAME
+    spec = json.dumps([names, sorted(os.path.abspath(p) for p in extra_paths or [])], ensure_ascii=False)
+    return f"{UNIFIED_INDEX_NAME}_{hashlib.sha1(spec.encode('utf-8')).hexdigest()[:10]}"
+
+
+def build_source_index(
+    rag,
+    names: Optional[Sequence[str]] = None,
+    extra_paths: Optional[Sequence[str]] = None,
+    chunk_size: int = 256,
+    workers: int = 0,
+    force: bool = False,
+    stats: Optional[Dict[str, int]] = None,
+):
+    """
+    Seçilen kaynakların index'ini oluşturur / günceller ve yükler (tüm giriş noktalarının ortak yolu).
+
+    Args:
+        rag: initialize() edilmiş SimpleRAG; index klasörü source_index_name ile seçilir
+        names, extra_paths, stats: iter_normalized ile aynı
+        chunk_size, workers, force: StreamingIndexer ile aynı
+    """
+    rag.set_index_name(source_index_name(names, extra_paths))
+    records = iter_normalized(names, extra_paths=extra_paths, stats=stats)
+    StreamingIndexer(rag, chunk_size=chunk_size, workers=workers).build(records, force=force)
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+RAG Index Deposu - Pickle'sız, Memory-Mapped Format
+===================================================
+Index bir klasör olarak saklanır; rag_index, en son yazılan sürüm
+klasörüne (rag_index.v<zaman>-<pid>/) işaret eden bir symlink'tir:
+
+    rag_index -> rag_index.v<zaman>-<pid>/
+    ├── header.json       # format sürümü, model adı, boyut, dataset checksum
+    ├── embeddings.npy    # L2-normalize float32 matris (mmap ile açılır)
+    ├── metadata.jsonl    # her satır bir soru kaydı
+    ├── offsets.npy       # metadata.jsonl satır başlangıçları (byte)
+    ├── fingerprints.npy  # satır başına embedding metni hash'i (artımlı rebuild)
+    ├── facet_<alan>.npy  # kategorik metadata kolonları (int32 kod)
+    ├── postings_<ad>*    # inverted index'ler (bkz. rag_postings)
+    └── array_<ad>.npy    # arama backend'i dizileri (bkz. rag_backends)
+
+Aynı makinedeki tüm worker'lar embeddings/metadata sayfalarını OS cache
+üzerinden paylaşır; açılış süresi korpus boyutuyla büyümez. Yeni sürüm
+symlink'in tek os.replace ile değiştirilmesiyle yayımlanır: okuyucular her
+an ya eski ya yeni sürümün tamamını görür, araya boşluk girmez.
+"""
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rag_postings import TOKENIZER_VERSION, PostingLists
+
+INDEX_FORMAT_VERSION = 3
+
+HEADER_FILE = "header.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.jsonl"
+OFFSETS_FILE = "offsets.npy"
+FINGERPRINTS_FILE = "fingerprints.npy"
+
+# Tutulan tamamlanmış sürüm sayısı: güncel + bir önceki (symlink'i eski
+# sürüme çözümlemiş ama dosyaları henüz açmamış okuyucular için)
+KEEP_VERSIONS = 2
+
+
+def _facet_file(field: str) -> str:
+    return f"facet_{field}.npy"
+
+
+def _array_file(name: str) -> str:
+    return f"array_{name}.npy"
+
+
+def _dump_record(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, sort_keys=True) + "\n").encode("utf-8")
+
+
+def dataset_checksum(records: Sequence[Dict[str, Any]]) -> str:
+    """Kayıt listesinin içerik checksum'ı (header'daki ile aynı hesap)."""
+    h = hashlib.sha256()
+    for rec in records:
+        h.update(_dump_record(rec))
+    return h.hexdigest()
+
+
+def write_records(path: str, records: Iterable[Dict[str, Any]]) -> Tuple[np.ndarray, str]:
+    """
+    Kayıtları JSONL olarak yazar (kayıtlar tek tek tüketilir, generator olabilir).
+
+    Returns:
+        (satır başlangıç offset'leri, dataset checksum)
+    """
+    checksum = hashlib.sha256()
+    offsets = [0]
+    with open(path, "wb") as f:
+        for rec in records:
+            line = _dump_record(rec)
+            checksum.update(line)
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    return np.array(offsets, dtype=np.int64), checksum.hexdigest()
+
+
+def text_fingerprint(text: str) -> str:
+    """Embedding metninin kısa içerik hash'i."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@dataclass
+class FacetColumn:
+    """Kategorik bir metadata alanı: benzersiz değerler + satır başına kod."""
+
+    values: List[Optional[str]]
+    codes: np.ndarray
+    postings: Optional[PostingLists] = None
+
+    @classmethod
+    def from_values(cls, raw: Sequence[Optional[str]]) -> "FacetColumn":
+        lookup: Dict[Optional[str], int] = {}
+        codes = np.empty(len(raw), dtype=np.int32)
+        for i, v in enumerate(raw):
+            codes[i] = lookup.setdefault(v, len(lookup))
+        return cls(values=list(lookup), codes=codes)
+
+    def code_of(self, value: Optional[str]) -> int:
+        try:
+            return self.values.index(value)
+        except ValueError:
+            return -1
+
+    def mask(self, value: Optional[str]) -> np.ndarray:
+        """Değeri ``value`` olan satırlar için boolean maske."""
+        return self.codes == self.code_of(value)
+
+    def rows(self, value: Optional[str]) -> np.ndarray:
+        """Değeri ``value`` olan satır id'leri (artan sırada)."""
+        if self.postings is not None:
+            return self.postings.get(value)
+        return np.flatnonzero(self.mask(value)).astype(np.int32)
+
+    def value_at(self, idx: int) -> Optional[str]:
+        return self.values[self.codes[idx]]
+
+
+class IndexRecords(Sequence):
+    """
+    metadata.jsonl üzerinde tembel (lazy) kayıt listesi.
+
+    Dosya mmap ile açılır; bir kayıt yalnızca erişildiğinde parse edilir.
+    """
+
+    def __init__(self, metadata_path: str, offsets: np.ndarray):
+        self.metadata_path = metadata_path
+        self.offsets = offsets
+        self._file = open(metadata_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        n = len(self)
+        if idx < 0:
+            idx += n
+        if not 0 <= idx < n:
+            raise IndexError(idx)
+        start, end = int(self.offsets[idx]), int(self.offsets[idx + 1])
+        return json.loads(self._buf[start:end])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+@dataclass
+class LoadedIndex:
+    header: Dict[str, Any]
+    embeddings: np.ndarray
+    records: IndexRecords
+    facets: Dict[str, FacetColumn]
+    fingerprints: Optional[List[str]] = None
+    postings: Optional[Dict[str, PostingLists]] = None
+    arrays: Optional[Dict[str, np.ndarray]] = None
+
+
+def read_header(index_dir: str) -> Optional[Dict[str, Any]]:
+    """header.json'u okur; index yoksa veya format uyumsuzsa None döner."""
+    while True:
+        version_dir = os.path.realpath(index_dir)
+        try:
+            with open(os.path.join(version_dir, HEADER_FILE), "r", encoding="utf-8") as f:
+                header = json.load(f)
+            break
+        except FileNotFoundError:
+            # Okurken eski sürüm silindiyse symlink yeni sürümü gösterir: tekrar dene
+            if os.path.realpath(index_dir) == version_dir:
+                return None
+    if header.get("format_version") != INDEX_FORMAT_VERSION:
+        print(f"⚠ Index format sürümü uyumsuz: {header.get('format_version')} (beklenen {INDEX_FORMAT_VERSION})")
+        return None
+    return header
+
+
+def write_index(
+    index_dir: str,
+    embeddings: np.ndarray,
+    records: Sequence[Dict[str, Any]],
+    *,
+    model_name: str,
+    facets: Optional[Dict[str, Sequence[Optional[str]]]] = None,
+    fingerprints: Optional[Sequence[str]] = None,
+    postings: Optional[Dict[str, PostingLists]] = None,
+    arrays: Optional[Dict[str, np.ndarray]] = None,
+) -> Dict[str, Any]:
+    """
+    Index'i yeni bir sürüm klasörüne yazar, ardından index_dir symlink'ini ona çevirir.
+
+    Aynı anda yazan süreçler ayrı sürüm klasörleri kullanır; en yeni sürüm
+    kazanır (daha eskisi yayımlanmadan atılır). Eski index'i mmap ile açmış süreçler, dosyaları silinse bile
+    kendi kopyalarıyla çalışmaya devam eder.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if embeddings.ndim != 2 or embeddings.shape[0] != len(records):
+        raise ValueError(f"Embedding/kayıt sayısı uyuşmuyor: {embeddings.shape} vs {len(records)}")
+
+    parent = os.path.dirname(os.path.abspath(index_dir))
+    os.makedirs(parent, exist_ok=True)
+    version_dir = f"{index_dir}.v{time.time_ns()}-{os.getpid()}"
+    os.makedirs(version_dir)
+
+    np.save(os.path.join(version_dir, EMBEDDINGS_FILE), embeddings)
+
+    offsets, checksum = write_records(os.path.join(version_dir, METADATA_FILE), records)
+    np.save(os.path.join(version_dir, OFFSETS_FILE), offsets)
+
+    if fingerprints is not None:
+        np.save(os.path.join(version_dir, FINGERPRINTS_FILE), np.array(fingerprints, dtype="S32"))
+
+    facet_values: Dict[str, List[Optional[str]]] = {}
+    for field, raw in (facets or {}).items():
+        column = FacetColumn.from_values(raw)
+        np.save(os.path.join(version_dir, _facet_file(field)), column.codes)
+        PostingLists.from_codes(column.values, column.codes).save(version_dir, f"facet_{field}")
+        facet_values[field] = column.values
+
+    for name, lists in (postings or {}).items():
+        lists.save(version_dir, name)
+
+    for name, array in (arrays or {}).items():
+        np.save(os.path.join(version_dir, _array_file(name)), array)
+
+    header = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "model_name": model_name,
+        "dim": int(embeddings.shape[1]),
+        "count": len(records),
+        "dtype": "float32",
+        "normalized": True,
+        "dataset_checksum": checksum,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "facets": facet_values,
+        "postings": sorted(postings or {}),
+        "tokenizer_version": TOKENIZER_VERSION,
+        "arrays": sorted(arrays or {}),
+    }
+    with open(os.path.join(version_dir, HEADER_FILE), "w", encoding="utf-8") as f:
+        json.dump(header, f, ensure_ascii=False, indent=2)
+
+    _publish(index_dir, version_dir)
+    return header
+
+
+def _publish(index_dir: str, version_dir: str) -> None:
+    """index_dir symlink'ini tek os.replace ile version_dir'e çevirir, eski sürümleri siler."""
+    # Yayımlama + temizlik yazıcılar arasında kilitli: biri diğerinin az önce
+    # yayımladığı sürümü eski sanıp silemez (okuyucular kilit almaz)
+    with open(f"{index_dir}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _swap_and_prune(index_dir, version_dir)
+
+
+def _swap_and_prune(index_dir: str, version_dir: str) -> None:
+    name = os.path.basename(version_dir)
+    current = os.path.realpath(index_dir) if os.path.islink(index_dir) else None
+    if not os.path.isdir(version_dir) or (current is not None and os.path.basename(current) > name):
+        # Bu arada daha yeni bir sürüm yayımlanmış (en yeni kazanır): bu sürüm atılır
+        shutil.rmtree(version_dir, ignore_errors=True)
+        return
+
+    link_tmp = f"{version_dir}.link"
+    os.symlink(name, link_tmp)
+    old_dir = f"{index_dir}.old-{os.getpid()}"
+    if os.path.isdir(index_dir) and not os.path.islink(index_dir):
+        # Sürümsüz düzende yazılmış gerçek klasör: bir kereliğine kenara alınır
+        os.rename(index_dir, old_dir)
+    os.replace(link_tmp, index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    # Yayımlanandan eski, tamamlanmış (header'lı) sürümlerden en yeni
+    # KEEP_VERSIONS - 1 tanesi kalır; header'sız klasörler yazılmakta olabilir
+    parent = os.path.dirname(os.path.abspath(version_dir))
+    prefix = os.path.basename(index_dir) + ".v"
+    older = sorted(
+        entry for entry in os.listdir(parent)
+        if entry.startswith(prefix) and entry < name
+        and os.path.isdir(os.path.join(parent, entry)) and not os.path.islink(os.path.join(parent, entry))
+        and os.path.exists(os.path.join(parent, entry, HEADER_FILE))
+    )
+    for entry in older[:len(older) - (KEEP_VERSIONS - 1)]:
+        shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+
+
+def load_index(index_dir: str, mmap_mode: Optional[str] = "r") -> LoadedIndex:
+    """Index klasörünü açar (varsayılan: embeddings read-only mmap)."""
+    # Symlink bir kez çözümlenir, tüm dosyalar aynı sürümden açılır; sürüm
+    # açılırken silindiyse (yeni sürüm yayımlanmış) yenisiyle tekrar denenir
+    while True:
+        version_dir = os.path.realpath(index_dir)
+        try:
+            return _load_version(version_dir, mmap_mode)
+        except FileNotFoundError:
+            if os.path.realpath(index_dir) == version_dir:
+                raise
+
+
+def _load_version(index_dir: str, mmap_mode: Optional[str]) -> LoadedIndex:
+    header = read_header(index_dir)
+    if header is None:
+        raise FileNotFoundError(f"Index bulunamadı: {index_dir}")
+
+    embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode=mmap_mode)
+    offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode=mmap_mode)
+    records = IndexRecords(os.path.join(index_dir, METADATA_FILE), offsets)
+
+    facets = {}
+    for field, values in header.get("facets", {}).items():
+        codes = np.load(os.path.join(index_dir, _facet_file(field)), mmap_mode=mmap_mode)
+        facet_postings = PostingLists.load(index_dir, f"facet_{field}", mmap_mode=mmap_mode)
+        facets[field] = FacetColumn(values=values, codes=codes, postings=facet_postings)
+
+    postings = {name: PostingLists.load(index_dir, name, mmap_mode=mmap_mode) for name in header.get("postings", [])}
+
+    arrays = {
+        name: np.load(os.path.join(index_dir, _array_file(name)), mmap_mode=mmap_mode)
+        for name in header.get("arrays", [])
+    }
+
+    fingerprints = None
+    fp_path = os.path.join(index_dir, FINGERPRINTS_FILE)
+    if os.path.exists(fp_path):
+        fingerprints = [fp.decode("ascii") for fp in np.load(fp_path)]
+
+    return LoadedIndex(
+        header=header, embeddings=embeddings, records=records,
+        facets=facets, fingerprints=fingerprints, postings=postings, arrays=arrays,
+    )
@@ -2,126 +2,105 @@
 """
 RAG Sistemi V2 - SADELEŞTİRİLMİŞ
 ================================
-- 1818 eğitim sorusu ile index
+- Tüm soru kaynaklarının birleşik index'i (rag_sources + SimpleRAG)
 - Şablon sistemi bypass
 - Doğrudan basit prompt
 """
 
-import json
 import os
-import pickle
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence
 import numpy as np
 
-try:
-    from sentence_transformers import SentenceTransformer
-    SBERT_AVAILABLE = True
-except ImportError:
-    SBERT_AVAILABLE = False
-    print("⚠ SentenceTransformers yüklü değil.")
-
+from rag_encoder import DEFAULT_MODEL_NAME, sbert_available
+from rag_manager import SimpleRAG, top_k_indices
+from rag_sources import PROJECT_ROOT, build_source_index
 
-def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
-    """İki vektör arasındaki cosine similarity."""
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-9)
+SBERT_AVAILABLE = sbert_available()
+if not SBERT_AVAILABLE:
+    print("⚠ SentenceTransformers yüklü değil.")
 
 
 class SimpleRAGv2:
-    """Sadeleştirilmiş RAG sistemi - V8 eğitim verisiyle uyumlu."""
+    """
+    Sadeleştirilmiş RAG sistemi - V8 eğitim verisiyle uyumlu.
     
-    def __init__(self):
-        self.model = None
-        self.embeddings = None
-        self.questions = None
-        self.index_path = None
-        
-    def initialize(self, cache_dir: str = "./data"):
-        """Model başlat."""
-        if not SBERT_AVAILABLE:
+    Ayrı bir index tutmaz: tüm soru kaynaklarından (rag_sources) oluşturulan
+    birleşik SimpleRAG index'i üzerinde (konu, alt konu, zorluk) sorgusu yapar.
+    """
+    
+    MODEL_NAME = DEFAULT_MODEL_NAME
+    
+    def __init__(self, backend: str = "flat", backend_params: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            backend: Vektör arama backend'i, "flat" (tam) veya "ivf" (yaklaşık)
+            backend_params: Backend parametreleri (ör. {"nlist": 256, "nprobe": 8},
+                sıkıştırılmış depolama için {"storage": "int8", "rerank": 4})
+        """
+        self.rag = SimpleRAG(model_name=self.MODEL_NAME, backend=backend, backend_params=backend_params)
+        
+    def initialize(self, cache_dir: str = "./data", query_vectors: Optional[str] = None):
+        """
+        Index yolunu ayarlar; model ilk encode'da ENCODERS'tan yüklenir.
+        
+        Args:
+            query_vectors: No-encoder modu için önceden hesaplanmış sorgu vektörleri (.npz)
+        """
+        if not query_vectors and not SBERT_AVAILABLE:
             raise ImportError("SentenceTransformers gerekli")
-        
-        print("🔄 Embedding model yükleniyor...")
-        self.model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
-        self.index_path = os.path.join(cache_dir, "rag_index_v2.pkl")
-        print("✓ Model hazır.")
-        
-    def _create_embedding_text(self, question: Dict[str, Any]) -> str:
-        """Soru kaydından embedding için metin oluşturur."""
-        # V8 formatından bilgi çıkar
-        user = question.get("user", "")
-        
-        parts = []
-        for line in user.split("\n"):
-            if line.startswith("Konu:"):
-                parts.append(line)
-            elif line.startswith("Alt Konu:"):
-                parts.append(line)
-            elif line.startswith("Zorluk:"):
-                parts.append(line)
-        
-        # Assistant'tan soru kökü
-        try:
-            assistant = question.get("assistant", "{}")
-            data = json.loads(assistant)
-            soru = data.get("soru", "")
-            if soru:
-                parts.append(f"Soru: {soru[:150]}")
-        except:
-            pass
-        
-        return " ".join(parts)
+        self.rag.initialize(cache_dir=cache_dir, query_vectors=query_vectors)
+    
+    @property
+    def has_encoder(self) -> bool:
+        return self.rag.has_encoder
     
-    def build_index(self, data_path: str, force: bool = False):
-        """JSONL dosyasından index oluşturur."""
-        if not self.model:
+    def build_index(
+        self,
+        data_path: Optional[str] = None,
+        force: bool = False,
+        sources: Optional[Sequence[str]] = None,
+        chunk_size: int = 256,
+    ):
+        """
+        Birleşik index'i oluşturur / günceller ve yükler.
+        
+        Kaynaklar değişmediyse mevcut index olduğu gibi açılır; değiştiyse
+        yalnızca yeni kayıtlar encode edilir (StreamingIndexer). Varsayılan
+        korpus rebuild_rag_index ile aynı data/rag_index'i kullanır; ek dosya
+        veya kaynak seçimi verilirse korpusun kendi klasörü kullanılır.
+        
+        Args:
+            data_path: Ek JSONL dosyası (ör. V8 eğitim verisi; şema otomatik tahmin edilir)
+            force: Mevcut vektörleri yeniden kullanmadan baştan encode et
+            sources: rag_sources.ADAPTERS anahtarları (varsayılan: hepsi)
+        """
+        if not self.has_encoder:
             raise RuntimeError("Önce initialize() çağırın.")
         
-        # Cache kontrolü
-        if not force and os.path.exists(self.index_path):
-            print("📂 Mevcut index yükleniyor...")
-            self.load_index()
-            return
-        
-        # Veriyi yükle
-        print(f"📂 Veri yükleniyor: {data_path}")
-        questions = []
-        with open(data_path, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    questions.append(json.loads(line.strip()))
-                except:
-                    pass
-        
-        print(f"✅ {len(questions)} soru yüklendi")
-        
-        # Embedding oluştur
-        print("🔄 Embeddingler oluşturuluyor...")
-        self.questions = questions
-        texts = [self._create_embedding_text(q) for q in questions]
-        self.embeddings = self.model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
-        
-        # Kaydet
-        self.save_index()
-        print(f"✅ Index hazır: {len(self.questions)} soru")
-    
-    def save_index(self):
-        """Index'i diske kaydeder."""
-        data = {
-            "embeddings": self.embeddings,
-            "questions": self.questions,
-        }
-        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-        with open(self.index_path, 'wb') as f:
-            pickle.dump(data, f)
-        print(f"💾 Index kaydedildi: {self.index_path}")
+        extra = [data_path] if data_path and os.path.exists(data_path) else None
+        build_source_index(self.rag, sources, extra, chunk_size=chunk_size, force=force)
     
     def load_index(self):
-        """Index'i diskten yükler."""
-        with open(self.index_path, 'rb') as f:
-            data = pickle.load(f)
-        self.embeddings = data["embeddings"]
-        self.questions = data["questions"]
-        print(f"✅ Index yüklendi: {len(self.questions)} soru")
+        """Mevcut birleşik index'i diskten yükler."""
+        self.rag.load_index()
+    
+    @staticmethod
+    def _build_query(konu: str, alt_konu: str, zorluk: str) -> str:
+        return f"Konu: {konu} Alt Konu: {alt_konu} Zorluk: {zorluk}"
+    
+    def warm_query_cache(self, konular: Dict[str, List[str]], zorluklar=("kolay", "orta", "zor")):
+        """Her (konu, alt_konu, zorluk) sorgusunu önceden encode eder."""
+        if not self.has_encoder:
+            raise RuntimeError("Önce initialize() çağırın.")
+        
+        queries = [
+            self._build_query(konu, alt_konu, zorluk)
+            for konu, alt_konular in konular.items()
+            for alt_konu in alt_konular
+            for zorluk in zorluklar
+        ]
+        self.rag.query_cache.get_or_encode(self.MODEL_NAME, self.rag._model, queries)
+        print(f"🔥 Query cache ısıtıldı: {len(queries)} sorgu")
     
     def find_similar(
         self, 
@@ -131,42 +110,40 @@ class SimpleRAGv2:
         k: int = 2
     ) -> List[Dict[str, Any]]:
         """Benzer soruları bulur."""
-        if self.embeddings is None or not self.model:
+        rag = self.rag
+        if rag.embeddings is None or not rag.has_encoder:
             return []
         
         # Query oluştur
-        query = f"Konu: {konu} Alt Konu: {alt_konu} Zorluk: {zorluk}"
-        query_embedding = self.model.encode([query], convert_to_numpy=True)[0]
-        
-        # Similarity hesapla
-        similarities = []
-        for i, emb in enumerate(self.embeddings):
-            sim = cosine_similarity(query_embedding, emb)
-            
-            # Alt konu eşleşmesi bonus
-            user = self.questions[i].get("user", "")
-            if f"Alt Konu: {alt_konu}" in user:
-                sim *= 1.5  # %50 bonus
-            
-            similarities.append((i, sim))
+        query_embedding = rag._encode_query(self._build_query(konu, alt_konu, zorluk))
+        
+        # Alt konu eşleşmesi bonus (%50) - alt konu kolonunun benzersiz değerleri üzerinden
+        subtopics = rag.facets["alt_konu_basligi"]
+        bonus_values = [v for v in subtopics.values if v and v.startswith(alt_konu)]
+        bonus_rows = np.unique(np.concatenate(
+            [subtopics.rows(v) for v in bonus_values] or [np.empty(0, dtype=np.int32)]
+        ))
+        
+        if rag.backend.is_exact:
+            # Similarity hesapla (tek matris-vektör çarpımı)
+            rows = np.arange(len(rag.embeddings))
+            similarities = rag.embeddings @ query_embedding
+        else:
+            # Yaklaşık adaylar + bonus alan satırların tamamı, tam skorlanır
+            rows = np.union1d(rag.backend.search(query_embedding, k)[0], bonus_rows)
+            similarities = rag.embeddings[rows] @ query_embedding
+        bonus = np.isin(rows, bonus_rows)
+        similarities = np.where(bonus, similarities * 1.5, similarities)
         
         # Top-k
-        similarities.sort(key=lambda x: -x[1])
-        
         results = []
-        for idx, sim in similarities[:k]:
-            q = self.questions[idx]
-            try:
-                assistant = q.get("assistant", "{}")
-                data = json.loads(assistant)
-                soru = data.get("soru", "")
-                if soru and "numaralanmış" not in soru.lower():
-                    results.append({
-                        "soru": soru,
-                        "similarity": float(sim)
-                    })
-            except:
-                pass
+        for i in top_k_indices(similarities, k):
+            soru = rag.questions[rows[i]].get("soru_kökü", "")
+            if soru and "numaralanmış" not in soru.lower():
+                results.append({
+                    "soru": soru,
+                    "similarity": float(similarities[i])
+                })
         
         return results
     
@@ -196,11 +173,17 @@ def get_rag() -> SimpleRAGv2:
     return _rag_instance
 
 
-def initialize_rag(data_path: str, force: bool = False):
-    """RAG'ı başlatır."""
+def initialize_rag(data_path: Optional[str] = None, force: bool = False, query_vectors: Optional[str] = None):
+    """
+    RAG'ı başlatır (query_vectors: no-encoder modu için .npz).
+    
+    Index birleşik index'tir (data/rag_index, rebuild_rag_index ile aynı);
+    data_path verilir ve mevcutsa ek kaynak olarak eklenir (o korpus kendi
+    index klasörüne yazılır, bkz. rag_sources.source_index_name).
+    """
     rag = get_rag()
-    cache_dir = os.path.dirname(data_path)
-    rag.initialize(cache_dir=cache_dir)
+    cache_dir = os.path.dirname(data_path) if data_path else os.path.join(PROJECT_ROOT, "data")
+    rag.initialize(cache_dir=cache_dir, query_vectors=query_vectors)
     rag.build_index(data_path, force=force)
     return rag
 
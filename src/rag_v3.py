@@ -6,167 +6,651 @@ Katman 1: RAG Docs (stratejik "nasıl" bilgisi)
 Katman 2: Question Type Rules (kesin "ne" kuralları)
 """
 
+import json
+import threading
 import yaml
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Dict, Optional
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
 
-class RAGSystemV3:
-    """İki katmanlı RAG sistemi."""
+from config_store import ConfigStore, freeze, get_store
+from prompt_budget import (
+    CompactPrompt, DocSection, TokenCounter, best_targeted_section, rank_sections, select_sections, split_sections, stems,
+)
+from prompt_layout import PromptParts
+
+# Kural anahtarı katlama tablosu: Türkçe karakter -> ASCII, boşluk/tire/eğik çizgi -> "_"
+# (str.translate tek geçiş; lower()'dan önce uygulanır, "İ"/"I" de doğru katlanır)
+RULE_KEY_MAP = str.maketrans({
+    "ç": "c", "Ç": "c",
+    "ğ": "g", "Ğ": "g",
+    "ı": "i", "I": "i", "İ": "i",
+    "ö": "o", "Ö": "o",
+    "ş": "s", "Ş": "s",
+    "ü": "u", "Ü": "u",
+    "â": "a", "î": "i", "û": "u",
+    " ": "_", "-": "_", "/": "_",
+})
+
+
+def fold_key(text: str) -> str:
+    """Konu / alt konu adını kural anahtarı biçimine getirir (örn: "Sebep-Sonuç" -> "sebep_sonuc")."""
+    return (text or "").strip().translate(RULE_KEY_MAP).lower()
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """
+    RAG doc'ları + derlenmiş soru tipi kuralları (bir yüklemenin değişmez görüntüsü).
     
-    def __init__(self, project_root: Path):
-        self.project_root = project_root
-        self.rag_docs_dir = project_root / "rag_docs"
-        self.rules_path = project_root / "configs" / "question_type_rules.yaml"
-        
-        # RAG docs yükle (cache için)
-        self.rag_docs = {}
-        self._load_rag_docs()
+    Tablolar (değerler YAML anahtarı): katlanmış (konu ailesi, alt konu)
+    çifti ve katlanmış alt konu. Sabit prompt bölümleri (doc parçaları ve
+    kural başına kural + strateji + çıktı formatı) yüklemede render edilir.
+    """
+    
+    rag_docs: Mapping[str, str]
+    rules: Mapping[str, Any]
+    rule_key_by_pair: Mapping[Tuple[str, str], str]
+    rule_key_by_alt_konu: Mapping[str, str]
+    topic_aliases: Mapping[str, str]
+    doc_fragments: Mapping[str, str]
+    rule_tails: Mapping[Optional[str], str]
+    doc_sections: Mapping[str, Tuple[DocSection, ...]]
+    subtopic_stems: Tuple[FrozenSet[str], ...]
+    problems: Tuple[str, ...]
+
+    # Tam prompt'a eklenen genel strateji uzunluğu (karakter)
+    STRATEGY_CHAR_LIMIT = 800
+    STRATEGY_DOC = "lgs_tahmin_stratejisi"
+    
+    @staticmethod
+    def watched_paths(project_root: Path) -> List[Path]:
+        """Değişikliği izlenen dosyalar: rag_docs/*.md, kural YAML'ı, konu eşlemesi."""
+        rag_docs_dir = project_root / "rag_docs"
+        paths = sorted(rag_docs_dir.glob("*.md")) if rag_docs_dir.exists() else []
+        paths += [project_root / "configs" / "question_type_rules.yaml", project_root / "data" / "topic_mapping.json"]
+        return paths
+    
+    @classmethod
+    def load(cls, project_root: Path) -> "RuleSet":
+        """Doc'ları ve kuralları okuyup derler (her dosya bir kez parse edilir)."""
+        rag_docs = cls._load_rag_docs(project_root / "rag_docs")
+        rules = cls._load_rules(project_root / "configs" / "question_type_rules.yaml")
+        rule_key_by_pair, rule_key_by_alt_konu, problems = cls._compile_rules(rules)
+        topic_aliases = cls._load_topic_aliases(project_root / "data" / "topic_mapping.json", rules)
+        for problem in problems:
+            print(f"⚠️ Kural uyuşmazlığı: {problem}")
         
-        # Rules yükle
-        self.rules = {}
-        self._load_rules()
+        doc_fragments, rule_tails = cls._render_fragments(rag_docs, rules)
+        doc_sections = {name: split_sections(name, doc) for name, doc in rag_docs.items()}
+        return cls(
+            rag_docs=MappingProxyType(rag_docs),
+            rules=freeze(rules),
+            rule_key_by_pair=MappingProxyType(rule_key_by_pair),
+            rule_key_by_alt_konu=MappingProxyType(rule_key_by_alt_konu),
+            topic_aliases=MappingProxyType(topic_aliases),
+            doc_fragments=MappingProxyType(doc_fragments),
+            rule_tails=MappingProxyType(rule_tails),
+            doc_sections=MappingProxyType(doc_sections),
+            subtopic_stems=cls._subtopic_stems(rules, doc_sections),
+            problems=tuple(problems),
+        )
     
-    def _load_rag_docs(self):
+    @staticmethod
+    def _load_rag_docs(rag_docs_dir: Path) -> Dict[str, str]:
         """RAG dokümanlarını yükle."""
-        if not self.rag_docs_dir.exists():
-            print(f"⚠️ RAG docs klasörü bulunamadı: {self.rag_docs_dir}")
-            return
+        rag_docs = {}
+        if not rag_docs_dir.exists():
+            print(f"⚠️ RAG docs klasörü bulunamadı: {rag_docs_dir}")
+            return rag_docs
         
-        for doc_file in self.rag_docs_dir.glob("*.md"):
+        for doc_file in rag_docs_dir.glob("*.md"):
             doc_name = doc_file.stem  # paragraf, cumlede_anlam vb.
             with  open(doc_file, 'r', encoding='utf-8') as f:
-                self.rag_docs[doc_name] = f.read()
+                rag_docs[doc_name] = f.read()
         
-        print(f"✅ {len(self.rag_docs)} RAG doc yüklendi")
+        print(f"✅ {len(rag_docs)} RAG doc yüklendi")
+        return rag_docs
     
-    def _load_rules(self):
+    @staticmethod
+    def _load_rules(rules_path: Path) -> Dict:
         """Question Type Rules yükle."""
-        if not self.rules_path.exists():
-            print(f"⚠️ Rules dosyası bulunamadı: {self.rules_path}")
-            return
+        if not rules_path.exists():
+            print(f"⚠️ Rules dosyası bulunamadı: {rules_path}")
+            return {}
         
-        with open(self.rules_path, 'r', encoding='utf-8') as f:
-            self.rules = yaml.safe_load(f)
+        with open(rules_path, 'r', encoding='utf-8') as f:
+            rules = yaml.safe_load(f) or {}
+        print(f"✅ {len(rules)} soru tipi kuralı yüklendi")
+        return rules
+    
+    @staticmethod
+    def _load_topic_aliases(topic_mapping_path: Path, rules: Dict) -> Dict[str, str]:
+        """
+        Katlanmış ham konu adı -> kurallardaki konu ailesi (katlanmış).
         
-        print(f"✅ {len(self.rules)} soru tipi kuralı yüklendi")
+        data/topic_mapping.json ham konuları kanonik konulara eşler; aynı
+        kanonik konuya düşen ham adlar, o kanonik konuya düşen kural ailesine
+        yönlendirilir (örn: "Noktalama İşaretleri" -> "Yazım Kuralları").
+        """
+        mapping = {}
+        if topic_mapping_path.exists():
+            with open(topic_mapping_path, 'r', encoding='utf-8') as f:
+                mapping = json.load(f)
+        
+        families = {rule.get("topic_family", "") for rule in rules.values() if isinstance(rule, dict)}
+        family_by_canonical = {mapping.get(family, family): family for family in families if family}
+        
+        aliases = {}
+        for raw, canonical in list(mapping.items()) + [(c, c) for c in set(mapping.values())]:
+            family = family_by_canonical.get(canonical)
+            if family and fold_key(raw) != fold_key(family):
+                aliases[fold_key(raw)] = fold_key(family)
+        return aliases
     
-    def get_rag_doc_for_topic(self, konu: str) -> Optional[str]:
-        """Konu için uygun RAG doc'u getir."""
+    @staticmethod
+    def _compile_rules(rules: Dict) -> Tuple[Dict[Tuple[str, str], str], Dict[str, str], List[str]]:
+        """
+        Kuralları bir kez sözlüklere derler; kural araması sabit zamanlı olur.
+        
+        Anahtar / konu uyuşmazlıkları ve birden fazla kurala düşen alt konular
+        problem listesinde döner.
+        """
+        rule_key_by_pair = {}
+        rule_key_by_alt_konu = {}
+        problems = []
+        for key, rule in rules.items():
+            if not isinstance(rule, dict):
+                problems.append(f"{key}: kural sözlük değil")
+                continue
+            family, alt_konu = fold_key(rule.get("topic_family", "")), fold_key(rule.get("alt_konu", ""))
+            rule_key_by_pair.setdefault((family, alt_konu), key)
+            
+            if alt_konu in rule_key_by_alt_konu:
+                problems.append(f"{key}: alt konu '{rule.get('alt_konu')}' birden fazla kuralda (alt konu aramasında ilki kullanılır)")
+            else:
+                rule_key_by_alt_konu[alt_konu] = key
+            
+            if key != f"{family}_{alt_konu}":
+                problems.append(f"{key}: anahtar konu/alt konu ile uyuşmuyor (beklenen {family}_{alt_konu})")
+        
+        return rule_key_by_pair, rule_key_by_alt_konu, problems
+    
+    @staticmethod
+    def _subtopic_stems(rules: Dict, doc_sections: Dict[str, Tuple[DocSection, ...]]) -> Tuple[FrozenSet[str], ...]:
+        """
+        Alt konu adlarının ayırt edici kelime kökleri (bütçeli prompt'ta bölüm eşleştirmesi için).
+        
+        Adlar kurallardan ve doc'lardaki "## Alt Konu N: ..." başlıklarından
+        alınır; konu aile adlarında geçen kökler (örn. "anlam") çıkarılır.
+        """
+        alt_konular = [rule.get("alt_konu", "") for rule in rules.values() if isinstance(rule, dict)]
+        alt_konular += [
+            section.title.partition(":")[2]
+            for sections in doc_sections.values()
+            for section in sections
+            if section.parent == 0 and fold_key(section.title).startswith("alt_konu")
+        ]
+        families = [rule.get("topic_family", "") for rule in rules.values() if isinstance(rule, dict)]
+        family_stems = frozenset().union(*(stems(f, fold_key) for f in families))
+        names = {stems(a, fold_key) - family_stems for a in alt_konular}
+        return tuple(sorted((n for n in names if n), key=sorted))
+    
+    @classmethod
+    def _render_fragments(cls, rag_docs: Dict[str, str], rules: Dict) -> Tuple[Dict[str, str], Dict[Optional[str], str]]:
+        """Prompt'un (konu, alt konu, tema)'dan bağımsız bölümlerini bir kez render eder."""
+        doc_fragments = {
+            name: f"\n## STRATEJİK KILAVUZ\n{doc}\n" for name, doc in rag_docs.items() if doc
+        }
+        
+        # Genel strateji ekle (önemli tuzaklar) - ilk STRATEGY_CHAR_LIMIT karakter
+        general_strategy = rag_docs.get(cls.STRATEGY_DOC, "")
+        strategy = f"\n## GENEL ÇELDİRİCİ STRATEJİLERİ\n{general_strategy[:cls.STRATEGY_CHAR_LIMIT]}...\n" if general_strategy else ""
+        
+        # Kural bölümü + strateji + çıktı formatı, kural başına tek parça
+        rule_tails = {None: cls._render_rule_section(None) + strategy + cls._render_output_format(80, 150)}
+        for key, rule in rules.items():
+            if isinstance(rule, dict):
+                min_words, max_words = rule.get('min_words', 80), rule.get('max_words', 150)
+                rule_tails[key] = cls._render_rule_section(rule) + strategy + cls._render_output_format(min_words, max_words)
+        return doc_fragments, rule_tails
+    
+    @staticmethod
+    def _render_rule_section(rule: Optional[Dict]) -> str:
+        """KESİN KURALLAR (kural varsa) veya TEMEL KURALLAR bölümü."""
+        if not rule:
+            # Rule bulunamadıysa basit kurallar
+            return "\n## TEMEL KURALLAR\n- Metin kelime sayısı: 80-150 kelime\n- Metin formatı: Paragraf\n"
+        
+        min_words = rule.get('min_words', 80)
+        max_words = rule.get('max_words', 150)
+        lines = ["\n## KESİN KURALLAR\n", f"- Metin kelime sayısı: {min_words}-{max_words} kelime\n"]
+        
+        if rule.get('numbered_sentences'):
+            lines.append("- Metin formatı: Numaralı cümleler (I. II. III. IV.)\n")
+        else:
+            lines.append("- Metin formatı: Paragraf (numaralı cümle KULLANMA)\n")
+        
+        if rule.get('highlight_required'):
+            highlight_fmt = rule.get('highlight_format', 'tırnak')
+            lines.append(f"- Hedef kelime vurgusu: {highlight_fmt} içinde göster (örn: \"göz\")\n")
+        
+        allowed_roots = rule.get('allowed_question_roots', [])
+        if allowed_roots:
+            lines.append("- İzin verilen soru kökleri:\n")
+            lines.extend(f"  - {root}\n" for root in allowed_roots)
+        
+        return "".join(lines)
+    
+    @staticmethod
+    def _render_output_format(min_words: int, max_words: int) -> str:
+        # JSON format talimatı
+        return f"""
+## ÇIKTI FORMATI
+SADECE aşağıdaki JSON formatında döndür:
+
+{{"metin": "Metin buraya ({min_words}-{max_words} kelime)", "soru": "Soru metni", "sik_a": "A şıkkı", "sik_b": "B şıkkı", "sik_c": "C şıkkı", "sik_d": "D şıkkı", "dogru_cevap": "A"}}
+
+SADECE JSON döndür, başka hiçbir şey yazma!
+"""
+
+
+class RAGSystemV3:
+    """
+    İki katmanlı RAG sistemi.
+    
+    Doc ve kurallar süreç genelinde paylaşılan bir ConfigStore'dan değişmez
+    RuleSet snapshot'ı olarak okunur: aynı proje kökü için dosyalar bir kez
+    parse edilir, değiştiklerinde (mtime + boyut) worker'lar yeniden
+    başlatılmadan atomik olarak yeniden yüklenir. Bir prompt baştan sona tek
+    snapshot'la kurulur; tam prompt'lar snapshot sürümüyle LRU cache'te tutulur.
+    
+    Prompt iki parçadır (bkz. build_prompt_parts): soru tipi başına sabit
+    önek (rol, konu, kılavuz, kurallar, çıktı formatı) ve isteğe özel kısa
+    sonek (tema). Önekin prefix_id'si ile inference sunucusu önekin KV
+    cache'ini istekler arasında yeniden kullanır.
+    """
+    
+    # Önek cache'inin üst sınırı (konu x alt konu x bütçe)
+    PROMPT_CACHE_SIZE = 1024
+    # build_full_prompt dosya parmak izini en fazla bu aralıkla (sn) kontrol eder
+    SOURCE_CHECK_INTERVAL = 1.0
+    # Bütçeli prompt'ta genel strateji bölümlerinin puan çarpanı (konu doc'u öncelikli)
+    STRATEGY_WEIGHT = 0.8
+    # Bütçeli prompt'ta sonek (tema) için ayrılan token; önek seçimi temadan
+    # bağımsız kalsın diye sabittir
+    SUFFIX_TOKEN_RESERVE = 32
+    # Örnek / kontrol bütçesi (check_compact_prompts, test_rag_v3)
+    DEFAULT_TOKEN_BUDGET = 800
+    
+    def __init__(
+        self,
+        project_root: Path,
+        store: Optional[ConfigStore] = None,
+        token_budget: Optional[int] = None,
+        token_counter: Optional[TokenCounter] = None,
+    ):
+        """
+        Args:
+            project_root: rag_docs/, configs/ ve data/ klasörlerini içeren kök
+            store: RuleSet deposu (None: proje kökü için paylaşılan depo)
+            token_budget: Verilirse build_full_prompt doc bölümlerini bu toplam
+                token bütçesine sığacak şekilde seçer (bkz. build_compact_prompt)
+            token_counter: Modelin tokenizer'ıyla TokenCounter (None: tahmini sayım)
+        """
+        self.project_root = project_root
+        self.rag_docs_dir = project_root / "rag_docs"
+        self.rules_path = project_root / "configs" / "question_type_rules.yaml"
+        self.topic_mapping_path = project_root / "data" / "topic_mapping.json"
+        self.store = store or get_store(
+            ("rag_v3", str(Path(project_root).resolve())),
+            lambda: ConfigStore(
+                "rag_v3",
+                lambda: RuleSet.watched_paths(project_root),
+                lambda: RuleSet.load(project_root),
+                poll_interval=self.SOURCE_CHECK_INTERVAL,
+            ),
+        )
+        
+        self.token_budget = token_budget
+        self.token_counter = token_counter or TokenCounter()
         
-        # Eşleştirme
+        # Prompt cache (anahtar snapshot sürümünü ve bütçeyi içerir) ve raporlanmış kural eksikleri
+        self._lock = threading.Lock()
+        self._prompt_cache: "OrderedDict[Tuple[int, str, str, Optional[int]], Any]" = OrderedDict()
+        self._cache_version = self.store.version
+        self._reported_misses = set()
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    @property
+    def rule_set(self) -> RuleSet:
+        """Geçerli RuleSet (dosyalar değiştiyse önce yeniden yüklenir)."""
+        return self.store.snapshot().data
+    
+    @property
+    def rag_docs(self) -> Mapping[str, str]:
+        return self.rule_set.rag_docs
+    
+    @property
+    def rules(self) -> Mapping[str, Any]:
+        return self.rule_set.rules
+    
+    @property
+    def topic_aliases(self) -> Mapping[str, str]:
+        return self.rule_set.topic_aliases
+    
+    def refresh_if_changed(self) -> bool:
+        """Dosyalar değiştiyse yeniden yükler (cache geçersiz olur); değiştiyse True."""
+        return self.store.reload()
+    
+    def config_health(self) -> Dict[str, Any]:
+        """Health endpoint'i için config sürümü, yükleme süresi ve prompt cache durumu."""
+        return {**self.store.health(), "prompt_cache": self.cache_stats()}
+    
+    @staticmethod
+    def _doc_name_for_topic(konu: str) -> Optional[str]:
+        """Konu için RAG doc adı."""
         konu_lower = konu.lower()
         if "paragraf" in konu_lower:
-            return self.rag_docs.get("paragraf")
+            return "paragraf"
         elif "cümlede" in konu_lower or "cumlede" in konu_lower:
-            return self.rag_docs.get("cumlede_anlam")
+            return "cumlede_anlam"
         elif "sözcükte" in konu_lower or "sozcukte" in konu_lower:
-            return self.rag_docs.get("sozcukte_anlam")
+            return "sozcukte_anlam"
         elif "dil bilgisi" in konu_lower:
-            return self.rag_docs.get("dil_bilgisi")
+            return "dil_bilgisi"
         elif "yazım" in konu_lower or "noktalama" in konu_lower:
-            return self.rag_docs.get("yazim_noktalama")
+            return "yazim_noktalama"
         
         return None
     
+    def get_rag_doc_for_topic(self, konu: str) -> Optional[str]:
+        """Konu için uygun RAG doc'u getir."""
+        doc_name = self._doc_name_for_topic(konu)
+        return self.rag_docs.get(doc_name) if doc_name else None
+    
     def get_general_strategy(self) -> str:
         """Genel strateji dokümanını getir."""
         return self.rag_docs.get("lgs_tahmin_stratejisi", "")
     
-    def get_rule_for_question_type(self, konu: str, alt_konu: str) -> Optional[Dict]:
-        """Soru tipi için kesin kuralları getir."""
+    def _resolve_rule_key(self, konu: str, alt_konu: str, rule_set: RuleSet) -> Optional[str]:
+        """
+        (konu, alt konu) için YAML kural anahtarı.
         
-        # Rule key oluştur (örn: paragraf_ana_dusunce)
-        konu_key = konu.lower().replace(" ", "_").replace("ü", "u").replace("ö", "o").replace("ç", "c").replace("ı", "i").replace("ş", "s").replace("ğ", "g")
-        alt_konu_key = alt_konu.lower().replace(" ", "_").replace("ü", "u").replace("ö", "o").replace("ç", "c").replace("ı", "i").replace("ş", "s").replace("ğ", "g")
+        Sıra: YAML anahtarı (örn: paragraf_ana_dusunce), (konu, alt konu)
+        çifti, topic_mapping takma adıyla çift, sadece alt konu.
+        """
+        konu_key = fold_key(konu)
+        alt_konu_key = fold_key(alt_konu)
         
         rule_key = f"{konu_key}_{alt_konu_key}"
+        if not isinstance(rule_set.rules.get(rule_key), Mapping):
+            rule_key = (
+                rule_set.rule_key_by_pair.get((konu_key, alt_konu_key))
+                or rule_set.rule_key_by_pair.get((rule_set.topic_aliases.get(konu_key, konu_key), alt_konu_key))
+                or rule_set.rule_key_by_alt_konu.get(alt_konu_key)
+            )
         
-        # Kuralı bul
-        for key, rule in self.rules.items():
-            if key == rule_key:
-                return rule
-            # Alternatif: alt_konu eşleşmesi
-            if rule.get("alt_konu", "").lower().replace(" ", "_") == alt_konu_key:
-                return rule
+        if rule_key is None and (konu_key, alt_konu_key) not in self._reported_misses:
+            self._reported_misses.add((konu_key, alt_konu_key))
+            print(f"⚠️ Kural bulunamadı: {konu} / {alt_konu} (temel kurallar kullanılacak)")
         
-        return None
+        return rule_key
+    
+    def get_rule_for_question_type(self, konu: str, alt_konu: str) -> Optional[Mapping]:
+        """Soru tipi için kesin kuralları getir (bkz. _resolve_rule_key)."""
+        rule_set = self.rule_set
+        rule_key = self._resolve_rule_key(konu, alt_konu, rule_set)
+        return rule_set.rules[rule_key] if rule_key else None
     
     def build_full_prompt(self, konu: str, alt_konu: str, tema: Optional[str] = None) -> str:
-        """Tam prompt oluştur: RAG Doc + Rules + Tema."""
+        """
+        Tam prompt oluştur: RAG Doc + Rules + Tema (önek + sonek metni).
         
-        # 1. RAG Doc (Stratejik bilgi)
-        rag_doc = self.get_rag_doc_for_topic(konu)
-        
-        # 2. Genel strateji
-        general_strategy = self.get_general_strategy()
+        token_budget verilmişse bütçeli prompt döner.
+        """
+        return self.build_prompt_parts(konu, alt_konu, tema).text
+    
+    def build_prompt_parts(self, konu: str, alt_konu: str, tema: Optional[str] = None) -> PromptParts:
+        """
+        Prompt'u sabit önek + değişken sonek olarak oluştur.
         
-        # 3. Question Type Rules
-        rule = self.get_rule_for_question_type(konu, alt_konu)
+        Önek (konu, alt konu) için sabittir ve cache'ten döner; doc/kural
+        dosyaları değiştiyse (SOURCE_CHECK_INTERVAL aralıkla kontrol) önce
+        yeniden yüklenir. Tema yalnızca soneke girer, önek ve prefix_id
+        temadan bağımsızdır.
+        """
+        if self.token_budget:
+            return self.build_compact_prompt(konu, alt_konu, tema).parts
+        snapshot = self.store.snapshot()
+        prefix = self._cached(
+            (snapshot.version, konu, alt_konu, None),
+            lambda: PromptParts.build(self._assemble_prompt(konu, alt_konu, snapshot.data)),
+        )
+        return prefix.with_suffix(self._render_suffix(tema))
+    
+    def build_compact_prompt(
+        self,
+        konu: str,
+        alt_konu: str,
+        tema: Optional[str] = None,
+        token_budget: Optional[int] = None,
+    ) -> CompactPrompt:
+        """
+        Token bütçeli prompt: doc bölümleri alt konuya uygunluğuna göre seçilir.
         
-        # Default word counts
-        min_words = 80
-        max_words = 150
+        Konu bilgisi, kurallar ve çıktı formatı her zaman eklenir; kalan
+        bütçe konu doc'unun ve genel stratejinin bölümleriyle doldurulur
+        (genel strateji tam prompt'taki uzunluğu geçmez). Önek seçimi sonek
+        için SUFFIX_TOKEN_RESERVE ayırır, böylece tema değişse de önek aynı
+        kalır. Sonuç tam prompt'a göre kazanılan token sayısını da raporlar
+        (CompactPrompt.saved_tokens).
         
-        if rule:
-            min_words = rule.get('min_words', 80)
-            max_words = rule.get('max_words', 150)
+        Args:
+            token_budget: Toplam prompt bütçesi (None: self.token_budget)
+        """
+        budget = token_budget or self.token_budget
+        if not budget:
+            raise ValueError("token_budget verilmedi")
+        snapshot = self.store.snapshot()
+        compact = self._cached(
+            (snapshot.version, konu, alt_konu, budget),
+            lambda: self._compact_prompt(konu, alt_konu, budget, snapshot.data),
+        )
+        suffix = self._render_suffix(tema)
+        if not suffix:
+            return compact
+        suffix_tokens = self.token_counter.count(suffix)
+        return replace(
+            compact,
+            parts=compact.parts.with_suffix(suffix),
+            tokens=compact.tokens + suffix_tokens,
+            full_tokens=compact.full_tokens + suffix_tokens,
+        )
+    
+    def _cached(self, cache_key: Tuple, build: Callable[[], Any]) -> Any:
+        """LRU prompt cache'i; anahtarın ilk elemanı snapshot sürümüdür."""
+        version = cache_key[0]
+        with self._lock:
+            if version > self._cache_version:
+                # Yeni sürüm: eski prompt'lar ve kural eksikleri geçersiz
+                self._cache_version = version
+                self._prompt_cache.clear()
+                self._reported_misses = set()
+            value = self._prompt_cache.get(cache_key)
+            if value is not None:
+                self._prompt_cache.move_to_end(cache_key)
+                self.cache_hits += 1
+                return value
+            self.cache_misses += 1
         
-        # Prompt oluştur
-        prompt = f"""Sen MEB LGS 8. sınıf Türkçe soru yazarısın.
+        value = build()
+        if version == self._cache_version:
+            with self._lock:
+                self._prompt_cache[cache_key] = value
+                if len(self._prompt_cache) > self.PROMPT_CACHE_SIZE:
+                    self._prompt_cache.popitem(last=False)
+        return value
+    
+    @staticmethod
+    def _render_head(konu: str, alt_konu: str) -> str:
+        """Rol + KONU BİLGİSİ bölümü."""
+        return f"""Sen MEB LGS 8. sınıf Türkçe soru yazarısın.
 
 ## KONU BİLGİSİ
 Konu: {konu}
 Alt Konu: {alt_konu}
 """
+    
+    @staticmethod
+    def _render_suffix(tema: Optional[str]) -> str:
+        """İsteğe özel sonek (çıktı formatından sonra; tema yoksa boş)."""
+        return f"\n## TEMA\nTema: {tema}\n" if tema else ""
+    
+    def _assemble_prompt(self, konu: str, alt_konu: str, rule_set: RuleSet) -> str:
+        """Önceden render edilmiş parçalardan öneki tek join ile kurar."""
+        parts = [self._render_head(konu, alt_konu)]
         
-        if tema:
-            prompt += f"Tema: {tema}\n"
+        # 1. RAG Doc (Stratejik bilgi)
+        doc_name = self._doc_name_for_topic(konu)
+        if doc_name in rule_set.doc_fragments:
+            parts.append(rule_set.doc_fragments[doc_name])
         
-        # RAG Doc ekle
-        if rag_doc:
-            prompt += f"\n## STRATEJİK KILAVUZ\n{rag_doc}\n"
+        # 2. Question Type Rules + genel strateji + çıktı formatı
+        parts.append(rule_set.rule_tails[self._resolve_rule_key(konu, alt_konu, rule_set)])
         
-        # Rule ekle
-        if rule:
-            prompt += f"\n## KESİN KURALLAR\n"
-            prompt += f"- Metin kelime sayısı: {min_words}-{max_words} kelime\n"
-            
-            if rule.get('numbered_sentences'):
-                prompt += "- Metin formatı: Numaralı cümleler (I. II. III. IV.)\n"
-            else:
-                prompt += "- Metin formatı: Paragraf (numaralı cümle KULLANMA)\n"
-            
-            if rule.get('highlight_required'):
-                highlight_fmt = rule.get('highlight_format', 'tırnak')
-                prompt += f"- Hedef kelime vurgusu: {highlight_fmt} içinde göster (örn: \"göz\")\n"
-            
-            allowed_roots = rule.get('allowed_question_roots', [])
-            if allowed_roots:
-                prompt += f"- İzin verilen soru kökleri:\n"
-                for root in allowed_roots:
-                    prompt += f"  - {root}\n"
-        else:
-            # Rule bulunamadıysa basit kurallar
-            prompt += f"\n## TEMEL KURALLAR\n"
-            prompt += f"- Metin kelime sayısı: {min_words}-{max_words} kelime\n"
-            prompt += "- Metin formatı: Paragraf\n"
+        return "".join(parts)
+    
+    def _compact_prompt(self, konu: str, alt_konu: str, budget: int, rule_set: RuleSet) -> CompactPrompt:
+        """Bütçeye (sonek payı düşülmüş) sığan doc bölümlerini seçip öneki kurar."""
+        count = self.token_counter.count
+        head = self._render_head(konu, alt_konu)
+        prefix_budget = budget - self.SUFFIX_TOKEN_RESERVE
+        rule_key = self._resolve_rule_key(konu, alt_konu, rule_set)
+        rule = rule_set.rules[rule_key] if rule_key else None
+        rule_section = RuleSet._render_rule_section(rule)
+        output_format = RuleSet._render_output_format(
+            rule.get('min_words', 80) if rule else 80, rule.get('max_words', 150) if rule else 150
+        )
         
-        # Genel strateji ekle (önemli tuzaklar)
-        if general_strategy:
-            prompt += f"\n## GENEL ÇELDİRİCİ STRATEJİLERİ\n{general_strategy[:800]}...\n"  # İlk 800 karakter
+        # Aday doc'lar: konu doc'u ve genel strateji (tam prompt'taki sınırla)
+        doc_name = self._doc_name_for_topic(konu)
+        doc_header = "\n## STRATEJİK KILAVUZ\n"
+        strategy_doc = RuleSet.STRATEGY_DOC
+        strategy_header = "\n## GENEL ÇELDİRİCİ STRATEJİLERİ\n"
+        query = stems(alt_konu, fold_key)
+        sections_by_doc, wrapper_tokens, doc_caps, ranked = {}, {}, {}, []
+        if doc_name in rule_set.doc_sections:
+            sections_by_doc[doc_name] = rule_set.doc_sections[doc_name]
+            wrapper_tokens[doc_name] = count(doc_header + "\n")
+            ranked += rank_sections(sections_by_doc[doc_name], query, rule_set.subtopic_stems, fold_key)
+        if strategy_doc in rule_set.doc_sections:
+            sections_by_doc[strategy_doc] = rule_set.doc_sections[strategy_doc]
+            wrapper_tokens[strategy_doc] = count(strategy_header + "\n")
+            doc_caps[strategy_doc] = wrapper_tokens[strategy_doc] + count(
+                rule_set.rag_docs[strategy_doc][:RuleSet.STRATEGY_CHAR_LIMIT]
+            )
+            ranked += rank_sections(
+                sections_by_doc[strategy_doc], query, rule_set.subtopic_stems, fold_key, weight=self.STRATEGY_WEIGHT
+            )
         
-        # JSON format talimatı
-        prompt += f"""
-## ÇIKTI FORMATI
-SADECE aşağıdaki JSON formatında döndür:
-
-{{"metin": "Metin buraya ({min_words}-{max_words} kelime)", "soru": "Soru metni", "sik_a": "A şıkkı", "sik_b": "B şıkkı", "sik_c": "C şıkkı", "sik_d": "D şıkkı", "dogru_cevap": "A"}}
-
-SADECE JSON döndür, başka hiçbir şey yazma!
-"""
+        # Alt konuya ayrılmış en iyi bölüm genel bölümlerden önce yerleşir
+        pinned = best_targeted_section(ranked, query, fold_key, doc_name)
         
-        return prompt
+        # Parça sayımları birleşik metinden biraz sapabilir: bütçe aşılırsa
+        # aşım kadar daraltılıp yeniden seçilir
+        available = prefix_budget - count(head + rule_section + output_format)
+        while True:
+            chosen = select_sections(
+                ranked, sections_by_doc, self.token_counter, available, wrapper_tokens, doc_caps, pinned=pinned
+            )
+            doc_texts = [section.text for section in chosen if section.doc == doc_name]
+            strategy_texts = [section.text for section in chosen if section.doc == strategy_doc]
+            parts = [head]
+            if doc_texts:
+                parts.append(doc_header + "".join(doc_texts) + "\n")
+            parts.append(rule_section)
+            if strategy_texts:
+                parts.append(strategy_header + "".join(strategy_texts) + "\n")
+            parts.append(output_format)
+            prompt = "".join(parts)
+            tokens = count(prompt)
+            if tokens <= prefix_budget or not chosen:
+                break
+            available -= tokens - prefix_budget
+        
+        return CompactPrompt(
+            parts=PromptParts.build(prompt),
+            tokens=tokens,
+            full_tokens=count(self._assemble_prompt(konu, alt_konu, rule_set)),
+            budget=budget,
+            sections=tuple(f"{section.doc}: {section.title}" for section in chosen if not section.is_header),
+            exact=self.token_counter.exact,
+        )
+    
+    def prebuild_prompts(self, konular: Dict[str, List[str]], temalar: Iterable[Optional[str]] = (None,)) -> int:
+        """
+        Her (konu, alt konu) önekini önceden oluşturur (uygulama açılışında).
+        
+        Args:
+            konular: Web uygulamalarındaki KONULAR sözlüğü (konu -> alt konu listesi)
+            temalar: Prompt'u hazırlanacak temalar (None: temasız; tema yalnızca
+                soneke girdiği için aynı önek paylaşılır)
+        
+        Returns:
+            Hazırlanan prompt sayısı
+        """
+        count = 0
+        for konu, alt_konular in konular.items():
+            for alt_konu in alt_konular:
+                for tema in temalar:
+                    self.build_full_prompt(konu, alt_konu, tema)
+                    count += 1
+        print(f"🔥 Prompt cache ısıtıldı: {count} prompt")
+        return count
+    
+    def check_compact_prompts(self, konular: Dict[str, List[str]], token_budget: Optional[int] = None) -> List[str]:
+        """
+        Bütçeli prompt'ta her (konu, alt konu) çiftinin kendi alt konu bölümünü koruduğunu kontrol eder.
+        
+        Args:
+            konular: KONULAR sözlüğü (konu -> alt konu listesi)
+            token_budget: Kontrol bütçesi (None: DEFAULT_TOKEN_BUDGET)
+        
+        Returns:
+            Sorun listesi (boşsa her çift kendi bölümünü içeriyor)
+        """
+        budget = token_budget or self.DEFAULT_TOKEN_BUDGET
+        rule_set = self.rule_set
+        problems = []
+        for konu, alt_konular in konular.items():
+            doc_name = self._doc_name_for_topic(konu)
+            sections = rule_set.doc_sections.get(doc_name)
+            if not sections:
+                continue
+            for alt_konu in alt_konular:
+                query = stems(alt_konu, fold_key)
+                ranked = rank_sections(sections, query, rule_set.subtopic_stems, fold_key)
+                target = best_targeted_section(ranked, query, fold_key, doc_name)
+                if target is None:
+                    problems.append(f"{konu} / {alt_konu}: {doc_name} doc'unda alt konu bölümü yok")
+                    continue
+                compact = self.build_compact_prompt(konu, alt_konu, token_budget=budget)
+                if f"{doc_name}: {target.title}" not in compact.sections:
+                    problems.append(f"{konu} / {alt_konu}: '{target.title}' {budget} token bütçesinde düştü")
+        return problems
     
+    def cache_stats(self) -> Dict[str, int]:
+        return {
+            "version": self._cache_version,
+            "size": len(self._prompt_cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+        }
+
     def build_simple_prompt_for_finetune(self, konu: str, alt_konu: str, tema: Optional[str] = None) -> str:
         """Fine-tune için basitleştirilmiş prompt (tüm stratejileri öğrenecek)."""
         
@@ -224,6 +708,30 @@ def test_rag_v3():
     prompt = rag.build_simple_prompt_for_finetune("Cümlede Anlam", "Deyim", tema="Sağlık")
     print(prompt)
 
+    # Test 4: Token bütçeli prompt
+    print("\n" + "="*60)
+    print(f"TEST 4: Token Bütçeli Prompt ({rag.DEFAULT_TOKEN_BUDGET} token)")
+    print("="*60)
+    compact = rag.build_compact_prompt(
+        "Sözcükte Anlam", "Çok Anlamlılık", tema="Spor", token_budget=rag.DEFAULT_TOKEN_BUDGET
+    )
+    sayim = "tokenizer" if compact.exact else "tahmini"
+    print(f"{compact.tokens}/{compact.budget} token ({sayim}), tam prompt {compact.full_tokens}, kazanç {compact.saved_tokens}")
+    print(f"prefix_id: {compact.prefix_id}")
+    for section in compact.sections:
+        print(f"  - {section}")
+
+    # Test 5: Her KONULAR çifti bütçeli prompt'ta kendi alt konu bölümünü korur
+    print("\n" + "="*60)
+    print(f"TEST 5: Alt Konu Bölümleri ({rag.DEFAULT_TOKEN_BUDGET} token)")
+    print("="*60)
+    from rag_benchmark import load_konular
+    problems = rag.check_compact_prompts(load_konular())
+    for problem in problems:
+        print(f"  ❌ {problem}")
+    if not problems:
+        print("  ✅ Her çift kendi alt konu bölümünü içeriyor")
+
 
 if __name__ == "__main__":
     test_rag_v3()
@@ -1,34 +1,37 @@
+import argparse
 import os
 import sys
-import json
 
-# Proje kök dizinini path'e ekle
+# Proje kök dizinini ve src'yi path'e ekle
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
+sys.path.insert(0, os.path.join(project_root, "src"))
 
-from src.rag_manager import SimpleRAG
+from rag_manager import SimpleRAG
+from rag_sources import ADAPTERS, build_source_index
 
-def rebuild_index():
+def rebuild_index(source=None, sources=None, chunk_size=256, workers=0, force=True):
     print("🔄 RAG Index Yeniden Oluşturuluyor...")
     
-    # 1. Veri setini yükle
-    data_path = os.path.join(project_root, "data", "merged_dataset.json")
-    print(f"📖 Veri seti okunuyor: {data_path}")
-    
-    with open(data_path, "r", encoding="utf-8") as f:
-        questions = json.load(f)
-        
-    print(f"📊 Toplam Soru: {len(questions)}")
+    # 1. Veri kaynakları: adaptörler (varsayılan: hepsi) + elle verilen dosyalar,
+    # tek şemaya normalize edilip tekrarlar elenir (tembel okunur)
+    if isinstance(source, str):
+        source = [source]
+    if sources is None and source:
+        sources = []
+    stats = {}
+    print(f"📖 Kaynaklar: {', '.join(sources if sources is not None else ADAPTERS)}"
+          + (f" + {', '.join(source)}" if source else ""))
     
     # 2. RAG Manager'ı başlat
     rag = SimpleRAG()
-    rag.initialize()
+    rag.initialize(cache_dir=os.path.join(project_root, "data"))
     
-    # 3. Index oluştur (Force rebuild)
-    # Cache path: root/data/rag_index.pkl
-    rag.build_index(questions, force=True)
+    # 3. Index oluştur (parça parça, yarıda kalırsa kaldığı yerden devam eder)
+    # Cache path: root/data/rag_index/ (varsayılan korpus; web_app_v2 ile ortak)
+    build_source_index(rag, sources, source, chunk_size=chunk_size, workers=workers, force=force, stats=stats)
     
-    print(f"✅ RAG Index başarıyla oluşturuldu.")
+    print(f"✅ RAG Index başarıyla oluşturuldu: {rag.index_path} {stats}")
     
     # Test Sorgusu
     test_query = "Yazım Kuralları"
@@ -39,4 +42,11 @@ def rebuild_index():
         print(f"{i}. Benzerlik: {res['similarity']:.4f} - Soru: {res['soru_kökü'][:100]}...")
 
 if __name__ == "__main__":
-    rebuild_index()
+    parser = argparse.ArgumentParser(description="RAG index'ini yeniden oluşturur")
+    parser.add_argument("--sources", nargs="+", choices=list(ADAPTERS), help="Kullanılacak kaynak adaptörleri (varsayılan: hepsi)")
+    parser.add_argument("--source", nargs="+", help="Ek JSON/JSONL dosyası, klasör veya glob (şema otomatik tahmin edilir)")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=0, help="Paralel encode süreç sayısı (0: tek süreç)")
+    parser.add_argument("--reuse", action="store_true", help="Mevcut index'teki değişmeyen vektörleri yeniden kullan")
+    args = parser.parse_args()
+    rebuild_index(args.source, args.sources, args.chunk_size, args.workers, force=not args.reuse)
@@ -11,6 +11,9 @@ Tüm problemler için çözüm içerir:
 
 import json
 import os
+from functools import lru_cache
+
+from prompt_layout import PromptParts
 
 # ============================================================================
 # ALT KONU KILAVUZLARI (Genişletilmiş - Format Bilgisi Dahil)
@@ -291,8 +294,9 @@ FARKINDALIK_KONULARI = [
 # AKILLI RAG FONKSİYONLARI
 # ============================================================================
 
+@lru_cache(maxsize=None)
 def get_alt_konu_kilavuz(alt_konu: str) -> str:
-    """Alt konu için kılavuz metni döndürür - GENİŞLETİLMİŞ FORMAT BİLGİSİ İLE."""
+    """Alt konu için kılavuz metni döndürür - GENİŞLETİLMİŞ FORMAT BİLGİSİ İLE (alt konu başına bir kez render edilir)."""
     kilavuz = ALT_KONU_KILAVUZLARI.get(alt_konu)
     if not kilavuz:
         return ""
@@ -323,29 +327,79 @@ def get_alt_konu_kilavuz(alt_konu: str) -> str:
 """
     return text.strip()
 
-def get_rag_context(konu: str, alt_konu: str, farkindalik: str = None) -> str:
-    """RAG context oluşturur: Kılavuz + Stil kuralları + Farkındalık teması."""
+@lru_cache(maxsize=1024)
+def get_static_context(konu: str, alt_konu: str) -> str:
+    """
+    Alt konunun sabit context'i: Kılavuz + Stil kuralları.
     
-    parts = []
+    Aynı alt konu için her istekte aynıdır (prompt'un sabit öneki, bkz.
+    prompt_layout). Çıktı sadece girdilere ve bu modüldeki sabitlere bağlı
+    olduğundan memoize edilir; sabitler çalışma anında değiştirilirse
+    clear_rag_cache() çağırın.
+    """
     
-    # 1. Farkındalık teması (varsa)
-    if farkindalik:
-        parts.append(f"## METİN TEMASI\n**Farkındalık Konusu:** {farkindalik}\nMetin bu tema etrafında yazılmalı. GERÇEK bilgiler kullan!")
+    parts = []
     
-    # 2. Alt konu kılavuzu (GENİŞLETİLMİŞ)
+    # 1. Alt konu kılavuzu (GENİŞLETİLMİŞ)
     kilavuz = get_alt_konu_kilavuz(alt_konu)
     if kilavuz:
         parts.append(kilavuz)
     
-    # 3. Stil kılavuzu
+    # 2. Stil kılavuzu
     parts.append(STIL_KILAVUZU)
     
     return "\n\n---\n\n".join(parts)
 
+def render_farkindalik(farkindalik: str = None) -> str:
+    """Farkındalık teması bölümü - isteğe özel sonek (tema yoksa boş)."""
+    if not farkindalik:
+        return ""
+    return f"\n\n---\n\n## METİN TEMASI\n**Farkındalık Konusu:** {farkindalik}\nMetin bu tema etrafında yazılmalı. GERÇEK bilgiler kullan!"
+
+def get_rag_context(konu: str, alt_konu: str, farkindalik: str = None) -> str:
+    """
+    RAG context oluşturur: Kılavuz + Stil kuralları + Farkındalık teması.
+    
+    Farkındalık teması sabit kılavuzun sonuna eklenir; böylece aynı alt
+    konunun context'leri ortak bir önekle başlar.
+    """
+    return get_static_context(konu, alt_konu) + render_farkindalik(farkindalik)
+
+def clear_rag_cache():
+    """Kılavuz / context cache'ini boşaltır (ALT_KONU_KILAVUZLARI veya STIL_KILAVUZU değişirse)."""
+    get_alt_konu_kilavuz.cache_clear()
+    get_static_context.cache_clear()
+
+def prebuild_rag_contexts(konular: dict) -> int:
+    """
+    Her (konu, alt konu) sabit context'ini önceden oluşturur (uygulama açılışında).
+    
+    Farkındalık teması sonek olarak eklendiği için temalar ayrıca hazırlanmaz.
+    
+    Args:
+        konular: KONULAR sözlüğü (konu -> alt konu listesi)
+    """
+    count = 0
+    for konu, alt_konular in konular.items():
+        for alt_konu in alt_konular:
+            get_static_context(konu, alt_konu)
+            count += 1
+    print(f"🔥 RAG context cache ısıtıldı: {count} context")
+    return count
+
 def build_rag_prompt(konu: str, alt_konu: str, farkindalik: str = None) -> str:
     """RAG destekli tam prompt oluşturur."""
+    return build_rag_prompt_parts(konu, alt_konu, farkindalik).text
+
+def build_rag_prompt_parts(konu: str, alt_konu: str, farkindalik: str = None) -> PromptParts:
+    """
+    RAG destekli prompt'u sabit önek + farkındalık soneki olarak oluşturur.
+    
+    Önek (kılavuz, kurallar, JSON formatı) alt konu başına sabittir;
+    prefix_id ile inference tarafı önekin KV cache'ini yeniden kullanır.
+    """
     
-    context = get_rag_context(konu, alt_konu, farkindalik)
+    context = get_static_context(konu, alt_konu)
     
     prompt = f"""Konu: {konu}
 Alt Konu: {alt_konu}
@@ -365,7 +419,7 @@ MUTLAK KURALLAR:
 JSON:
 {{"metin": "...", "soru": "...", "sik_a": "...", "sik_b": "...", "sik_c": "...", "sik_d": "...", "dogru_cevap": "A/B/C/D"}}"""
     
-    return prompt
+    return PromptParts.build(prompt, render_farkindalik(farkindalik))
 
 
 # ============================================================================
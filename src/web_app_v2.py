@@ -33,6 +33,8 @@ app = Flask(__name__, template_folder='templates', static_folder='static')
 COLAB_API_URL = os.getenv("COLAB_API_URL", "")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+# Opsiyonel: önceden hesaplanmış sorgu vektörleri (.npz) - verilirse embedding modeli yüklenmez
+RAG_QUERY_VECTORS = os.getenv("RAG_QUERY_VECTORS", "")
 
 # Konu listesi - V8 Eğitim verisiyle %100 uyumlu (sadece güçlü alt konular)
 KONULAR = {
@@ -48,11 +50,10 @@ rag = None
 def init_rag():
     global rag
     if rag is None:
+        # Birleşik index (tüm soru kaynakları); V8 eğitim verisi varsa ek kaynak olarak eklenir
         data_path = os.path.join(project_dir, "data", "lgs_finetune_data_v8_full_rag.jsonl")
-        if os.path.exists(data_path):
-            rag = initialize_rag(data_path)
-        else:
-            print(f"⚠ RAG veri dosyası bulunamadı: {data_path}")
+        rag = initialize_rag(data_path, query_vectors=RAG_QUERY_VECTORS or None)
+        rag.warm_query_cache(KONULAR)
 
 
 @app.route('/')
@@ -33,6 +33,9 @@ COLAB_API_URL = os.getenv("COLAB_API_URL", "")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 
+# Colab çağrıları tek keep-alive oturumdan (her istekte yeni TCP/TLS bağlantısı kurulmaz)
+_session = requests.Session()
+
 # Konu listesi - V10 ile uyumlu (zorluk YOK)
 KONULAR = {
     "Paragraf": ["Ana Düşünce", "Başlık Bulma", "Anlatım Biçimi"],
@@ -43,7 +46,11 @@ KONULAR = {
 }
 
 # Smart RAG - Kılavuz tabanlı + Farkındalık konuları
-from smart_rag import get_rag_context, FARKINDALIK_KONULARI
+from smart_rag import get_static_context, render_farkindalik, prebuild_rag_contexts, FARKINDALIK_KONULARI
+from prompt_layout import PromptParts
+
+# Tüm (konu, alt konu) sabit context'leri açılışta bir kez hazırlanır
+prebuild_rag_contexts(KONULAR)
 
 @app.route('/')
 def index():
@@ -62,10 +69,15 @@ def get_farkindalik_konulari():
     return jsonify(FARKINDALIK_KONULARI)
 
 def build_prompt(konu, alt_konu, farkindalik=None):
-    """Smart RAG destekli prompt oluşturur - kılavuz + farkındalık tabanlı."""
+    """
+    Smart RAG destekli prompt oluşturur - kılavuz + farkındalık tabanlı.
+    
+    Kılavuz ve format alt konu başına sabit önektir; farkındalık teması
+    sona sonek olarak eklenir (PromptParts.prefix_id ile KV cache paylaşılır).
+    """
     
-    # RAG context (farkındalık dahil)
-    rag_context = get_rag_context(konu, alt_konu, farkindalik)
+    # RAG context (sabit kılavuz)
+    rag_context = get_static_context(konu, alt_konu)
     
     prompt = f"""Konu: {konu}
 Alt Konu: {alt_konu}
@@ -79,7 +91,7 @@ Yukarıdaki kılavuza göre LGS Türkçe sorusu üret. SADECE JSON döndür.
 ÇIKTI FORMATI:
 {{"metin": "...", "soru": "...", "sik_a": "...", "sik_b": "...", "sik_c": "...", "sik_d": "...", "dogru_cevap": "A/B/C/D"}}"""
     
-    return prompt
+    return PromptParts.build(prompt, render_farkindalik(farkindalik))
 
 def repair_json(raw: str) -> str:
     """Bozuk JSON'u düzeltmeye çalışır - AGRESİF."""
@@ -154,8 +166,8 @@ def extract_content_regex(raw: str) -> dict:
     
     return result
 
-def call_api(prompt):
-    """Colab API'yi çağırır."""
+def call_api(parts: PromptParts):
+    """Colab API'yi çağırır (prefix_id ile; sunucu önek KV cache'ini yeniden kullanabilir)."""
     if not COLAB_API_URL:
         return {"error": "Colab URL yok"}
     
@@ -164,9 +176,9 @@ def call_api(prompt):
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         
         url = f"{COLAB_API_URL.rstrip('/')}/generate"
-        payload = {"prompt": {"user": prompt}}
+        payload = parts.to_payload()
         
-        response = requests.post(url, json=payload, timeout=120, verify=False)
+        response = _session.post(url, json=payload, timeout=120, verify=False)
         data = response.json()
         
         raw = data.get("result", data.get("response", ""))
@@ -265,7 +277,8 @@ def generate():
     farkindalik = data.get('farkindalik', None)  # Yeni: Farkındalık konusu
     
     # Smart RAG ile prompt oluştur (kılavuz + farkındalık tabanlı)
-    prompt = build_prompt(konu, alt_konu, farkindalik)
+    parts = build_prompt(konu, alt_konu, farkindalik)
+    prompt = parts.text
     
     if farkindalik:
         print(f"📝 Smart RAG prompt: {len(prompt)} karakter, Alt Konu: {alt_konu}, Farkındalık: {farkindalik}")
@@ -289,7 +302,7 @@ def generate():
     for attempt in range(max_retries):
         print(f"🔄 Deneme {attempt + 1}/{max_retries}")
         
-        response = call_api(prompt)
+        response = call_api(parts)
         if "error" in response:
             print(f"   ⚠ API hatası: {response['error']}")
             continue